@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from ga_dates import resolve_request
+from ga_report import make_ga_report_call
+
+# 抽樣與門檻偵測：檢查響應 metadata 中的 samplingMetadatas、dataLossFromOtherRow 與
+# subjectToThresholding，必要時自動拆分查詢並行重跑後合併:
+# - 抽樣：依日期區間對半拆分 (最多 max_depth 層)；含不可加總指標且無 date 維度時，
+#   改以粗維度逐值拆分 (粗維度需在請求的維度中，各部分互不重疊)，否則保留抽樣結果並回報
+# - (other) 列造成資料遺失：先以較粗的維度 (例如 country) 取得所有值，再逐值過濾重跑
+# - 門檻處理 (thresholding) 無法以拆分消除，只會回報
+# 回傳的 accuracy 說明結果是否精確。
+
+# 這些指標跨日期區間不可加總；未包含 date 維度時以日期拆分再加總只會高估，
+# 此時不以日期拆分 (改以粗維度拆分，或保留 GA 的抽樣估計)
+NON_ADDITIVE_METRICS = {'activeUsers', 'totalUsers', 'active1DayUsers', 'active7DayUsers',
+                        'active28DayUsers', 'userEngagementDuration', 'averageSessionDuration',
+                        'bounceRate', 'engagementRate', 'sessionsPerUser'}
+MAX_WORKERS = 4
+
+
+def inspect_result(result):
+    metadata = (result or {}).get("metadata", {})
+    sampled = bool(metadata.get("samplingMetadatas"))
+    thresholded = bool(metadata.get("subjectToThresholding"))
+    data_loss = bool(metadata.get("dataLossFromOtherRow"))
+    return {
+        "exact": not (sampled or thresholded or data_loss),
+        "sampled": sampled,
+        "thresholded": thresholded,
+        "data_loss_from_other_row": data_loss,
+        "strategy": "none",
+        "partitions": 1,
+        "inexact_partitions": 0 if not (sampled or data_loss) else 1,
+        "notes": [],
+    }
+
+
+def _dimension_names(body):
+    return [d.get("name") for d in body.get("dimensions", [])]
+
+
+# 加總後的數值轉回 API 的字串格式；整數不可用 :g (只保留 6 位有效數字，會變成 2.46913e+06)
+def _format_number(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _merge(results, additive_merge):
+    first = next((r for r in results if r), {})
+    merged = {
+        "dimensionHeaders": first.get("dimensionHeaders", []),
+        "metricHeaders": first.get("metricHeaders", []),
+        "rows": [],
+    }
+    if not additive_merge:
+        for result in results:
+            merged["rows"].extend((result or {}).get("rows", []))
+    else:
+        totals = {}
+        for result in results:
+            for row in (result or {}).get("rows", []):
+                key = tuple(v.get("value") for v in row.get("dimensionValues", []))
+                sums = totals.setdefault(key, [0.0] * len(merged["metricHeaders"]))
+                for i, value in enumerate(row.get("metricValues", [])):
+                    try:
+                        sums[i] += float(value.get("value", "0"))
+                    except ValueError:
+                        pass
+        for key, sums in totals.items():
+            merged["rows"].append({
+                "dimensionValues": [{"value": v} for v in key],
+                "metricValues": [{"value": _format_number(s)} for s in sums],
+            })
+    merged["rowCount"] = len(merged["rows"])
+    return merged
+
+
+def _split_by_date(token, property_id, body, time_zone, depth, coarse_dimension):
+    if time_zone is None:  # 未取得屬性時區時無法正確解析相對日期
+        return None
+    resolved = resolve_request(body, time_zone)
+    date_range = resolved["dateRanges"][0]
+    start = date.fromisoformat(date_range["startDate"])
+    end = date.fromisoformat(date_range["endDate"])
+    if start >= end:
+        return None
+    middle = start + (end - start) // 2
+    halves = [
+        {**resolved, "dateRanges": [{"startDate": start.isoformat(), "endDate": middle.isoformat()}]},
+        {**resolved, "dateRanges": [{"startDate": (middle + timedelta(days=1)).isoformat(), "endDate": end.isoformat()}]},
+    ]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        parts = list(pool.map(
+            lambda half: run_report_exact(token, property_id, half, coarse_dimension, time_zone, depth - 1),
+            halves))
+    # 含 date 維度時各部分互不重疊，直接串接；否則須依維度值加總 (只會在指標皆可加總時發生)
+    additive_merge = "date" not in _dimension_names(body)
+    return _merge([r for r, _ in parts], additive_merge), [a for _, a in parts], []
+
+
+# 以日期拆分後合併是否精確：含 date 維度，或所有指標皆可跨日期加總
+def _date_split_is_exact(body):
+    metrics = [m.get("name") for m in body.get("metrics", [])]
+    return "date" in _dimension_names(body) or not any(m in NON_ADDITIVE_METRICS for m in metrics)
+
+
+def _split_by_dimension(token, property_id, body, coarse_dimension, time_zone, depth, result):
+    # 粗維度即唯一維度時，原始結果的列已列出所有值，不需再查詢一次
+    if _dimension_names(body) == [coarse_dimension]:
+        values_result = result
+    else:
+        values_body = {**body, "dimensions": [{"name": coarse_dimension}], "limit": 250000}
+        values_body.pop("orderBys", None)
+        values_result = make_ga_report_call(token, property_id, values_body)
+        if values_result is None:
+            return None
+    values = [row["dimensionValues"][0]["value"] for row in values_result.get("rows", [])]
+    notes = []
+    values_accuracy = inspect_result(values_result)
+    if values_accuracy["sampled"] or values_accuracy["data_loss_from_other_row"]:
+        notes.append(f"{coarse_dimension} 的值取自抽樣或含 (other) 列的查詢，可能遺漏罕見的值")
+
+    def with_filter(value):
+        value_filter = {"filter": {"fieldName": coarse_dimension,
+                                   "stringFilter": {"matchType": "EXACT", "value": value}}}
+        existing = body.get("dimensionFilter")
+        combined = {"andGroup": {"expressions": [existing, value_filter]}} if existing else value_filter
+        return {**body, "dimensionFilter": combined}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        parts = list(pool.map(
+            lambda value: run_report_exact(token, property_id, with_filter(value), None, time_zone, depth - 1),
+            values))
+    # 各部分以粗維度值區隔，互不重疊，直接串接即為精確結果 (前提是值的清單完整，見 notes)
+    return _merge([r for r, _ in parts], additive_merge=False), [a for _, a in parts], notes
+
+
+# 執行報表並在需要時自動拆分重跑；回傳 (result, accuracy)。
+# 已取得原始響應時可傳入 initial_result，避免重複發送同一個請求
+def run_report_exact(token, property_id, body, coarse_dimension=None, time_zone='UTC', max_depth=2,
+                     initial_result=None):
+    result = initial_result if initial_result is not None else make_ga_report_call(token, property_id, body)
+    accuracy = inspect_result(result)
+    if result is None or max_depth <= 0 or (not accuracy["sampled"] and not accuracy["data_loss_from_other_row"]):
+        return result, accuracy
+
+    split = None
+    strategy = None
+    if (accuracy["data_loss_from_other_row"] and coarse_dimension
+            and coarse_dimension in _dimension_names(body) and len(_dimension_names(body)) > 1):
+        split = _split_by_dimension(token, property_id, body, coarse_dimension, time_zone, max_depth, result)
+        strategy = "dimension_split"
+    elif accuracy["sampled"] and _date_split_is_exact(body):
+        split = _split_by_date(token, property_id, body, time_zone, max_depth, coarse_dimension)
+        strategy = "date_split"
+    elif accuracy["sampled"] and coarse_dimension and coarse_dimension in _dimension_names(body):
+        split = _split_by_dimension(token, property_id, body, coarse_dimension, time_zone, max_depth, result)
+        strategy = "dimension_split"
+    elif accuracy["sampled"]:
+        accuracy["notes"].append("含不可跨日期加總的指標，無法以日期拆分；保留 GA 的抽樣估計")
+        return result, accuracy
+    if split is None:
+        accuracy["notes"].append("無法再拆分，保留原始結果")
+        return result, accuracy
+
+    merged, part_accuracies, notes = split
+    inexact = sum(a["inexact_partitions"] for a in part_accuracies)
+    thresholded = any(a["thresholded"] for a in part_accuracies)
+    notes = list(dict.fromkeys(notes + [note for a in part_accuracies for note in a["notes"]]))
+    merged_accuracy = {
+        "exact": inexact == 0 and not thresholded and not notes,
+        "sampled": any(a["sampled"] for a in part_accuracies),
+        "thresholded": thresholded,
+        "data_loss_from_other_row": any(a["data_loss_from_other_row"] for a in part_accuracies),
+        "strategy": strategy,
+        "partitions": sum(a["partitions"] for a in part_accuracies),
+        "inexact_partitions": inexact,
+        "notes": notes,
+    }
+    return merged, merged_accuracy
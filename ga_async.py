@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+
+from google.auth import crypt, jwt
+
+from ga_report import DATA_API_BASE, SCOPES, SERVICE_ACCOUNT_FILE
+
+# 非同步用戶端：以 asyncio + HTTP/2 多工 (httpx) 呼叫 Data API、Admin API 與 OAuth 令牌端點。
+# 所有請求共用少數幾條連線，並以 semaphore 限制同時進行的請求數量，
+# 使數百個跨屬性的報表請求能在同一個事件迴圈中以有限記憶體完成。
+#
+# 需要額外安裝: pip install "httpx[http2]" (或 pip install ".[async]")
+
+ADMIN_API_BASE = 'https://analyticsadmin.googleapis.com/v1beta'
+JWT_BEARER_GRANT = 'urn:ietf:params:oauth:grant-type:jwt-bearer'
+TOKEN_REFRESH_MARGIN = 300  # 令牌到期前 5 分鐘即更新
+
+
+class GAAPIError(Exception):
+    def __init__(self, status_code, details):
+        super().__init__(f"API 請求失敗 (狀態碼 {status_code}): {details}")
+        self.status_code = status_code
+        self.details = details
+
+
+class AsyncGAClient:
+    def __init__(self, service_account_file=SERVICE_ACCOUNT_FILE, scopes=SCOPES,
+                 max_connections=4, max_concurrency=100, timeout=30.0):
+        with open(service_account_file, 'r') as f:
+            self._key_data = json.load(f)
+        self._signer = crypt.RSASigner.from_service_account_info(self._key_data)
+        self._scopes = scopes
+        self._max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._timeout = timeout
+        self._token = None
+        self._token_expiry = 0.0
+        self._token_lock = asyncio.Lock()
+        self._http = None
+
+    async def __aenter__(self):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError('AsyncGAClient 需要 httpx[http2]，請先執行: pip install "httpx[http2]"')
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=self._timeout,
+            limits=httpx.Limits(max_connections=self._max_connections,
+                                max_keepalive_connections=self._max_connections),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._http.aclose()
+        self._http = None
+
+    # 以服務帳戶私鑰簽署 JWT 並向令牌端點換取訪問令牌；同時只允許一個更新進行
+    async def get_token(self):
+        if self._token and time.time() < self._token_expiry - TOKEN_REFRESH_MARGIN:
+            return self._token
+        async with self._token_lock:
+            if self._token and time.time() < self._token_expiry - TOKEN_REFRESH_MARGIN:
+                return self._token
+            token_uri = self._key_data.get('token_uri', 'https://oauth2.googleapis.com/token')
+            now = int(time.time())
+            assertion = jwt.encode(self._signer, {
+                'iss': self._key_data['client_email'],
+                'scope': ' '.join(self._scopes),
+                'aud': token_uri,
+                'iat': now,
+                'exp': now + 3600,
+            })
+            response = await self._http.post(token_uri, data={
+                'grant_type': JWT_BEARER_GRANT,
+                'assertion': assertion.decode('utf-8') if isinstance(assertion, bytes) else assertion,
+            })
+            payload = self._check(response)
+            self._token = payload['access_token']
+            self._token_expiry = now + payload.get('expires_in', 3600)
+            return self._token
+
+    # 發送單一請求；deadline (秒) 為此請求的期限 (含等待 semaphore 的時間)，超過時引發 TimeoutError，
+    # 呼叫端取消 task 時也會立即中止並釋放連線
+    async def _request(self, method, url, deadline=None, **kwargs):
+        async with asyncio.timeout(deadline):
+            async with self._semaphore:
+                token = await self.get_token()
+                headers = {'Authorization': f'Bearer {token}'}
+                response = await self._http.request(method, url, headers=headers, **kwargs)
+                return self._check(response)
+
+    async def run_report(self, property_id, request_body, method='runReport', deadline=None):
+        url = f'{DATA_API_BASE}/properties/{property_id}:{method}'
+        return await self._request('POST', url, deadline=deadline, json=request_body)
+
+    async def list_properties(self, account_id, page_token=None, deadline=None):
+        params = {'filter': f'parent:accounts/{account_id}', 'pageSize': 200}
+        if page_token:
+            params['pageToken'] = page_token
+        return await self._request('GET', f'{ADMIN_API_BASE}/properties', deadline=deadline, params=params)
+
+    # 並行執行多個 (property_id, request_body)；失敗的項目以例外物件回傳，不影響其他請求
+    async def run_reports(self, jobs, method='runReport', deadline=None):
+        return await asyncio.gather(
+            *(self.run_report(property_id, body, method=method, deadline=deadline)
+              for property_id, body in jobs),
+            return_exceptions=True,
+        )
+
+    @staticmethod
+    def _check(response):
+        if response.status_code == 200:
+            return response.json()
+        try:
+            details = response.json()
+        except json.JSONDecodeError:
+            details = response.text
+        raise GAAPIError(response.status_code, details)
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import timezone
+
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 本機令牌共用：各 get_*.py 以獨立程序執行時，原本每個程序都各自簽署 JWT 並呼叫
+# oauth2.googleapis.com。此模組以檔案鎖保護的共用快取，讓同一台機器上的所有程序
+# 共用 (服務帳戶, 範圍) 對應的訪問令牌，過期時只由取得鎖的程序更新一次，避免同時大量更新令牌。
+
+CACHE_DIR = os.environ.get('GA_TOKEN_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'ga-api-tool'))
+REFRESH_MARGIN = 300  # 令牌剩餘不到 5 分鐘即視為過期
+
+
+@contextmanager
+def _locked(path):
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SharedTokenCache:
+    def __init__(self, service_account_file, scopes, cache_dir=CACHE_DIR):
+        self.service_account_file = service_account_file
+        self.scopes = list(scopes)
+        with open(service_account_file, 'r') as f:
+            client_email = json.load(f).get('client_email', '')
+        digest = hashlib.sha256(f"{client_email}|{' '.join(sorted(self.scopes))}".encode('utf-8')).hexdigest()[:16]
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        self.token_path = os.path.join(cache_dir, f'token-{digest}.json')
+        self.lock_path = f'{self.token_path}.lock'
+        self.refresh_count = 0  # 本程序實際向令牌端點更新的次數
+
+    def _read(self):
+        try:
+            with open(self.token_path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get('expiry', 0) - REFRESH_MARGIN <= time.time():
+            return None
+        return entry['token']
+
+    def _write(self, token, expiry):
+        tmp_path = f'{self.token_path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'token': token, 'expiry': expiry}, f)
+        os.replace(tmp_path, self.token_path)
+
+    # 先以無鎖方式讀取；需要更新時取得獨占鎖，並在鎖內再檢查一次
+    # (等待鎖的期間其他程序可能已完成更新)
+    def token(self):
+        token = self._read()
+        if token:
+            return token
+        with _locked(self.lock_path):
+            token = self._read()
+            if token:
+                return token
+            credentials = service_account.Credentials.from_service_account_file(
+                self.service_account_file, scopes=self.scopes)
+            credentials.refresh(Request())
+            self.refresh_count += 1
+            expiry = credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+            self._write(credentials.token, expiry)
+            return credentials.token
@@ -0,0 +1,203 @@
+import json
+import math
+import os
+from array import array
+
+from ga_columns import ReportColumns
+from ga_snapshot import Snapshot, write_snapshot
+
+# 變更資料輸出 (change data)：保存每個報表上一次的結果 (以維度值組合為鍵)，
+# 之後每次只輸出新增 (insert)、變更 (update) 與消失 (delete) 的列，下游只需處理變動部分。
+# 第一次執行或每 checkpoint_every 次執行輸出一次完整快照 (op=snapshot)，下游可據此整份重建。
+#
+# 上一次的結果存為 ga_snapshot 快照 (<報表>.snap)：鍵欄位與文字欄位為維度、數值欄位為指標，
+# 比較時以 mmap 讀取，不必 json.load 整份結果；旁邊的 <報表>.json 只記錄鍵欄位、執行次數與
+# 各欄位型別 (int/float/str)，用來把快照的值還原成與輸出列相同的型別。
+#
+#   GA_CHANGES=1            啟用變更輸出 (預設輸出完整結果)
+#   GA_CHECKPOINT_EVERY=N   每 N 次執行輸出一次完整快照 (預設 0：只有第一次)
+
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+CHANGES_ENABLED = os.environ.get('GA_CHANGES') == '1'
+CHECKPOINT_EVERY = int(os.environ.get('GA_CHECKPOINT_EVERY', '0'))
+OP_LABELS = {"op": "變更"}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# 欄位型別：全為整數 -> int，全為數值 -> float，其餘 -> str (缺值不影響判斷)
+def _field_kind(values):
+    present = [v for v in values if v is not None]
+    if all(_is_number(v) and not isinstance(v, float) for v in present):
+        return 'int'
+    if all(_is_number(v) for v in present):
+        return 'float'
+    return 'str'
+
+
+def _as_text(value):
+    return '' if value is None else str(value)
+
+
+class ChangeTracker:
+    def __init__(self, report_name, key_fields, property_id='default',
+                 checkpoint_every=CHECKPOINT_EVERY, cache_dir=CACHE_DIR):
+        self.report_name = report_name
+        self.key_fields = list(key_fields)
+        self.checkpoint_every = checkpoint_every
+        base = os.path.join(cache_dir, 'changes', str(property_id), report_name)
+        self.path = f'{base}.snap'
+        self.state_path = f'{base}.json'
+        self._pending = None
+        self._snapshot = None
+        state = self._load_state()
+        # 鍵欄位改變時舊快照無法比較，視同第一次執行
+        if state is not None and state.get("key_fields") != self.key_fields:
+            state = None
+        self.runs = state["runs"] if state else 0
+        self.fields = [tuple(field) for field in state["fields"]] if state else []  # [(名稱, 型別)]
+        # 快照在第一次比較時才開啟，commit() 後關閉
+        self._has_previous = state is not None
+        self._opened = False
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    # 開啟上一次的快照並建立 鍵 -> 列索引；快照遺失或毀損時視同第一次執行
+    def _open_previous(self):
+        if self._opened:
+            return
+        self._opened = True
+        if not self._has_previous:
+            return
+        try:
+            self._snapshot = Snapshot(self.path)
+        except (OSError, ValueError):
+            return
+        codes = [self._snapshot.codes(field) for field in self.key_fields]
+        self._lookups = {field: {value: code for code, value in enumerate(self._snapshot.dictionary(field))}
+                         for field in self.key_fields}
+        if codes:
+            self._index = {key: i for i, key in enumerate(zip(*codes))}
+        else:
+            self._index = {(): i for i in range(self._snapshot.row_count)}  # 沒有維度的報表只有一列
+        for view in codes:
+            view.release()
+        self._metrics = {name: self._snapshot.metric(name) for name, kind in self.fields if kind != 'str'}
+
+    def close(self):
+        if self._snapshot is not None:
+            for view in self._metrics.values():
+                view.release()
+            self._snapshot.close()
+            self._snapshot = None
+        self._opened = False
+
+    def _previous_key(self, row):
+        key = []
+        for field in self.key_fields:
+            code = self._lookups[field].get(_as_text(row.get(field)))
+            if code is None:
+                return None
+            key.append(code)
+        return tuple(key)
+
+    # 由快照還原上一次的列 (型別與輸出列相同；缺值的數值欄位不列出)
+    def _previous_row(self, i):
+        row = {}
+        for name, kind in self.fields:
+            if kind == 'str':
+                row[name] = self._snapshot.value(name, i)
+                continue
+            value = self._metrics[name][i]
+            if not math.isnan(value):
+                row[name] = int(value) if kind == 'int' else value
+        return row
+
+    def is_checkpoint(self):
+        self._open_previous()
+        if self._snapshot is None:
+            return True
+        return self.checkpoint_every > 0 and (self.runs + 1) % self.checkpoint_every == 0
+
+    # 與上一次快照比較，回傳變更列 ({"op": ..., **列})；delete 列為上一次的值。
+    # 快照要等 commit() 後才會寫入，輸出失敗時下次執行仍會與舊快照比較
+    def diff(self, rows):
+        current = {}
+        for row in rows:
+            current[tuple(_as_text(row.get(field)) for field in self.key_fields)] = row
+        checkpoint = self.is_checkpoint()
+        changes = []
+        if checkpoint:
+            changes = [{"op": "snapshot", **row} for row in current.values()]
+        else:
+            matched = set()
+            for row in current.values():
+                key = self._previous_key(row)
+                i = self._index.get(key) if key is not None else None
+                if i is None:
+                    changes.append({"op": "insert", **row})
+                    continue
+                matched.add(i)
+                if self._previous_row(i) != row:
+                    changes.append({"op": "update", **row})
+            for i in range(self._snapshot.row_count):
+                if i not in matched:
+                    changes.append({"op": "delete", **self._previous_row(i)})
+        self._pending = list(current.values())
+        return changes
+
+    # 以輸出列建立快照欄位：鍵欄位與文字欄位為維度，數值欄位為指標 (缺值存為 NaN)
+    def _columns(self, rows):
+        names = list(self.key_fields)
+        for row in rows:
+            names.extend(name for name in row if name not in names)
+        fields = [(name, 'str' if name in self.key_fields else _field_kind(row.get(name) for row in rows))
+                  for name in names]
+        dimensions = [name for name, kind in fields if kind == 'str']
+        metrics = [name for name, kind in fields if kind != 'str']
+        dictionaries = {name: [] for name in dimensions}
+        codes = {name: array('l') for name in dimensions}
+        lookups = {name: {} for name in dimensions}
+        values = {name: array('d') for name in metrics}
+        for row in rows:
+            for name in dimensions:
+                value = _as_text(row.get(name))
+                code = lookups[name].get(value)
+                if code is None:
+                    code = lookups[name][value] = len(dictionaries[name])
+                    dictionaries[name].append(value)
+                codes[name].append(code)
+            for name in metrics:
+                value = row.get(name)
+                values[name].append(math.nan if value is None else float(value))
+        return fields, ReportColumns(dimensions, metrics, dictionaries, codes, values)
+
+    def commit(self):
+        if self._pending is None:
+            return
+        self.runs += 1
+        fields, columns = self._columns(self._pending)
+        # 先關閉舊快照 (Windows 無法取代開啟中的檔案) 再以原子替換寫入新快照與狀態
+        self.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        write_snapshot(self.path, columns)
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key_fields": self.key_fields, "runs": self.runs, "fields": fields}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+        self.fields, self._pending = fields, None
+        self._has_previous = True
+
+
+# 依 GA_CHANGES 回傳 ChangeTracker；未啟用時回傳 None (輸出完整結果)
+def change_tracker(report_name, key_fields, property_id='default'):
+    if not CHANGES_ENABLED:
+        return None
+    return ChangeTracker(report_name, key_fields, property_id)
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+
+from ga_async import GAAPIError
+from ga_dates import cache_key, lookup_time_zone, resolve_request
+from ga_output import iter_rows
+from ga_report import DATA_API_BASE, TokenProvider
+from ga_transfer import compressed_headers, fields_params, record_transfer
+
+# 函式庫介面：供服務在程序內直接呼叫，不必再以子程序執行 get_*.py 並解析輸出。
+#
+#   client = GAClient(property_id)
+#   result = client.run_report({"dateRanges": [...], "dimensions": [...], "metrics": [...]})
+#   for row in result: ...
+#
+# 結果以「屬性 + 方法 + 正規化請求內容」為鍵記憶在程序內 (TTL + 筆數上限的 LRU)，
+# 可由多個執行緒共用；相對日期 (today、7daysAgo) 先依屬性時區解析，跨日後不會取到前一天的結果。
+# 同一個鍵同時有多個請求時只會送出一次 API 請求，其他呼叫等待同一個結果。
+# 失敗時丟出 GAAPIError，不再印出錯誤並回傳 None。
+#
+#   GA_CLIENT_CACHE_TTL       快取有效秒數 (預設 300)
+#   GA_CLIENT_CACHE_ENTRIES   快取筆數上限 (預設 1024)
+
+CACHE_TTL = float(os.environ.get('GA_CLIENT_CACHE_TTL', '300'))
+CACHE_ENTRIES = int(os.environ.get('GA_CLIENT_CACHE_ENTRIES', '1024'))
+REQUEST_TIMEOUT = 60
+
+
+# 報表結果；快取中的同一個 Result 會交給多個呼叫端，請勿修改其內容
+class Result:
+    __slots__ = ('property_id', 'dimensions', 'metrics', 'rows', 'row_count', 'metadata', 'raw', 'fetched_at')
+
+    def __init__(self, property_id, raw, fetched_at):
+        self.property_id = property_id
+        self.raw = raw
+        self.dimensions = tuple(h.get("name") for h in raw.get("dimensionHeaders", []))
+        self.metrics = tuple(h.get("name") for h in raw.get("metricHeaders", []))
+        self.rows = tuple(iter_rows(raw, typed=True))
+        self.row_count = raw.get("rowCount", len(self.rows))
+        self.metadata = raw.get("metadata", {})
+        self.fetched_at = fetched_at
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name):
+        return [row.get(name) for row in self.rows]
+
+    def to_columns(self):
+        from ga_columns import ReportColumns
+        return ReportColumns.from_response(self.raw)
+
+
+# 執行緒安全、具 TTL 與筆數上限的 LRU 快取
+class ReportCache:
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # 鍵 -> (到期時間, 值)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class GAClient:
+    # time_zone 未指定時依屬性索引 (Admin API) 查詢各屬性的時區，每個屬性只查詢一次
+    def __init__(self, property_id=None, token_provider=None, time_zone=None, cache=None):
+        self.property_id = str(property_id) if property_id is not None else None
+        self.token_provider = token_provider or TokenProvider()
+        self.time_zone = time_zone
+        self.cache = cache or ReportCache()
+        self._time_zones = {}
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    # 查詢失敗 (例如金鑰沒有 Admin API 權限) 時回傳 None，且不記憶失敗，下次呼叫會再查詢
+    def property_time_zone(self, property_id):
+        if self.time_zone:
+            return self.time_zone
+        time_zone = self._time_zones.get(property_id)
+        if time_zone is None:
+            try:
+                time_zone = lookup_time_zone(property_id, self.token_provider)
+            except ValueError:
+                return None
+            self._time_zones[property_id] = time_zone
+        return time_zone
+
+    def _fetch(self, property_id, body, method):
+        url = f'{DATA_API_BASE}/properties/{property_id}:{method}'
+        response = requests.post(url, headers=compressed_headers(self.token_provider.token()), json=body,
+                                 params=fields_params(method, body), timeout=REQUEST_TIMEOUT)
+        record_transfer(method, response)
+        if response.status_code != 200:
+            try:
+                details = response.json()
+            except ValueError:
+                details = response.text
+            raise GAAPIError(response.status_code, details)
+        return Result(property_id, response.json(), time.time())
+
+    # 執行報表並回傳 Result；use_cache=False 時略過快取 (結果仍會存入快取)，ttl 可覆寫預設有效秒數
+    def run_report(self, spec, property_id=None, method='runReport', use_cache=True, ttl=None):
+        property_id = str(property_id or self.property_id or '')
+        if not property_id:
+            raise ValueError("未指定 GA4 屬性 ID")
+        # 送出的請求與快取鍵都使用依屬性時區解析後的絕對日期；無法取得時區時送出未解析的請求
+        # (由 GA 以屬性時區解讀)，相對日期的結果跨日後即過期，因此不存入快取
+        time_zone = self.property_time_zone(property_id) if spec.get("dateRanges") else None
+        body = resolve_request(spec, time_zone) if time_zone else dict(spec)
+        cacheable = time_zone is not None or not spec.get("dateRanges")
+        key = (method, cache_key(property_id, body))
+        if use_cache and cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = self._fetch(property_id, body, method)
+            if cacheable:
+                self.cache.put(key, result, ttl)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def run_realtime_report(self, spec, property_id=None, ttl=60):
+        return self.run_report(spec, property_id, method='runRealtimeReport', ttl=ttl)
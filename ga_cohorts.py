@@ -0,0 +1,149 @@
+import json
+import os
+from datetime import timedelta
+
+from ga_dates import FINAL_AFTER_DAYS, property_today
+from ga_report import make_ga_report_call
+
+# 同類群組 (cohort) 留存報表：以 GA4 cohortSpec 取得每日或每週同類群組的留存格，
+# 格子存於本地；已定案的格子不再變動，之後每天只查詢仍可能變動的群組與位移範圍。
+# 每個群組只追蹤 horizon 個位移 (天或週)，因此一年的留存矩陣每天只需一次小範圍的增量請求，
+# 不必整個重建。
+
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+
+_GRANULARITY = {
+    'DAILY': {'days': 1, 'offset_dimension': 'cohortNthDay'},
+    'WEEKLY': {'days': 7, 'offset_dimension': 'cohortNthWeek'},
+}
+
+
+class CohortRunner:
+    def __init__(self, property_id, granularity='DAILY', horizon=30, time_zone='UTC', cache_dir=CACHE_DIR):
+        if granularity not in _GRANULARITY:
+            raise ValueError(f"不支援的粒度: {granularity} (可用: {', '.join(_GRANULARITY)})")
+        self.property_id = str(property_id)
+        self.granularity = granularity
+        self.period_days = _GRANULARITY[granularity]['days']
+        self.offset_dimension = _GRANULARITY[granularity]['offset_dimension']
+        self.horizon = horizon
+        self.time_zone = time_zone
+        self.path = os.path.join(cache_dir, 'cohorts', self.property_id, f'{granularity.lower()}.json')
+        # 群組起始日 (ISO) -> {位移 (字串): {"active", "total", "final"}}
+        self.cells = self._load()
+        # 每請求的群組數：涵蓋每日增量更新時所有含未定案格子的群組 (horizon 個位移加上
+        # FINAL_AFTER_DAYS 天的定案延遲)，使每天只需一個請求；只有首次回補才會分批
+        self.cohorts_per_request = horizon + FINAL_AFTER_DAYS + 1
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cells, f)
+        os.replace(tmp_path, self.path)
+
+    def _cohort_starts(self, first_cohort, today):
+        if self.granularity == 'WEEKLY':
+            # GA 的 cohortNthWeek 以週日到週六為一週，群組起始日對齊至週日
+            first_cohort -= timedelta(days=(first_cohort.weekday() + 1) % 7)
+        start = first_cohort
+        while start <= today:
+            yield start
+            start += timedelta(days=self.period_days)
+
+    # 位移 n 的期間結束日
+    def _cell_end(self, cohort_start, offset):
+        return cohort_start + timedelta(days=self.period_days * (offset + 1) - 1)
+
+    # 找出仍需查詢的 (群組, 位移)：已開始但尚未定案的格子
+    def pending_cells(self, first_cohort, today):
+        final_before = today - timedelta(days=FINAL_AFTER_DAYS)
+        pending = {}
+        for cohort_start in self._cohort_starts(first_cohort, today):
+            stored = self.cells.get(cohort_start.isoformat(), {})
+            for offset in range(self.horizon):
+                cell_start = cohort_start + timedelta(days=self.period_days * offset)
+                if cell_start > today:
+                    break
+                cell = stored.get(str(offset))
+                if cell is None or not cell.get("final"):
+                    pending.setdefault(cohort_start, []).append(offset)
+        return pending, final_before
+
+    def _request_body(self, cohort_starts, start_offset, end_offset):
+        cohorts = []
+        for cohort_start in cohort_starts:
+            cohort_end = cohort_start + timedelta(days=self.period_days - 1)
+            cohorts.append({
+                "name": cohort_start.isoformat(),
+                "dimension": "firstSessionDate",
+                "dateRange": {"startDate": cohort_start.isoformat(), "endDate": cohort_end.isoformat()}
+            })
+        return {
+            "dimensions": [{"name": "cohort"}, {"name": self.offset_dimension}],
+            "metrics": [{"name": "cohortActiveUsers"}, {"name": "cohortTotalUsers"}],
+            "cohortSpec": {
+                "cohorts": cohorts,
+                "cohortsRange": {"granularity": self.granularity,
+                                 "startOffset": start_offset, "endOffset": end_offset}
+            }
+        }
+
+    # 增量更新：只查詢含未定案格子的群組，位移範圍取其最小到最大；回傳發送的請求數
+    def refresh(self, token, first_cohort, today=None):
+        today = today or property_today(self.time_zone)
+        pending, final_before = self.pending_cells(first_cohort, today)
+        if not pending:
+            return 0
+
+        requests_sent = 0
+        cohort_starts = sorted(pending)
+        for i in range(0, len(cohort_starts), self.cohorts_per_request):
+            batch = cohort_starts[i:i + self.cohorts_per_request]
+            start_offset = min(min(pending[c]) for c in batch)
+            end_offset = max(max(pending[c]) for c in batch)
+            result = make_ga_report_call(token, self.property_id,
+                                         self._request_body(batch, start_offset, end_offset),
+                                         report_type='cohorts')
+            requests_sent += 1
+            if result is None:
+                continue
+            fetched = {}
+            for row in result.get("rows", []):
+                cohort, offset = (v.get("value") for v in row.get("dimensionValues", []))
+                metrics = row.get("metricValues", [])
+                fetched[(cohort, int(offset))] = (int(metrics[0].get("value", "0")),
+                                                  int(metrics[1].get("value", "0")))
+            # GA 省略沒有活躍使用者的格子；這些格子的 active 為 0，total 取同群組已知的 cohortTotalUsers
+            totals = {cohort: total for (cohort, _), (_, total) in fetched.items() if total}
+            for cohort_start in batch:
+                stored = self.cells.setdefault(cohort_start.isoformat(), {})
+                known_total = totals.get(cohort_start.isoformat()) or max(
+                    (cell.get("total", 0) for cell in stored.values()), default=0)
+                for offset in pending[cohort_start]:
+                    active, total = fetched.get((cohort_start.isoformat(), offset), (0, known_total))
+                    stored[str(offset)] = {
+                        "active": active,
+                        "total": total,
+                        "final": self._cell_end(cohort_start, offset) < final_before,
+                    }
+        self._save()
+        return requests_sent
+
+    # 留存矩陣：{群組起始日: [位移 0..horizon-1 的留存率 (cohortActiveUsers / cohortTotalUsers)，尚無資料為 None]}
+    def retention_matrix(self):
+        matrix = {}
+        for cohort, stored in sorted(self.cells.items()):
+            row = []
+            for offset in range(self.horizon):
+                cell = stored.get(str(offset))
+                row.append(cell["active"] / cell["total"] if cell and cell["total"] else None)
+            matrix[cohort] = row
+        return matrix
@@ -0,0 +1,158 @@
+import heapq
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為選用套件；未安裝時以 array 逐列計算
+    np = None
+
+# 欄式報表結果與本地彙總：一次完整查詢後，於本地計算分組加總、加權平均與各組 Top-K，
+# 取代以 orderBys/limit 讓伺服器排序截斷、每種視圖各發一次請求的做法。
+
+
+class ReportColumns:
+    def __init__(self, dimensions, metrics, dictionaries, codes, values):
+        self.dimensions = list(dimensions)
+        self.metrics = list(metrics)
+        self.dictionaries = dictionaries  # 維度名稱 -> 代碼表 (代碼 -> 字串)
+        self.codes = codes                # 維度名稱 -> array('l') 每列的代碼
+        self.values = values              # 指標名稱 -> array('d') 每列的數值
+        # 只有維度的報表 (沒有指標) 以代碼欄位的長度為列數
+        if self.metrics:
+            self.row_count = len(values[self.metrics[0]])
+        else:
+            self.row_count = len(codes[self.dimensions[0]]) if self.dimensions else 0
+
+    @classmethod
+    def from_response(cls, result):
+        dimensions = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        metrics = [h.get("name") for h in result.get("metricHeaders", [])]
+        dictionaries = {d: [] for d in dimensions}
+        lookups = {d: {} for d in dimensions}
+        codes = {d: array('l') for d in dimensions}
+        values = {m: array('d') for m in metrics}
+
+        for row in result.get("rows", []):
+            dim_values = row.get("dimensionValues", [])
+            for i, dim in enumerate(dimensions):
+                value = dim_values[i].get("value", "") if i < len(dim_values) else ""
+                code = lookups[dim].get(value)
+                if code is None:
+                    code = lookups[dim][value] = len(dictionaries[dim])
+                    dictionaries[dim].append(value)
+                codes[dim].append(code)
+            metric_values = row.get("metricValues", [])
+            for i, metric in enumerate(metrics):
+                try:
+                    values[metric].append(float(metric_values[i].get("value", "0")))
+                except (IndexError, ValueError):
+                    values[metric].append(0.0)  # 如果轉換失敗，預設為 0
+        return cls(dimensions, metrics, dictionaries, codes, values)
+
+    def column(self, dimension):
+        dictionary = self.dictionaries[dimension]
+        return [dictionary[code] for code in self.codes[dimension]]
+
+    def rows(self):
+        for i in range(self.row_count):
+            row = {d: self.dictionaries[d][self.codes[d][i]] for d in self.dimensions}
+            for m in self.metrics:
+                row[m] = self.values[m][i]
+            yield row
+
+
+# 將多個維度的代碼合併為單一分組 ID；回傳 (每列分組 ID, 分組數, 各維度的 stride)
+def _group_ids(columns, keys):
+    strides = []
+    n_groups = 1
+    for key in reversed(keys):
+        strides.insert(0, n_groups)
+        n_groups *= max(len(columns.dictionaries[key]), 1)
+    if np is not None:
+        ids = np.zeros(columns.row_count, dtype=np.int64)
+        for key, stride in zip(keys, strides):
+            ids += np.frombuffer(columns.codes[key], dtype=np.dtype('l')).astype(np.int64) * stride
+        return ids, n_groups, strides
+    ids = array('q', bytes(8 * columns.row_count))
+    for key, stride in zip(keys, strides):
+        key_codes = columns.codes[key]
+        for i in range(columns.row_count):
+            ids[i] += key_codes[i] * stride
+    return ids, n_groups, strides
+
+
+def _bincount(ids, weights, n_groups):
+    if np is not None:
+        weights = np.frombuffer(weights, dtype=np.float64) if isinstance(weights, array) else weights
+        return np.bincount(ids, weights=weights, minlength=n_groups)
+    sums = [0.0] * n_groups
+    for group, weight in zip(ids, weights):
+        sums[group] += weight
+    return sums
+
+
+def _build_groups(columns, keys, metric_sums, counts, n_groups, strides):
+    present = [g for g in range(n_groups) if counts[g]]
+    codes = {}
+    dictionaries = {}
+    for key, stride in zip(keys, strides):
+        size = max(len(columns.dictionaries[key]), 1)
+        codes[key] = array('l', ((g // stride) % size for g in present))
+        dictionaries[key] = columns.dictionaries[key]
+    values = {m: array('d', (float(sums[g]) for g in present)) for m, sums in metric_sums.items()}
+    return ReportColumns(keys, list(metric_sums), dictionaries, codes, values)
+
+
+# 依 keys 分組並加總 metrics (activeUsers 等不重複使用者指標加總後為上限估計)
+def group_by_sum(columns, keys, metrics=None):
+    metrics = metrics or columns.metrics
+    ids, n_groups, strides = _group_ids(columns, keys)
+    counts = _bincount(ids, [1.0] * columns.row_count if np is None else None, n_groups)
+    sums = {m: _bincount(ids, columns.values[m], n_groups) for m in metrics}
+    return _build_groups(columns, keys, sums, counts, n_groups, strides)
+
+
+# 分組加權平均，例如 averageSessionDuration 以 sessions 為權重
+def weighted_mean(columns, keys, metric, weight):
+    ids, n_groups, strides = _group_ids(columns, keys)
+    if np is not None:
+        values = np.frombuffer(columns.values[metric], dtype=np.float64)
+        weights = np.frombuffer(columns.values[weight], dtype=np.float64)
+        weighted = np.bincount(ids, weights=values * weights, minlength=n_groups)
+        totals = np.bincount(ids, weights=weights, minlength=n_groups)
+        counts = np.bincount(ids, minlength=n_groups)
+        means = np.divide(weighted, totals, out=np.zeros_like(weighted), where=totals > 0)
+    else:
+        weighted = _bincount(ids, [v * w for v, w in zip(columns.values[metric], columns.values[weight])], n_groups)
+        totals = _bincount(ids, columns.values[weight], n_groups)
+        counts = _bincount(ids, [1.0] * columns.row_count, n_groups)
+        means = [w / t if t else 0.0 for w, t in zip(weighted, totals)]
+    return _build_groups(columns, keys, {metric: means, weight: totals}, counts, n_groups, strides)
+
+
+# 各組依 metric 取前 k 列 (以 heap 選取)；group 為 None 時即整體 Top-K
+def top_k(columns, metric, k, group=None):
+    values = columns.values[metric]
+    if group is None:
+        indices = heapq.nlargest(k, range(columns.row_count), key=values.__getitem__)
+        return [_row_at(columns, i) for i in indices]
+
+    buckets = {}
+    for i, code in enumerate(columns.codes[group]):
+        heap = buckets.setdefault(code, [])
+        if len(heap) < k:
+            heapq.heappush(heap, (values[i], -i))
+        elif values[i] > heap[0][0]:
+            heapq.heapreplace(heap, (values[i], -i))
+    result = {}
+    for code, heap in buckets.items():
+        ordered = sorted(heap, reverse=True)
+        result[columns.dictionaries[group][code]] = [_row_at(columns, -i) for _, i in ordered]
+    return result
+
+
+def _row_at(columns, i):
+    row = {d: columns.dictionaries[d][columns.codes[d][i]] for d in columns.dimensions}
+    for m in columns.metrics:
+        row[m] = columns.values[m][i]
+    return row
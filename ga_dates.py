@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from ga_report import fetch_full_report
+
+# 時區感知的日期解析：GA 以屬性時區解讀 7daysAgo/today 等相對日期，同一個請求內容在不同時間
+# 代表不同的日期，快取鍵因此失去意義。此模組依屬性時區 (Admin API，見 ga_properties)
+# 將相對日期改寫為絕對日期，並以「屬性當地日期」分割儲存每日資料，只補抓缺少或尚未定案的日期。
+
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+FINAL_AFTER_DAYS = 2  # GA 資料處理可能延遲，超過此天數的日期才視為不再變動
+_DAYS_AGO = re.compile(r'^(\d+)daysAgo$')
+
+
+def property_today(time_zone, now=None):
+    now = now or datetime.now(ZoneInfo('UTC'))
+    return now.astimezone(ZoneInfo(time_zone)).date()
+
+
+def resolve_date(value, today):
+    if value == 'today':
+        return today.isoformat()
+    if value == 'yesterday':
+        return (today - timedelta(days=1)).isoformat()
+    match = _DAYS_AGO.match(value)
+    if match:
+        return (today - timedelta(days=int(match.group(1)))).isoformat()
+    return date.fromisoformat(value).isoformat()
+
+
+# 回傳 dateRanges 已改寫為絕對日期的請求副本
+def resolve_request(request_body, time_zone, now=None):
+    today = property_today(time_zone, now)
+    body = dict(request_body)
+    body["dateRanges"] = [
+        {**r, "startDate": resolve_date(r["startDate"], today), "endDate": resolve_date(r["endDate"], today)}
+        for r in request_body.get("dateRanges", [])
+    ]
+    return body
+
+
+def property_time_zone(property_index, property_id):
+    prop = property_index.get(property_id)
+    if prop is None and property_index.validate(property_id):
+        prop = property_index.get(property_id)
+    if prop is None or not prop.get('time_zone'):
+        raise ValueError(f"找不到屬性 {property_id} 的時區")
+    return prop['time_zone']
+
+
+# 以屬性索引查詢時區；無法查詢 (例如金鑰沒有 Admin API 權限) 時引發 ValueError，
+# 不以 UTC 代替：日期錯位的結果會被當成定案資料快取。呼叫端可改為直接送出未解析的請求
+def lookup_time_zone(property_id, token_provider=None):
+    from ga_properties import PropertyIndex
+    try:
+        return property_time_zone(PropertyIndex(token_provider), property_id)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"無法取得屬性 {property_id} 的時區 ({e})") from e
+
+
+# 已解析請求的快取鍵：屬性 ID + 排序後的請求內容
+def cache_key(property_id, resolved_body):
+    canonical = json.dumps({"property": str(property_id), "body": resolved_body},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DailyPartitionStore:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.root = os.path.join(cache_dir, 'partitions')
+
+    # 分割目錄以「不含日期區間」的請求內容識別，同一報表的不同日期區間共用分割
+    def _report_dir(self, property_id, request_body):
+        shape = {k: v for k, v in request_body.items() if k != "dateRanges"}
+        return os.path.join(self.root, str(property_id), cache_key(property_id, shape)[:16])
+
+    def load(self, property_id, request_body, day):
+        path = os.path.join(self._report_dir(property_id, request_body), f'{day.isoformat()}.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    # headers 為響應的 dimensionHeaders/metricHeaders，全部日期都來自快取時用來組成結果
+    def store(self, property_id, request_body, day, rows, final, headers):
+        directory = self._report_dir(property_id, request_body)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{day.isoformat()}.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"final": final, "headers": headers, "rows": rows}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+# 增量同步：解析日期區間後，只為缺少或尚未定案的日期發送一次請求 (加上 date 維度)，
+# 結果依屬性當地日期存入分割；回傳與 runReport 響應相同形狀的結果 (每列帶有 date 維度，依日期排序)
+def fetch_daily(token, property_id, request_body, time_zone, store=None, now=None, report_type='daily'):
+    store = store or DailyPartitionStore()
+    resolved = resolve_request(request_body, time_zone, now)
+    date_range = resolved["dateRanges"][0]
+    start = date.fromisoformat(date_range["startDate"])
+    end = date.fromisoformat(date_range["endDate"])
+    final_before = property_today(time_zone, now) - timedelta(days=FINAL_AFTER_DAYS)
+
+    partitions = {}
+    headers = None
+    missing = []
+    for day in _days(start, end):
+        cached = store.load(property_id, request_body, day)
+        if cached is not None and cached.get("final"):
+            partitions[day] = cached["rows"]
+            headers = cached["headers"]
+        else:
+            missing.append(day)
+
+    if missing:
+        dimensions = list(request_body.get("dimensions", []))
+        if {"name": "date"} not in dimensions:
+            dimensions = [{"name": "date"}] + dimensions
+        # 單次請求預設只回傳 10,000 列，以分頁取得完整結果；依維度排序讓分頁順序穩定
+        body = {**resolved, "dimensions": dimensions,
+                "dateRanges": [{"startDate": min(missing).isoformat(), "endDate": max(missing).isoformat()}],
+                "orderBys": [{"dimension": {"dimensionName": d["name"]}} for d in dimensions]}
+        body.pop("limit", None)
+        body.pop("offset", None)
+        result = fetch_full_report(token, property_id, body, report_type=report_type)
+        # 仍未取得所有列時不可將分割標示為定案，否則截斷的結果會被永久快取
+        complete = int(result.get("rowCount", 0)) <= len(result["rows"])
+        if not complete:
+            print(f"警告：屬性 {property_id} 的每日資料不完整 ({len(result['rows'])}/{result.get('rowCount')} 列)，本次不標示為定案")
+        headers = {"dimensionHeaders": result.get("dimensionHeaders", []),
+                   "metricHeaders": result.get("metricHeaders", [])}
+        date_index = [h.get("name") for h in headers["dimensionHeaders"]].index("date")
+        fetched = {day: [] for day in missing}
+        for row in result.get("rows", []):
+            raw = row["dimensionValues"][date_index]["value"]
+            day = date(int(raw[:4]), int(raw[4:6]), int(raw[6:8]))
+            if day in fetched:
+                fetched[day].append(row)
+        for day, rows in fetched.items():
+            store.store(property_id, request_body, day, rows, complete and day < final_before, headers)
+            partitions[day] = rows
+
+    rows = [row for day in sorted(partitions) for row in partitions[day]]
+    return {**headers, "rows": rows, "rowCount": len(rows)}
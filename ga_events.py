@@ -0,0 +1,46 @@
+# 事件指標管線：以單一 eventName 維度報表搭配 inListFilter 取得所有關注事件，
+# 再於本地拆分，取代每個事件各發一次 EXACT dimensionFilter 請求的做法。
+# 追蹤的事件數量增加時，請求數仍維持一次。
+
+
+def build_event_breakdown_request(events, metrics=('activeUsers', 'eventCount'),
+                                  start_date='7daysAgo', end_date='today'):
+    return {
+        "dateRanges": [{"startDate": start_date, "endDate": end_date}],
+        "dimensions": [{"name": "eventName"}],
+        "metrics": [{"name": name} for name in metrics],
+        "dimensionFilter": {
+            "filter": {
+                "fieldName": "eventName",
+                "inListFilter": {
+                    "values": list(events),
+                    "caseSensitive": True
+                }
+            }
+        },
+        # 確保所有事件都會出現在結果中，即使事件數量很多
+        "limit": max(len(events), 1)
+    }
+
+
+# 將結果拆成 {事件名稱: {指標名稱: 數值}}；未出現在結果中的事件各指標記為 0
+def split_event_metrics(result, events):
+    metrics = [h.get("name") for h in (result or {}).get("metricHeaders", [])]
+    per_event = {event: {metric: 0 for metric in metrics} for event in events}
+    for row in (result or {}).get("rows", []):
+        event = row.get("dimensionValues", [{}])[0].get("value")
+        if event not in per_event:
+            continue
+        for metric, metric_value in zip(metrics, row.get("metricValues", [])):
+            try:
+                per_event[event][metric] = int(metric_value.get("value", "0"))
+            except ValueError:
+                per_event[event][metric] = float(metric_value.get("value", "0"))
+    return per_event
+
+
+# 從環境變數 (逗號分隔) 讀取要追蹤的事件清單
+def events_from_env(value, default):
+    if not value:
+        return list(default)
+    return [event.strip() for event in value.split(',') if event.strip()]
@@ -0,0 +1,170 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ga_report import DATA_API_BASE, SERVICE_ACCOUNT_FILE, SCOPES, TokenProvider
+from ga_transfer import compressed_headers, fields_params, record_transfer
+
+# 多服務帳戶金鑰池：GA Data API 的配額以「GCP 專案 x 屬性」計算，所有流量共用一把金鑰時
+# 就只有一份配額。此模組讓多把 (分屬不同專案的) 金鑰各自持有令牌快取與配額追蹤，
+# 每個請求依各金鑰對該屬性的剩餘配額加權隨機挑選金鑰，剩餘越多被選中的機會越大；
+# 配額用盡 (429) 的金鑰在下個整點前不再使用，無權限 (403) 的金鑰改用其他金鑰重試。
+#
+#   GA_SERVICE_ACCOUNT_FILES=a.json,b.json   金鑰檔案清單 (以逗號或路徑分隔符號分隔)
+
+KEY_FILES_ENV = 'GA_SERVICE_ACCOUNT_FILES'
+# 尚未取得配額資訊時假設的剩餘值 (標準屬性每專案每小時 14,000 個權杖)
+DEFAULT_REMAINING = 14000
+# 同一專案對同一屬性的同時請求上限
+MAX_CONCURRENT = 10
+# 以此配額中最少的剩餘量作為金鑰的權重
+_QUOTA_NAMES = ('tokensPerDay', 'tokensPerHour', 'tokensPerProjectPerHour')
+
+
+class NoAvailableKeyError(RuntimeError):
+    pass
+
+
+def key_files_from_env():
+    raw = os.environ.get(KEY_FILES_ENV, '')
+    files = [part.strip() for part in raw.replace(os.pathsep, ',').split(',') if part.strip()]
+    return files or [SERVICE_ACCOUNT_FILE]
+
+
+def _next_hour(now):
+    return (int(now) // 3600 + 1) * 3600
+
+
+# 單一金鑰對各屬性的配額狀態；以響應中的 propertyQuota 更新，每小時配額在整點後失效
+class QuotaTracker:
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._remaining = {}    # 屬性 ID -> (觀測時間, 剩餘權杖)
+        self._blocked = {}      # 屬性 ID -> 恢復時間 (配額用盡或無權限)
+        self._in_flight = {}    # 屬性 ID -> 進行中的請求數
+
+    def update(self, property_id, property_quota):
+        values = [property_quota[name].get('remaining') for name in _QUOTA_NAMES
+                  if isinstance(property_quota.get(name), dict)]
+        values = [value for value in values if value is not None]
+        if not values:
+            return
+        with self._lock:
+            self._remaining[property_id] = (self._clock(), min(values))
+
+    def block(self, property_id, until):
+        with self._lock:
+            self._blocked[property_id] = until
+
+    def remaining(self, property_id):
+        now = self._clock()
+        with self._lock:
+            if self._blocked.get(property_id, 0) > now:
+                return 0
+            if self._in_flight.get(property_id, 0) >= MAX_CONCURRENT:
+                return 0
+            observed = self._remaining.get(property_id)
+        if observed is None or _next_hour(observed[0]) <= now:
+            return DEFAULT_REMAINING
+        return observed[1]
+
+    def acquire(self, property_id):
+        with self._lock:
+            self._in_flight[property_id] = self._in_flight.get(property_id, 0) + 1
+
+    def release(self, property_id):
+        with self._lock:
+            self._in_flight[property_id] -= 1
+
+
+class PooledKey:
+    def __init__(self, service_account_file, scopes=SCOPES, clock=time.time):
+        self.service_account_file = service_account_file
+        with open(service_account_file, 'r') as f:
+            self.name = json.load(f).get('client_email') or service_account_file
+        self.token_provider = TokenProvider(service_account_file, scopes)
+        self.quota = QuotaTracker(clock)
+        self.requests = 0
+
+
+class KeyPool:
+    def __init__(self, key_files=None, scopes=SCOPES, clock=time.time, rng=None):
+        self.keys = [PooledKey(path, scopes, clock) for path in (key_files or key_files_from_env())]
+        if not self.keys:
+            raise ValueError("金鑰池至少需要一把服務帳戶金鑰")
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    # 依剩餘配額加權隨機挑選金鑰；exclude 為本次請求已失敗的金鑰。
+    # acquire=True 時在同一個鎖內登記進行中的請求，並行的請求不會都看到同一個未滿的同時請求數
+    def choose(self, property_id, exclude=(), acquire=False):
+        with self._lock:
+            candidates = [(key, key.quota.remaining(property_id)) for key in self.keys if key not in exclude]
+            candidates = [(key, weight) for key, weight in candidates if weight > 0]
+            if not candidates:
+                raise NoAvailableKeyError(f"屬性 {property_id} 目前沒有可用配額的金鑰")
+            point = self._rng.uniform(0, sum(weight for _, weight in candidates))
+            chosen = candidates[-1][0]
+            for key, weight in candidates:
+                point -= weight
+                if point <= 0:
+                    chosen = key
+                    break
+            if acquire:
+                chosen.quota.acquire(property_id)
+            return chosen
+
+    # 與 TokenProvider 相容 (例如中繼資料工作)：不針對特定屬性，隨機取一把金鑰的令牌
+    def token(self):
+        return self.choose(None).token_provider.token()
+
+    # 以池中的金鑰執行報表；回傳解碼後的 JSON，所有金鑰都失敗時回傳 None
+    def run_report(self, property_id, request_body, method='runReport', report_type=None):
+        property_id = str(property_id)
+        body = {**request_body, "returnPropertyQuota": True}  # 以響應中的 propertyQuota 更新配額追蹤
+        url = f'{DATA_API_BASE}/properties/{property_id}:{method}'
+        tried = []
+        while True:
+            try:
+                key = self.choose(property_id, exclude=tried, acquire=True)
+            except NoAvailableKeyError as e:
+                print(f"[金鑰池] {e}")
+                return None
+            tried.append(key)
+            try:
+                response = requests.post(url, headers=compressed_headers(key.token_provider.token()),
+                                         json=body, params=fields_params(method, body))
+            finally:
+                key.quota.release(property_id)
+            with self._lock:
+                key.requests += 1
+            record_transfer(report_type or method, response)
+            if response.status_code == 200:
+                result = response.json()
+                key.quota.update(property_id, result.get("propertyQuota", {}))
+                return result
+            if response.status_code == 429:
+                print(f"[金鑰池] {key.name} 對屬性 {property_id} 的配額已用盡，改用其他金鑰")
+                key.quota.block(property_id, _next_hour(self._clock()))
+            elif response.status_code == 403:
+                print(f"[金鑰池] {key.name} 無權存取屬性 {property_id}，改用其他金鑰")
+                key.quota.block(property_id, float('inf'))
+            else:
+                print(f"[金鑰池] 請求失敗 ({key.name}, 狀態碼 {response.status_code}): {response.text}")
+                return None
+
+    # 並行執行多個報表 [(屬性 ID, 請求內容), ...]，依輸入順序回傳結果
+    def run_reports(self, reports, max_workers=None):
+        max_workers = max_workers or len(self.keys) * 2
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda item: self.run_report(*item), reports))
+
+    def stats(self):
+        return [{"key": key.name, "requests": key.requests} for key in self.keys]
@@ -0,0 +1,357 @@
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from ga_transfer import compressed_headers
+
+# 負載測試：錄製實際執行中的報表請求 (種類、請求內容、時間點、延遲、響應大小)，
+# 再以本機模擬端點依比例加速重播同樣的請求組合，評估單一工作程序能承受多少看板與屬性。
+#
+# 錄製：設定 GA_RECORD_FILE=路徑 後照常執行各腳本或排程器，每個報表請求會附加一行 JSON
+#       (由 ga_transfer.record_transfer 呼叫；不記錄令牌)
+# 重播：python ga_loadtest.py 錄製檔
+#   GA_LOADTEST_RATE=10            時間軸加速倍數 (10 = 以 10 倍速率送出)
+#   GA_LOADTEST_WORKERS=8          並行工作執行緒數 (受測的工作程序容量)
+#   GA_LOADTEST_PROPERTIES=1       每個請求複製到幾個 (模擬) 屬性
+#   GA_LOADTEST_REPEAT=1           錄製內容重複播放次數
+#   GA_LOADTEST_LATENCY_SCALE=1    模擬端點延遲相對於錄製延遲的倍數
+#   GA_LOADTEST_ERROR_RATE=0       模擬端點隨機回傳 429/503 的比例
+
+RECORD_FILE_ENV = 'GA_RECORD_FILE'
+# 延遲直方圖的桶上限 (毫秒)
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+
+class RequestRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, report_type, response):
+        request = response.request
+        body = request.body if request is not None else None
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        url = urlsplit(request.url if request is not None else response.url)
+        entry = {
+            "ts": time.time(),
+            "report_type": report_type,
+            "http_method": request.method if request is not None else 'POST',
+            "path": url.path,
+            "body": json.loads(body) if body else None,
+            "status": response.status_code,
+            "latency_ms": round(response.elapsed.total_seconds() * 1000, 3),
+            "response_bytes": len(response.content),
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        # 以附加模式單次寫入一整行，多個腳本程序可同時錄製到同一個檔案
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def recorder_from_env():
+    global _recorder
+    path = os.environ.get(RECORD_FILE_ENV)
+    if not path:
+        return None
+    with _recorder_lock:
+        if _recorder is None or _recorder.path != path:
+            _recorder = RequestRecorder(path)
+        return _recorder
+
+
+def load_recording(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+def _request_key(path, body):
+    # 屬性 ID 不影響模擬響應，鍵只取路徑最後的方法名稱與請求內容
+    method = path.rsplit(':', 1)[-1] if ':' in path else path.rsplit('/', 1)[-1]
+    return method, json.dumps(body, sort_keys=True, separators=(',', ':')) if body is not None else ''
+
+
+def _synthetic_response(size):
+    # 產生與錄製大小相近的報表 JSON，讓解碼與解壓縮成本接近實際
+    row = '{"dimensionValues":[{"value":"%s"}],"metricValues":[{"value":"%d"}]}'
+    rows = []
+    length = 0
+    i = 0
+    while length < size - 100:
+        text = row % (f'value-{i}', i * 7 % 1000)
+        rows.append(text)
+        length += len(text) + 1
+        i += 1
+    return ('{"dimensionHeaders":[{"name":"dimension"}],"metricHeaders":[{"name":"metric","type":"TYPE_INTEGER"}],'
+            '"rows":[' + ','.join(rows) + '],"rowCount":%d}' % len(rows)).encode('utf-8')
+
+
+_INJECTED_ERRORS = (
+    (429, b'{"error":{"code":429,"status":"RESOURCE_EXHAUSTED"}}'),
+    (503, b'{"error":{"code":503,"status":"UNAVAILABLE"}}'),
+)
+
+
+# 本機模擬端點：依請求內容找出錄製時的延遲與響應大小，依比例延遲後回傳合成的響應
+class MockGAServer:
+    def __init__(self, entries, latency_scale=1.0, error_rate=0.0, seed=None, host='127.0.0.1', port=0):
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._profiles = {}
+        latencies = []
+        for entry in entries:
+            profile = (entry["latency_ms"] / 1000, entry["response_bytes"])
+            self._profiles[_request_key(entry["path"], entry["body"])] = profile
+            latencies.append(profile)
+        latencies.sort()
+        self._default = latencies[len(latencies) // 2] if latencies else (0.1, 2000)
+        self._payloads = {}
+        self._payload_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1beta'
+
+    def _payload(self, size, compressed):
+        with self._payload_lock:
+            key = (size, compressed)
+            if key not in self._payloads:
+                payload = _synthetic_response(size)
+                self._payloads[key] = gzip.compress(payload, 6) if compressed else payload
+            return self._payloads[key]
+
+    # 依 error_rate 決定是否模擬失敗；失敗時隨機回傳配額用盡 (429) 或暫時無法服務 (503) 的狀態碼與內容
+    def _injected_error(self):
+        with self._rng_lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            return self._rng.choice(_INJECTED_ERRORS)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, body):
+                latency, size = server._profiles.get(_request_key(urlsplit(self.path).path, body), server._default)
+                time.sleep(latency * server.latency_scale)
+                error = server._injected_error()
+                if error is not None:
+                    (status, payload), encoding = error, None
+                else:
+                    compressed = 'gzip' in self.headers.get('Accept-Encoding', '')
+                    status, payload = 200, server._payload(size, compressed)
+                    encoding = 'gzip' if compressed else None
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if encoding:
+                    self.send_header('Content-Encoding', encoding)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                self._respond(json.loads(raw) if raw else None)
+
+            def do_GET(self):
+                self._respond(None)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.samples = []
+
+    def add(self, latency_ms):
+        self.samples.append(latency_ms)
+        for i, upper in enumerate(self.buckets):
+            if latency_ms <= upper:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+# 依錄製的時間軸 (除以 rate) 把請求交給固定數量的工作執行緒送出，記錄服務延遲、排隊延遲與錯誤
+class Replayer:
+    def __init__(self, entries, base_url, rate=1.0, workers=8, properties=1, repeat=1):
+        self.entries = entries
+        self.base_url = base_url.rstrip('/')
+        self.rate = rate
+        self.workers = workers
+        self.properties = properties
+        self.repeat = repeat
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.queue_delay = LatencyHistogram()
+        self.by_report = {}
+        self.errors = 0
+        self.completed = 0
+
+    def schedule(self):
+        if not self.entries:
+            return []
+        start = self.entries[0]["ts"]
+        span = self.entries[-1]["ts"] - start + 1
+        plan = []
+        for round_index in range(self.repeat):
+            for entry in self.entries:
+                offset = (entry["ts"] - start + round_index * span) / self.rate
+                for copy in range(self.properties):
+                    plan.append((offset, entry, copy))
+        plan.sort(key=lambda item: item[0])
+        return plan
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _send(self, due, entry, copy):
+        started = time.perf_counter()
+        path = entry["path"].split('/v1beta', 1)[-1]
+        if copy:
+            # 將屬性 ID 換成模擬屬性，模擬同一組報表套用到更多屬性
+            head, _, tail = path.partition('/properties/')
+            property_id, sep, rest = tail.partition(':') if ':' in tail else tail.partition('/')
+            path = f'{head}/properties/{property_id}-{copy}{sep}{rest}'
+        url = f'{self.base_url}{path}'
+        ok = False
+        try:
+            headers = compressed_headers('loadtest')
+            if entry.get("http_method", 'POST') == 'GET':
+                response = self._session().get(url, headers=headers, timeout=60)
+            else:
+                response = self._session().post(url, headers=headers, json=entry["body"], timeout=60)
+            if response.status_code == 200:
+                response.json()
+                ok = True
+        except (requests.RequestException, ValueError):
+            pass
+        finished = time.perf_counter()
+        with self._lock:
+            self.completed += 1
+            self.errors += 0 if ok else 1
+            self.latency.add((finished - started) * 1000)
+            self.queue_delay.add(max(0.0, started - due) * 1000)
+            stats = self.by_report.setdefault(entry.get("report_type", '?'), {"requests": 0, "errors": 0})
+            stats["requests"] += 1
+            stats["errors"] += 0 if ok else 1
+
+    def run(self):
+        plan = self.schedule()
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for offset, entry, copy in plan:
+                due = begin + offset
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                pool.submit(self._send, due, entry, copy)
+        elapsed = time.perf_counter() - begin
+        target_span = plan[-1][0] if plan else 0
+        return self.report(elapsed, len(plan) / target_span if target_span > 0 else None)
+
+    def report(self, elapsed, target_rps=None):
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+        return {
+            "requests": self.completed,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.completed, 4) if self.completed else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(self.completed / elapsed, 2) if elapsed > 0 else None,
+            "target_rps": round(target_rps, 2) if target_rps else None,
+            "latency_ms": {f"p{p}": rounded(self.latency.percentile(p)) for p in (50, 90, 99)},
+            "queue_delay_ms": {f"p{p}": rounded(self.queue_delay.percentile(p)) for p in (50, 90, 99)},
+            "histogram_ms": {str(upper): count for upper, count in zip(self.latency.buckets, self.latency.counts)},
+            "by_report": self.by_report,
+        }
+
+
+def print_report(report, stream=None):
+    stream = stream or sys.stdout
+    stream.write(f"請求數: {report['requests']} | 錯誤: {report['errors']} (錯誤率 {report['error_rate']:.2%})\n")
+    stream.write(f"耗時: {report['elapsed_s']} 秒 | 吞吐量: {report['throughput_rps']} 請求/秒"
+                 f" (目標 {report['target_rps']} 請求/秒)\n")
+    stream.write(f"延遲 (毫秒): {report['latency_ms']}\n")
+    stream.write(f"排隊延遲 (毫秒): {report['queue_delay_ms']}  (持續增加代表工作執行緒已飽和)\n")
+    stream.write("延遲直方圖:\n")
+    peak = max(report['histogram_ms'].values() or [0]) or 1
+    for upper, count in report['histogram_ms'].items():
+        if count:
+            stream.write(f"  <= {upper:>6} ms | {'#' * max(1, round(40 * count / peak))} {count}\n")
+    stream.write("各報表:\n")
+    for report_type, stats in sorted(report['by_report'].items()):
+        stream.write(f"  - {report_type}: {stats['requests']} 請求, {stats['errors']} 錯誤\n")
+
+
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 負載測試 (重播錄製的請求) =====")
+    path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get(RECORD_FILE_ENV)
+    if not path or not os.path.exists(path):
+        print("錯誤：請指定錄製檔，例如: python ga_loadtest.py ga_record.jsonl")
+        print(f"錄製方式：設定 {RECORD_FILE_ENV}=ga_record.jsonl 後照常執行各報表腳本。")
+    else:
+        entries = load_recording(path)
+        print(f"載入 {len(entries)} 個錄製的請求")
+        with MockGAServer(entries,
+                          latency_scale=float(os.environ.get('GA_LOADTEST_LATENCY_SCALE', '1')),
+                          error_rate=float(os.environ.get('GA_LOADTEST_ERROR_RATE', '0'))) as server:
+            replayer = Replayer(entries, server.base_url,
+                                rate=float(os.environ.get('GA_LOADTEST_RATE', '1')),
+                                workers=int(os.environ.get('GA_LOADTEST_WORKERS', '8')),
+                                properties=int(os.environ.get('GA_LOADTEST_PROPERTIES', '1')),
+                                repeat=int(os.environ.get('GA_LOADTEST_REPEAT', '1')))
+            print_report(replayer.run())
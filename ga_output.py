@@ -0,0 +1,183 @@
+import io
+import json
+import os
+import sys
+
+from ga_timing import run_timer
+
+# 輸出層：各腳本原本先以 indent=2 印出完整 API 響應，再印一次格式化結果，大型報表等於序列化兩次。
+# 改為依 GA_OUTPUT 選擇串流輸出格式，逐列寫入緩衝的 stdout；完整響應只在 GA_DEBUG_DUMP=1 時輸出。
+#
+#   GA_OUTPUT=text    每列一行的易讀格式 (預設)
+#   GA_OUTPUT=ndjson  每列一個 JSON 物件
+#   GA_OUTPUT=json    單一精簡 JSON 陣列 (逐列串流寫出)
+#   GA_OUTPUT=tsv     含標題列的 tab 分隔值
+#   GA_OUTPUT=quiet   不輸出資料列
+
+OUTPUT_FORMAT = os.environ.get('GA_OUTPUT', 'text')
+DEBUG_DUMP = os.environ.get('GA_DEBUG_DUMP') == '1'
+BUFFER_SIZE = 1 << 16
+
+
+def debug_dump(result, title=None):
+    if not DEBUG_DUMP:
+        return
+    if title:
+        print(title)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def _convert(value, metric_type):
+    try:
+        return int(value) if metric_type == 'TYPE_INTEGER' else float(value)
+    except ValueError:
+        return value
+
+
+# 逐列產生 {維度/指標名稱: 值}；typed=False 時保留 API 回傳的字串
+def iter_rows(result, typed=True):
+    dimensions = [h.get("name") for h in result.get("dimensionHeaders", [])]
+    metric_headers = result.get("metricHeaders", [])
+    metrics = [h.get("name") for h in metric_headers]
+    types = [h.get("type") for h in metric_headers]
+    for row in result.get("rows", []):
+        record = {name: v.get("value") for name, v in zip(dimensions, row.get("dimensionValues", []))}
+        for name, metric_type, v in zip(metrics, types, row.get("metricValues", [])):
+            value = v.get("value", "0")
+            record[name] = _convert(value, metric_type) if typed else value
+        yield record
+
+
+def _buffered_stdout():
+    try:
+        fileno = sys.stdout.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return sys.stdout, False
+    sys.stdout.flush()
+    raw = io.FileIO(fileno, 'w', closefd=False)
+    return io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding='utf-8', newline='\n'), True
+
+
+class RowWriter:
+    typed = True
+
+    def __init__(self, stream=None, labels=None):
+        if stream is None:
+            self.stream, self._owned = _buffered_stdout()
+        else:
+            self.stream, self._owned = stream, False
+        self.labels = labels or {}
+        self.count = 0
+
+    def write_row(self, row):
+        self._write(row)
+        self.count += 1
+
+    def _write(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        self.stream.flush()
+        if self._owned:
+            self.stream.detach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TextWriter(RowWriter):
+    typed = False
+
+    def _write(self, row):
+        self.stream.write('- ' + ', '.join(f"{self.labels.get(k, k)}: {v}" for k, v in row.items()) + '\n')
+
+
+class NDJSONWriter(RowWriter):
+    def _write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+class JSONWriter(RowWriter):
+    def _write(self, row):
+        self.stream.write('[' if self.count == 0 else ',')
+        self.stream.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+
+    def close(self):
+        self.stream.write('[]\n' if self.count == 0 else ']\n')
+        super().close()
+
+
+class TSVWriter(RowWriter):
+    typed = False
+
+    def _write(self, row):
+        if self.count == 0:
+            self.stream.write('\t'.join(row) + '\n')
+        self.stream.write('\t'.join(str(v).replace('\t', ' ').replace('\n', ' ') for v in row.values()) + '\n')
+
+
+class QuietWriter(RowWriter):
+    def __init__(self, stream=None, labels=None):
+        self.stream, self._owned = io.StringIO(), False
+        self.labels = labels or {}
+        self.count = 0
+
+    def _write(self, row):
+        pass
+
+
+WRITERS = {
+    'text': TextWriter,
+    'ndjson': NDJSONWriter,
+    'json': JSONWriter,
+    'tsv': TSVWriter,
+    'quiet': QuietWriter,
+}
+
+
+def open_writer(fmt=None, stream=None, labels=None):
+    fmt = fmt or OUTPUT_FORMAT
+    if fmt not in WRITERS:
+        raise ValueError(f"不支援的輸出格式: {fmt} (可用: {', '.join(WRITERS)})")
+    return WRITERS[fmt](stream, labels)
+
+
+# 輸出報表：debug 模式下先印完整響應，再以選定格式逐列寫出；回傳寫出的列數。
+# 指定 report_name 且 GA_CHANGES=1 時只輸出與上次執行相比的變更列 (見 ga_changes)；
+# GA_SNAPSHOTS=1 時同時保存報表快照 (見 ga_snapshot)
+def emit_report(result, labels=None, fmt=None, stream=None, report_name=None, property_id='default', timer=None):
+    with (timer or run_timer()).stage('format_output') as record:
+        record['rows'] = _emit_report(result, labels, fmt, stream, report_name, property_id)
+    return record['rows']
+
+
+def _emit_report(result, labels, fmt, stream, report_name, property_id):
+    debug_dump(result, "\n完整 API 響應內容:")
+    if report_name:
+        # GA_SNAPSHOTS=1 時另存記憶體映射快照供其他程序讀取 (見 ga_snapshot)
+        from ga_snapshot import SNAPSHOTS_ENABLED, save_report_snapshot
+        if SNAPSHOTS_ENABLED:
+            from ga_columns import ReportColumns
+            save_report_snapshot(report_name, ReportColumns.from_response(result), property_id)
+    tracker = None
+    if report_name:
+        from ga_changes import OP_LABELS, change_tracker
+        dimensions = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        tracker = change_tracker(report_name, dimensions, property_id)
+        if tracker is not None:
+            labels = {**OP_LABELS, **(labels or {})}
+    with open_writer(fmt, stream, labels) as writer:
+        if tracker is None:
+            for row in iter_rows(result, typed=writer.typed):
+                writer.write_row(row)
+        else:
+            # 變更比較一律使用轉型後的值，切換輸出格式不會被誤判為變更
+            for change in tracker.diff(iter_rows(result, typed=True)):
+                writer.write_row(change)
+    # 輸出完成後才更新快照
+    if tracker is not None:
+        tracker.commit()
+    return writer.count
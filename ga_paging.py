@@ -0,0 +1,41 @@
+import os
+
+# 自動調整 runReport 分頁大小：從較大的 limit 開始 (最多 GA 上限 250,000 列)，
+# 依每頁的響應位元組數與延遲推算每列成本，調整下一頁的 limit，
+# 使每頁延遲接近目標值，且解碼後的記憶體用量不超過上限。
+
+MAX_PAGE_SIZE = 250000  # GA Data API 單次回傳的列數上限
+MIN_PAGE_SIZE = 1000
+TARGET_PAGE_SECONDS = float(os.environ.get('GA_TARGET_PAGE_SECONDS', '5'))
+MEMORY_CEILING_BYTES = int(os.environ.get('GA_PAGE_MEMORY_MB', '256')) * 1024 * 1024
+DECODE_EXPANSION = 8   # JSON 解碼成 Python 物件後約為原始位元組的倍數
+MAX_GROWTH = 2.0       # 每次最多放大 2 倍，避免一次跳得太大
+SMOOTHING = 0.5        # 每列成本的指數移動平均權重
+
+
+class PageSizeTuner:
+    def __init__(self, initial=MAX_PAGE_SIZE, target_seconds=TARGET_PAGE_SECONDS,
+                 memory_ceiling=MEMORY_CEILING_BYTES):
+        self.page_size = max(MIN_PAGE_SIZE, min(initial, MAX_PAGE_SIZE))
+        self.target_seconds = target_seconds
+        self.memory_ceiling = memory_ceiling
+        self.bytes_per_row = None
+        self.seconds_per_row = None
+        self.history = []  # (limit, 列數, 位元組, 秒)
+
+    def _smooth(self, previous, sample):
+        return sample if previous is None else SMOOTHING * sample + (1 - SMOOTHING) * previous
+
+    # 回報一頁的觀測值，回傳下一頁建議的 limit
+    def observe(self, rows, response_bytes, seconds):
+        self.history.append((self.page_size, rows, response_bytes, seconds))
+        if rows <= 0:
+            return self.page_size
+        self.bytes_per_row = self._smooth(self.bytes_per_row, response_bytes / rows)
+        self.seconds_per_row = self._smooth(self.seconds_per_row, seconds / rows)
+
+        by_latency = self.target_seconds / self.seconds_per_row if self.seconds_per_row > 0 else MAX_PAGE_SIZE
+        by_memory = self.memory_ceiling / (self.bytes_per_row * DECODE_EXPANSION) if self.bytes_per_row > 0 else MAX_PAGE_SIZE
+        proposed = min(by_latency, by_memory, self.page_size * MAX_GROWTH)
+        self.page_size = int(max(MIN_PAGE_SIZE, min(proposed, MAX_PAGE_SIZE)))
+        return self.page_size
@@ -0,0 +1,84 @@
+from array import array
+
+# 多日期區間比較：將最多 4 個 dateRanges 打包在同一個請求中，
+# 依回傳的 dateRange 維度拆回對齊的欄位，並於本地計算差值與比率。
+
+MAX_DATE_RANGES = 4  # GA4 每個請求最多接受 4 個日期區間
+
+
+# 本週 (含今天共 7 天) 對上週
+def week_over_week_ranges():
+    return [
+        {"startDate": "6daysAgo", "endDate": "today", "name": "this_week"},
+        {"startDate": "13daysAgo", "endDate": "7daysAgo", "name": "last_week"},
+    ]
+
+
+# 以既有請求為基礎，換上多個具名的日期區間
+def build_comparison_request(request_body, date_ranges):
+    if not 1 <= len(date_ranges) <= MAX_DATE_RANGES:
+        raise ValueError(f"日期區間數量須介於 1 到 {MAX_DATE_RANGES} 之間，收到 {len(date_ranges)} 個")
+    body = dict(request_body)
+    body["dateRanges"] = [
+        {**date_range, "name": date_range.get("name") or f"date_range_{i}"}
+        for i, date_range in enumerate(date_ranges)
+    ]
+    return body
+
+
+class PeriodComparison:
+    def __init__(self, dimensions, metrics, periods, keys, values):
+        self.dimensions = dimensions  # 不含 dateRange 的維度
+        self.metrics = metrics
+        self.periods = periods        # 日期區間名稱，依請求順序
+        self.keys = keys              # 每列的維度值 tuple
+        # values[(period, metric)] 為與 keys 對齊的 array('d')；某區間缺少的列記為 0
+        self.values = values
+
+    @classmethod
+    def from_response(cls, result, request_body):
+        periods = [r.get("name") for r in request_body.get("dateRanges", [])]
+        header_names = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        metrics = [h.get("name") for h in result.get("metricHeaders", [])]
+        # 多區間時 GA 會回傳 dateRange 維度；若未出現在標頭中則位於每列最後
+        range_index = header_names.index("dateRange") if "dateRange" in header_names else len(header_names)
+        dimensions = [name for name in header_names if name != "dateRange"]
+
+        positions = {}
+        keys = []
+        values = {(p, m): array('d') for p in periods for m in metrics}
+        for row in result.get("rows", []):
+            dim_values = [v.get("value", "") for v in row.get("dimensionValues", [])]
+            period = dim_values[range_index] if range_index < len(dim_values) else periods[0]
+            key = tuple(dim_values[:range_index] + dim_values[range_index + 1:])
+            position = positions.get(key)
+            if position is None:
+                position = positions[key] = len(keys)
+                keys.append(key)
+                for column in values.values():
+                    column.append(0.0)
+            for metric, metric_value in zip(metrics, row.get("metricValues", [])):
+                try:
+                    values[(period, metric)][position] = float(metric_value.get("value", "0"))
+                except (KeyError, ValueError):
+                    pass
+        return cls(dimensions, metrics, periods, keys, values)
+
+    def column(self, period, metric):
+        return self.values[(period, metric)]
+
+    # 逐列計算 current 相對於 previous 的差值與比率 (previous 為 0 時比率為 None)
+    def compare(self, metric, current, previous):
+        current_values = self.values[(current, metric)]
+        previous_values = self.values[(previous, metric)]
+        rows = []
+        for key, now, before in zip(self.keys, current_values, previous_values):
+            row = dict(zip(self.dimensions, key))
+            row.update({
+                current: now,
+                previous: before,
+                "delta": now - before,
+                "ratio": now / before if before else None,
+            })
+            rows.append(row)
+        return rows
@@ -0,0 +1,144 @@
+import heapq
+from array import array
+
+# 本地樞紐資料結構：將維度值做字典編碼 (字串 -> 整數代碼)，
+# 指標值存放於以代碼索引的密集 array('d')，排列方式為
+# [維度0][維度1]...[維度N-1][指標]，可在本地進行切片、彙總與 Top-N，不需額外 API 呼叫。
+#
+# 注意：activeUsers 等不重複使用者指標不可加總，rollup 後的數值為上限估計。
+
+
+# 建立 runPivotReport 請求：row_dimension 為列、column_dimension 為欄
+def build_pivot_request(row_dimension, column_dimension, metrics,
+                        start_date='7daysAgo', end_date='today',
+                        row_limit=250, column_limit=50):
+    return {
+        "dateRanges": [{"startDate": start_date, "endDate": end_date}],
+        "dimensions": [{"name": row_dimension}, {"name": column_dimension}],
+        "metrics": [{"name": name} for name in metrics],
+        "pivots": [
+            {"fieldNames": [row_dimension], "limit": row_limit},
+            {"fieldNames": [column_dimension], "limit": column_limit},
+        ],
+    }
+
+
+class PivotCube:
+    def __init__(self, dimensions, metrics, dictionaries, values):
+        self.dimensions = list(dimensions)
+        self.metrics = list(metrics)
+        # dictionaries[i] 為第 i 個維度的代碼表 (代碼 -> 字串)
+        self.dictionaries = [list(d) for d in dictionaries]
+        self._codes = [{value: code for code, value in enumerate(d)} for d in self.dictionaries]
+        self.shape = [len(d) for d in self.dictionaries] + [len(self.metrics)]
+        self._strides = _strides(self.shape)
+        self.values = values
+
+    # 從 runReport 或 runPivotReport 的響應建立 (兩者的 rows 都帶有完整維度值)
+    @classmethod
+    def from_response(cls, result):
+        dimensions = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        metrics = [h.get("name") for h in result.get("metricHeaders", [])]
+        dictionaries = [[] for _ in dimensions]
+        codes = [{} for _ in dimensions]
+
+        encoded_rows = []
+        for row in result.get("rows", []):
+            key = []
+            for i, dim_value in enumerate(row.get("dimensionValues", [])):
+                value = dim_value.get("value", "")
+                code = codes[i].get(value)
+                if code is None:
+                    code = codes[i][value] = len(dictionaries[i])
+                    dictionaries[i].append(value)
+                key.append(code)
+            encoded_rows.append((key, row.get("metricValues", [])))
+
+        cube = cls(dimensions, metrics, dictionaries, None)
+        cube.values = array('d', bytes(8 * _size(cube.shape)))
+        n_metrics = len(metrics)
+        for key, metric_values in encoded_rows:
+            base = sum(code * stride for code, stride in zip(key, cube._strides))
+            for m in range(n_metrics):
+                try:
+                    cube.values[base + m] += float(metric_values[m].get("value", "0"))
+                except (IndexError, ValueError):
+                    pass
+        return cube
+
+    def value(self, metric, **coordinates):
+        index = self._strides[-1] * self.metrics.index(metric)
+        for dim, stride, codes in zip(self.dimensions, self._strides, self._codes):
+            index += codes[coordinates[dim]] * stride
+        return self.values[index]
+
+    # 固定某個維度的值，回傳移除該維度後的子結構
+    def slice(self, dimension, value):
+        axis = self.dimensions.index(dimension)
+        code = self._codes[axis].get(value)
+        keep = [d for d in self.dimensions if d != dimension]
+        dictionaries = [self.dictionaries[i] for i in range(len(self.dimensions)) if i != axis]
+        shape = [len(d) for d in dictionaries] + [len(self.metrics)]
+        values = array('d', bytes(8 * _size(shape)))
+        if code is not None:
+            outer = _size(self.shape[:axis])
+            inner = self._strides[axis]
+            for o in range(outer):
+                src = o * self.shape[axis] * inner + code * inner
+                values[o * inner:(o + 1) * inner] = self.values[src:src + inner]
+        return PivotCube(keep, self.metrics, dictionaries, values)
+
+    # 僅保留 keep 中的維度，其餘維度加總
+    def rollup(self, keep):
+        axes = [self.dimensions.index(d) for d in keep]
+        dictionaries = [self.dictionaries[a] for a in axes]
+        shape = [len(d) for d in dictionaries] + [len(self.metrics)]
+        new_strides = _strides(shape)
+        values = array('d', bytes(8 * _size(shape)))
+        n_metrics = len(self.metrics)
+        for cell in range(_size(self.shape[:-1])):
+            base = cell * n_metrics
+            target = 0
+            for axis, stride in zip(axes, new_strides):
+                target += (cell * n_metrics // self._strides[axis]) % self.shape[axis] * stride
+            for m in range(n_metrics):
+                values[target + m] += self.values[base + m]
+        return PivotCube(keep, self.metrics, dictionaries, values)
+
+    # 依指定指標取某維度的前 n 名 (其他維度先加總)
+    def top_n(self, dimension, metric, n=10):
+        rolled = self.rollup([dimension]) if self.dimensions != [dimension] else self
+        m = self.metrics.index(metric)
+        n_metrics = len(self.metrics)
+        totals = ((rolled.values[code * n_metrics + m], value)
+                  for code, value in enumerate(rolled.dictionaries[0]))
+        return [(value, total) for total, value in heapq.nlargest(n, totals)]
+
+    # 展開為扁平列 (略過全為 0 的格子)
+    def rows(self):
+        n_metrics = len(self.metrics)
+        for cell in range(_size(self.shape[:-1])):
+            base = cell * n_metrics
+            metrics = self.values[base:base + n_metrics]
+            if not any(metrics):
+                continue
+            row = {}
+            for axis, dim in enumerate(self.dimensions):
+                code = (base // self._strides[axis]) % self.shape[axis]
+                row[dim] = self.dictionaries[axis][code]
+            row.update(zip(self.metrics, metrics))
+            yield row
+
+
+def _size(shape):
+    size = 1
+    for n in shape:
+        size *= n
+    return size
+
+
+def _strides(shape):
+    strides = [1] * len(shape)
+    for i in range(len(shape) - 2, -1, -1):
+        strides[i] = strides[i + 1] * shape[i + 1]
+    return strides
@@ -0,0 +1,134 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ga_report import TokenProvider
+
+# 屬性探索：以 Admin API 分頁讀取 accountSummaries，再並行列出各帳戶的屬性，
+# 建立本地索引 (屬性 ID -> 顯示名稱、帳戶、時區、幣別) 並快取於檔案。
+# 多屬性工作與屬性 ID 驗證之後皆可在本地以 O(1) 查詢完成。
+# 重新整理時只會重新列出過期或屬性數量有變動的帳戶。
+
+ADMIN_API_BASE = 'https://analyticsadmin.googleapis.com/v1beta'
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+INDEX_TTL = int(os.environ.get('GA_PROPERTY_INDEX_TTL', str(24 * 3600)))
+PAGE_SIZE = 200
+MAX_WORKERS = 8
+
+
+def _get_paged(url, token, collection, params=None):
+    items = []
+    page_token = None
+    while True:
+        query = {'pageSize': PAGE_SIZE, **(params or {})}
+        if page_token:
+            query['pageToken'] = page_token
+        response = requests.get(url, headers={'Authorization': f'Bearer {token}'}, params=query, timeout=30)
+        if response.status_code != 200:
+            raise RuntimeError(f"Admin API 請求失敗 (狀態碼 {response.status_code}): {response.text}")
+        payload = response.json()
+        items.extend(payload.get(collection, []))
+        page_token = payload.get('nextPageToken')
+        if not page_token:
+            return items
+
+
+class PropertyIndex:
+    def __init__(self, token_provider=None, path=None, ttl=INDEX_TTL):
+        self.token_provider = token_provider or TokenProvider()
+        self.path = path or os.path.join(CACHE_DIR, 'properties-index.json')
+        self.ttl = ttl
+        self.accounts = {}    # 帳戶 ID -> {"display_name", "refreshed_at", "property_count"}
+        self.properties = {}  # 屬性 ID -> {"display_name", "account", "time_zone", "currency", ...}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.accounts = data.get('accounts', {})
+        self.properties = data.get('properties', {})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'accounts': self.accounts, 'properties': self.properties}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, property_id):
+        return self.properties.get(str(property_id))
+
+    def __contains__(self, property_id):
+        return str(property_id) in self.properties
+
+    # 檢查屬性 ID 是否可由此服務帳戶存取；索引中沒有時先重新整理一次再判斷
+    def validate(self, property_id):
+        if property_id in self:
+            return True
+        self.refresh()
+        return property_id in self
+
+    def _list_account_properties(self, token, account_id):
+        return account_id, _get_paged(f'{ADMIN_API_BASE}/properties', token, 'properties',
+                                      {'filter': f'parent:accounts/{account_id}'})
+
+    # 增量重新整理；force=True 時重新列出所有帳戶
+    def refresh(self, force=False):
+        token = self.token_provider.token()
+        summaries = _get_paged(f'{ADMIN_API_BASE}/accountSummaries', token, 'accountSummaries')
+        now = time.time()
+
+        seen_accounts = set()
+        stale = []
+        for summary in summaries:
+            account_id = summary.get('account', '').split('/')[-1]
+            seen_accounts.add(account_id)
+            count = len(summary.get('propertySummaries', []))
+            cached = self.accounts.get(account_id)
+            if (force or cached is None or now - cached.get('refreshed_at', 0) >= self.ttl
+                    or cached.get('property_count') != count):
+                stale.append(account_id)
+            self.accounts[account_id] = {
+                **(cached or {}),
+                'display_name': summary.get('displayName'),
+                'property_count': count,
+            }
+
+        # 移除已無存取權的帳戶及其屬性
+        for account_id in set(self.accounts) - seen_accounts:
+            del self.accounts[account_id]
+        self.properties = {pid: prop for pid, prop in self.properties.items()
+                           if prop.get('account') in self.accounts}
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            for account_id, properties in pool.map(lambda a: self._list_account_properties(token, a), stale):
+                self.properties = {pid: prop for pid, prop in self.properties.items()
+                                   if prop.get('account') != account_id}
+                for prop in properties:
+                    property_id = prop.get('name', '').split('/')[-1]
+                    self.properties[property_id] = {
+                        'display_name': prop.get('displayName'),
+                        'account': account_id,
+                        'time_zone': prop.get('timeZone'),
+                        'currency': prop.get('currencyCode'),
+                        'property_type': prop.get('propertyType'),
+                    }
+                self.accounts[account_id]['refreshed_at'] = now
+
+        self._save()
+        return stale
+
+
+if __name__ == "__main__":
+    print("===== Google Analytics Admin API - 屬性索引工具 =====")
+    index = PropertyIndex()
+    refreshed = index.refresh()
+    print(f"已重新整理 {len(refreshed)} 個帳戶，索引中共有 {len(index.properties)} 個屬性:")
+    for property_id, prop in sorted(index.properties.items()):
+        print(f"- 屬性 ID: {property_id} | 顯示名稱: {prop['display_name']} | 時區: {prop['time_zone']} | 幣別: {prop['currency']}")
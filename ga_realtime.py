@@ -0,0 +1,147 @@
+import time
+
+# 即時報表視窗：一次 runRealtimeReport 取得 minutesAgo 與其他即時維度的細分，
+# 於本地依「絕對分鐘」保存每分鐘的數值，跨多次輪詢維護 5/15/30 分鐘的滾動彙總，
+# 多個即時面板因此只需每次輪詢一個 API 請求。
+#
+# 注意：activeUsers 依分鐘加總時，同一使用者在多個分鐘都活躍會被重複計算，
+# 滾動彙總 (面板中的 upper_bound) 只是上限估計，面板的 total 預設為 None。
+# 需要各時間窗的精確總數時，可另以不含 minutesAgo、只帶 minuteRanges 的請求取得
+# (見 build_realtime_totals_requests)；每個請求最多 2 個 minuteRanges，5/15/30 分鐘每次輪詢要多 2 個請求，
+# 因此只在呼叫端明確啟用時才發送。
+
+DEFAULT_DIMENSIONS = ('country', 'deviceCategory', 'unifiedScreenName')
+DEFAULT_WINDOWS = (5, 15, 30)
+MAX_MINUTES_AGO = 29  # 標準 GA4 屬性的即時報表涵蓋最近 30 分鐘
+MAX_MINUTE_RANGES = 2  # 每個即時報表請求的 minuteRanges 上限
+
+
+def build_realtime_request(dimensions=DEFAULT_DIMENSIONS, metrics=('activeUsers',)):
+    return {
+        "dimensions": [{"name": "minutesAgo"}] + [{"name": name} for name in dimensions],
+        "metrics": [{"name": name} for name in metrics],
+        "minuteRanges": [
+            {"name": "last_30_minutes", "startMinutesAgo": MAX_MINUTES_AGO, "endMinutesAgo": 0}
+        ],
+        "limit": 100000
+    }
+
+
+def _range_name(window):
+    return f"last_{window}_minutes"
+
+
+# 各時間窗精確總數的請求 (不含 minutesAgo，使用者不會被重複計算)；
+# 每個請求最多 2 個 minuteRanges，因此 5/15/30 分鐘需要 2 個請求
+def build_realtime_totals_requests(windows=DEFAULT_WINDOWS, metrics=('activeUsers',)):
+    requests = []
+    windows = sorted(windows)
+    for i in range(0, len(windows), MAX_MINUTE_RANGES):
+        requests.append({
+            "metrics": [{"name": name} for name in metrics],
+            "minuteRanges": [
+                {"name": _range_name(window), "startMinutesAgo": min(window, MAX_MINUTES_AGO + 1) - 1,
+                 "endMinutesAgo": 0}
+                for window in windows[i:i + MAX_MINUTE_RANGES]
+            ]
+        })
+    return requests
+
+
+class RealtimeWindow:
+    def __init__(self, retention_minutes=max(DEFAULT_WINDOWS)):
+        self.retention_minutes = retention_minutes
+        self.dimensions = []
+        self.metrics = []
+        # 絕對分鐘 (epoch 分鐘數) -> {維度值 tuple: [指標值...]}
+        self._minutes = {}
+        self._now_minute = None
+        # 時間窗 (分鐘) -> {指標: 精確總數}，來自最近一次 update_totals
+        self._exact_totals = {}
+
+    # 以一次輪詢結果更新視窗；較新的輪詢結果覆蓋同一分鐘的舊值
+    def update(self, result, now=None):
+        now_minute = int((now if now is not None else time.time()) // 60)
+        headers = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        minutes_index = headers.index("minutesAgo")
+        skip = {minutes_index}
+        if "minuteRange" in headers:
+            skip.add(headers.index("minuteRange"))
+        self.dimensions = [name for i, name in enumerate(headers) if i not in skip]
+        self.metrics = [h.get("name") for h in result.get("metricHeaders", [])]
+
+        fresh = {}
+        for row in result.get("rows", []):
+            values = [v.get("value", "") for v in row.get("dimensionValues", [])]
+            try:
+                minute = now_minute - int(values[minutes_index])
+            except (IndexError, ValueError):
+                continue
+            key = tuple(v for i, v in enumerate(values) if i not in skip)
+            cells = fresh.setdefault(minute, {})
+            sums = cells.setdefault(key, [0.0] * len(self.metrics))
+            for i, metric_value in enumerate(row.get("metricValues", [])):
+                try:
+                    sums[i] += float(metric_value.get("value", "0"))
+                except ValueError:
+                    pass
+        # 此次輪詢涵蓋的分鐘全部以新資料取代 (沒有資料的分鐘代表 0)
+        for minute in range(now_minute - MAX_MINUTES_AGO, now_minute + 1):
+            self._minutes[minute] = fresh.get(minute, {})
+        for minute in [m for m in self._minutes if m <= now_minute - self.retention_minutes]:
+            del self._minutes[minute]
+        self._now_minute = now_minute
+
+    # 以 build_realtime_totals_requests 的結果更新精確總數；只有一個 minuteRange 時響應不含 minuteRange 欄位
+    def update_totals(self, result, request_body):
+        windows = {r["name"]: r["startMinutesAgo"] + 1 for r in request_body.get("minuteRanges", [])}
+        headers = [h.get("name") for h in result.get("dimensionHeaders", [])]
+        metrics = [h.get("name") for h in result.get("metricHeaders", [])]
+        range_index = headers.index("minuteRange") if "minuteRange" in headers else None
+        for window in windows.values():
+            self._exact_totals[window] = {metric: 0.0 for metric in metrics}
+        for row in result.get("rows", []):
+            if range_index is None:
+                name = next(iter(windows))
+            else:
+                name = row["dimensionValues"][range_index].get("value")
+            window = windows.get(name)
+            if window is None:
+                continue
+            for metric, value in zip(metrics, row.get("metricValues", [])):
+                try:
+                    self._exact_totals[window][metric] += float(value.get("value", "0"))
+                except ValueError:
+                    pass
+
+    # 最近 window_minutes 分鐘的彙總 (依分鐘加總，activeUsers 為上限估計)；by 為要保留的維度 (None 表示總計)
+    def aggregate(self, window_minutes, by=None, metric='activeUsers'):
+        if self._now_minute is None:
+            return {}
+        m = self.metrics.index(metric)
+        positions = [self.dimensions.index(name) for name in (by or [])]
+        totals = {}
+        start = self._now_minute - window_minutes + 1
+        for minute, cells in self._minutes.items():
+            if minute < start:
+                continue
+            for key, sums in cells.items():
+                group = tuple(key[p] for p in positions)
+                totals[group] = totals.get(group, 0.0) + sums[m]
+        return totals
+
+    # 產生常用面板：total 為精確總數 (未啟用或尚未取得時為 None)；
+    # upper_bound 為依分鐘加總的總計與各維度細分，同一使用者跨分鐘會重複計算
+    def panels(self, windows=DEFAULT_WINDOWS, metric='activeUsers'):
+        panels = {}
+        for window in windows:
+            upper_bound = {"total": self.aggregate(window, metric=metric).get((), 0.0)}
+            for dimension in self.dimensions:
+                breakdown = self.aggregate(window, by=[dimension], metric=metric)
+                upper_bound[dimension] = {key[0]: value for key, value in
+                                          sorted(breakdown.items(), key=lambda item: item[1], reverse=True)}
+            panels[f"{window}m"] = {
+                "total": self._exact_totals.get(window, {}).get(metric),
+                "upper_bound": upper_bound,
+            }
+        return panels
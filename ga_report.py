@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import threading
+import time
+
+from google.oauth2 import service_account
+import requests
+from google.auth.transport.requests import Request
+
+from ga_paging import PageSizeTuner
+from ga_timing import run_timer
+from ga_transfer import compressed_headers, fields_params, record_transfer
+
+# 共用的報表呼叫工具：各 get_*.py 腳本中重複的認證與 API 呼叫流程集中在此。
+# 令牌更新、HTTP 請求與 JSON 解碼各自記錄為計時階段 (見 ga_timing)；未指定 timer 時使用程序層級的計時器
+
+SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
+SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+DATA_API_BASE = 'https://analyticsdata.googleapis.com/v1beta'
+# 頂層 rowCount 欄位；不在字串值內 (字串內的引號會以反斜線跳脫)
+_ROW_COUNT_PATTERN = re.compile(rb'(?<!\\)"rowCount"\s*:\s*(\d+)')
+
+
+# 建立憑證並取得訪問令牌
+def get_access_token(service_account_file=SERVICE_ACCOUNT_FILE, scopes=SCOPES, timer=None):
+    with (timer or run_timer()).stage('token_refresh'):
+        credentials = service_account.Credentials.from_service_account_file(
+            service_account_file, scopes=scopes)
+        credentials.refresh(Request())
+    return credentials.token
+
+
+# 共用的令牌來源：憑證只建立一次，令牌在到期前重複使用，多個工作可安全共用。
+# 設定 GA_SHARED_TOKEN_CACHE=1 時改由 ga_auth_broker 在本機所有程序之間共用令牌
+class TokenProvider:
+    def __init__(self, service_account_file=SERVICE_ACCOUNT_FILE, scopes=SCOPES, shared_cache=None):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self._credentials = None
+        self._lock = threading.Lock()
+        if shared_cache is None and os.environ.get('GA_SHARED_TOKEN_CACHE') == '1':
+            from ga_auth_broker import SharedTokenCache
+            shared_cache = SharedTokenCache(service_account_file, scopes)
+        self._shared_cache = shared_cache
+
+    def token(self):
+        if self._shared_cache is not None:
+            return self._shared_cache.token()
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.service_account_file, scopes=self.scopes)
+            if not self._credentials.valid:
+                with run_timer().stage('token_refresh'):
+                    self._credentials.refresh(Request())
+            return self._credentials.token
+
+
+# 發送報表請求；method 可為 runReport、runPivotReport 或 runRealtimeReport。
+# 響應以壓縮傳輸並只取回需要的欄位，傳輸量依 report_type (預設為 method) 累計
+def make_ga_report_call(token, property_id, request_body, method='runReport', report_type=None, timer=None):
+    timer = timer or run_timer()
+    url = f'{DATA_API_BASE}/properties/{property_id}:{method}'
+    with timer.stage('http_request', report_type=report_type or method) as record:
+        response = requests.post(url, headers=compressed_headers(token), json=request_body,
+                                 params=fields_params(method, request_body))
+        timer.record_http(record, response)
+    record_transfer(report_type or method, response)
+    print(f"API 響應狀態碼: {response.status_code} ({method})")
+    if response.status_code == 200:
+        with timer.stage('json_decode', report_type=report_type or method):
+            return response.json()
+    else:
+        print("\n請求失敗! 錯誤詳情:")
+        try:
+            error_details = response.json()
+            print(json.dumps(error_details, indent=2, ensure_ascii=False))
+        except json.JSONDecodeError:
+            print(f"無法解析錯誤詳情: {response.text}")
+        return None
+
+
+def make_ga_pivot_report_call(token, property_id, request_body):
+    return make_ga_report_call(token, property_id, request_body, method='runPivotReport')
+
+
+# 獲取 GA4 可用的維度和指標的中繼資料
+def fetch_metadata(token, property_id, timer=None):
+    timer = timer or run_timer()
+    url = f'{DATA_API_BASE}/properties/{property_id}/metadata'
+    with timer.stage('http_request', report_type='metadata') as record:
+        response = requests.get(url, headers=compressed_headers(token, content_type=None))
+        timer.record_http(record, response)
+    record_transfer('metadata', response)
+    print(f"中繼資料 API 響應狀態碼: {response.status_code}")
+    if response.status_code == 200:
+        with timer.stage('json_decode', report_type='metadata'):
+            return response.json()
+    print(f"獲取中繼資料失敗! 錯誤: {response.text}")
+    return None
+
+
+# 以 offset/limit 分頁取得報表，逐頁回傳未解碼的響應內容 (bytes)，
+# 讓解碼可以延後或交給其他程序處理。每頁的 limit 由 PageSizeTuner 依延遲與大小調整
+def iter_report_pages(token, property_id, request_body, tuner=None, report_type='runReport', timer=None):
+    tuner = tuner or PageSizeTuner()
+    timer = timer or run_timer()
+    url = f'{DATA_API_BASE}/properties/{property_id}:runReport'
+    headers = compressed_headers(token)
+    params = fields_params('runReport', request_body)
+    offset = 0
+    while True:
+        limit = tuner.page_size
+        body = {**request_body, "offset": offset, "limit": limit}
+        started = time.perf_counter()
+        with timer.stage('http_request', report_type=report_type, offset=offset, limit=limit) as record:
+            response = requests.post(url, headers=headers, json=body, params=params)
+            timer.record_http(record, response)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"分頁請求失敗 (offset={offset}, 狀態碼 {response.status_code}): {response.text}")
+        record_transfer(report_type, response)
+        page = response.content
+        # 不完整解碼頁面，直接從原始內容讀出總列數以判斷是否還有下一頁
+        match = _ROW_COUNT_PATTERN.search(page)
+        row_count = int(match.group(1)) if match else 0
+        rows = max(0, min(limit, row_count - offset))
+        tuner.observe(rows, len(page), elapsed)
+        yield page
+        offset += limit
+        if offset >= row_count:
+            break
+
+
+# 分頁取得完整報表並合併成單一響應 (欄位標頭與 metadata 取自第一頁)；
+# runReport 預設只回傳 10,000 列，需要完整結果的匯出必須走這裡
+def fetch_full_report(token, property_id, request_body, tuner=None, report_type='runReport', timer=None):
+    timer = timer or run_timer()
+    result = None
+    pages = 0
+    for page in iter_report_pages(token, property_id, request_body, tuner, report_type, timer):
+        with timer.stage('json_decode', report_type=report_type):
+            decoded = json.loads(page)
+        pages += 1
+        if result is None:
+            result = decoded
+            result["rows"] = decoded.get("rows", [])
+        else:
+            result["rows"].extend(decoded.get("rows", []))
+    result["pages"] = pages
+    return result
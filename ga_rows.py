@@ -0,0 +1,131 @@
+import sys
+from array import array
+
+# 精簡的報表結果型別：維度字串經 sys.intern 去重並以代碼陣列儲存，
+# 整數指標存於 array('q')、其餘指標存於 array('d')，每個儲存格只佔 8 個位元組，
+# 取代 row["dimensionValues"][0]["value"] 這種每格數百位元組的巢狀 dict/list。
+
+_INTEGER_TYPES = {'TYPE_INTEGER'}
+
+
+class CompactReport:
+    def __init__(self, dimensions, metrics, dictionaries, codes, columns):
+        self.dimensions = dimensions    # 維度名稱 tuple
+        self.metrics = metrics          # 指標名稱 tuple
+        self.dictionaries = dictionaries  # 每個維度的代碼表 (代碼 -> interned 字串)
+        self.codes = codes              # 每個維度一個 array('l')
+        self.columns = columns          # 每個指標一個 array('q') 或 array('d')
+        self._dimension_index = {name: i for i, name in enumerate(dimensions)}
+        self._metric_index = {name: i for i, name in enumerate(metrics)}
+        self._lookups = [{value: code for code, value in enumerate(d)} for d in dictionaries]
+
+    # 只依欄位標頭建立空的結果，之後以 extend 逐頁加入資料列
+    @classmethod
+    def from_headers(cls, result):
+        dimensions = tuple(sys.intern(h.get("name", "")) for h in result.get("dimensionHeaders", []))
+        metric_headers = result.get("metricHeaders", [])
+        metrics = tuple(sys.intern(h.get("name", "")) for h in metric_headers)
+        dictionaries = [[] for _ in dimensions]
+        codes = [array('l') for _ in dimensions]
+        columns = [array('q') if h.get("type") in _INTEGER_TYPES else array('d') for h in metric_headers]
+        return cls(dimensions, metrics, dictionaries, codes, columns)
+
+    @classmethod
+    def from_response(cls, result):
+        report = cls.from_headers(result)
+        report.extend(result)
+        return report
+
+    # 逐頁建立：每頁 (已解碼的響應) 加入後即可釋放，巢狀 dict 不會整份同時留在記憶體中
+    @classmethod
+    def from_responses(cls, results):
+        report = None
+        for result in results:
+            if report is None:
+                report = cls.from_headers(result)
+            report.extend(result)
+        return report
+
+    # 加入一頁響應的資料列 (欄位標頭須與建立時相同)
+    def extend(self, result):
+        dictionaries, lookups, codes, columns = self.dictionaries, self._lookups, self.codes, self.columns
+        for row in result.get("rows", []):
+            dim_values = row.get("dimensionValues", [])
+            for i in range(len(self.dimensions)):
+                value = dim_values[i].get("value", "") if i < len(dim_values) else ""
+                code = lookups[i].get(value)
+                if code is None:
+                    code = lookups[i][value] = len(dictionaries[i])
+                    dictionaries[i].append(sys.intern(value))
+                codes[i].append(code)
+            metric_values = row.get("metricValues", [])
+            for i, column in enumerate(columns):
+                raw = metric_values[i].get("value", "0") if i < len(metric_values) else "0"
+                try:
+                    column.append(int(raw) if column.typecode == 'q' else float(raw))
+                except ValueError:
+                    column.append(0)  # 如果轉換失敗，預設為 0
+
+    # 轉為 ReportColumns (共用代碼表與代碼陣列，指標轉為 array('d'))，供本地彙總與 ga_snapshot 使用
+    def to_columns(self):
+        from ga_columns import ReportColumns
+        return ReportColumns(self.dimensions, self.metrics, dict(zip(self.dimensions, self.dictionaries)),
+                             dict(zip(self.dimensions, self.codes)),
+                             {m: array('d', column) for m, column in zip(self.metrics, self.columns)})
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else (len(self.codes[0]) if self.codes else 0)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield RowView(self, index)
+
+
+class RowView:
+    __slots__ = ('_report', '_index')
+
+    def __init__(self, report, index):
+        self._report = report
+        self._index = index
+
+    # 依名稱取維度或指標值，例如 row['country']、row['activeUsers']
+    def __getitem__(self, name):
+        report = self._report
+        i = report._dimension_index.get(name)
+        if i is not None:
+            return report.dictionaries[i][report.codes[i][self._index]]
+        i = report._metric_index.get(name)
+        if i is not None:
+            return report.columns[i][self._index]
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    @property
+    def dimension_values(self):
+        report = self._report
+        return tuple(d[c[self._index]] for d, c in zip(report.dictionaries, report.codes))
+
+    @property
+    def metric_values(self):
+        return tuple(column[self._index] for column in self._report.columns)
+
+    def as_dict(self):
+        report = self._report
+        row = dict(zip(report.dimensions, self.dimension_values))
+        row.update(zip(report.metrics, self.metric_values))
+        return row
+
+    def __repr__(self):
+        return f"RowView({self.as_dict()!r})"
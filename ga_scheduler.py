@@ -0,0 +1,199 @@
+import heapq
+import json
+import os
+import random
+import time
+
+from ga_columns import ReportColumns
+from ga_keypool import KEY_FILES_ENV, KeyPool
+from ga_report import TokenProvider, fetch_metadata, make_ga_report_call
+from ga_snapshot import Snapshot, write_snapshot
+
+# 內建排程器：取代在 cron 中於同一時間啟動所有 get_*.py 腳本的做法。
+# - 每個報表有自己的更新間隔，首次執行時間依序錯開並加上隨機抖動，避免同時搶用配額與 CPU
+# - 所有工作共用同一個 TokenProvider (認證與令牌只處理一次)；設定 GA_SERVICE_ACCOUNT_FILES 時
+#   改用金鑰池 (見 ga_keypool)，報表工作依各金鑰的剩餘配額分散執行
+# - 快取結果仍在有效期內的工作會被略過
+# - 工作可宣告相依關係 (例如先更新中繼資料再執行報表)，相依工作過期時會先執行
+# - 報表工作的結果存為記憶體映射快照 (.snap，見 ga_snapshot)，其他工作存為 JSON
+
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+
+
+class Job:
+    def __init__(self, name, interval, action, depends_on=(), jitter=0.1, snapshot=False):
+        self.name = name
+        self.interval = interval      # 更新間隔 (秒)
+        self.action = action          # action(token_provider) -> 可序列化為 JSON 的結果，失敗時回傳 None
+        self.depends_on = tuple(depends_on)
+        self.jitter = jitter          # 以間隔比例表示的隨機抖動幅度
+        self.snapshot = snapshot      # 結果為報表響應時存為 .snap 快照
+
+
+class Scheduler:
+    def __init__(self, jobs, token_provider=None, cache_dir=CACHE_DIR,
+                 clock=time.time, sleep=time.sleep, rng=None):
+        self.jobs = {job.name: job for job in jobs}
+        for job in jobs:
+            for dependency in job.depends_on:
+                if dependency not in self.jobs:
+                    raise ValueError(f"工作 '{job.name}' 相依的 '{dependency}' 不存在")
+        self._check_acyclic()
+        self.token_provider = token_provider or TokenProvider()
+        self.cache_dir = cache_dir
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._queue = []
+
+    # 建立時即檢查相依關係沒有循環 (深度優先搜尋，節點完成後才移出路徑，菱形相依是合法的)
+    def _check_acyclic(self):
+        done = set()
+
+        def visit(name, path):
+            if name in path:
+                raise ValueError(f"工作相依關係出現循環: {' -> '.join(path + [name])}")
+            if name in done:
+                return
+            for dependency in self.jobs[name].depends_on:
+                visit(dependency, path + [name])
+            done.add(name)
+
+        for name in self.jobs:
+            visit(name, [])
+
+    def cache_path(self, name):
+        extension = 'snap' if self.jobs[name].snapshot else 'json'
+        return os.path.join(self.cache_dir, f'{name}.{extension}')
+
+    # 開啟報表工作最近一次的快照 (呼叫端負責 close)
+    def open_snapshot(self, name):
+        return Snapshot(self.cache_path(name))
+
+    # 快取檔案的修改時間仍在間隔內即視為新鮮
+    def is_fresh(self, job, now=None):
+        try:
+            age = (now or self._clock()) - os.path.getmtime(self.cache_path(job.name))
+        except OSError:
+            return False
+        return age < job.interval
+
+    # 將工作的首次執行時間平均分散在各自的間隔內，再加上抖動
+    def _schedule_initial(self, start):
+        names = sorted(self.jobs)
+        for i, name in enumerate(names):
+            job = self.jobs[name]
+            offset = job.interval * i / len(names)
+            heapq.heappush(self._queue, (start + offset + self._jitter(job), name))
+
+    def _jitter(self, job):
+        return self._rng.uniform(0, job.interval * job.jitter)
+
+    # 執行工作 (先處理過期的相依工作)；回傳是否實際執行了 API 請求。
+    # 相依工作失敗時延後此工作 (不執行，留待下次排程)；相依關係在建立時已確認無循環
+    def run_job(self, name):
+        return self._run_job(name, {})
+
+    # ready 記錄本次已處理的工作是否可用 (執行成功或快取有效)，共用的相依工作只處理一次
+    def _run_job(self, name, ready):
+        job = self.jobs[name]
+        for dependency in job.depends_on:
+            if dependency not in ready:
+                self._run_job(dependency, ready)
+            if not ready[dependency]:
+                print(f"[排程] 延後 {name}: 相依工作 {dependency} 未成功")
+                ready[name] = False
+                return False
+        if self.is_fresh(job):
+            print(f"[排程] 略過 {name}: 快取仍有效")
+            ready[name] = True
+            return False
+
+        print(f"[排程] 執行 {name}...")
+        ready[name] = False
+        result = job.action(self.token_provider)
+        if result is None:
+            print(f"[排程] {name} 執行失敗")
+            return False
+        self._write_cache(name, result)
+        ready[name] = True
+        return True
+
+    def _write_cache(self, name, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(name)
+        if self.jobs[name].snapshot:
+            write_snapshot(path, ReportColumns.from_response(result))
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def run_forever(self, max_runs=None):
+        self._schedule_initial(self._clock())
+        runs = 0
+        while self._queue and (max_runs is None or runs < max_runs):
+            due, name = heapq.heappop(self._queue)
+            wait = due - self._clock()
+            if wait > 0:
+                self._sleep(wait)
+            try:
+                self.run_job(name)
+            except Exception as e:
+                print(f"[排程] {name} 發生錯誤: {str(e)}")
+            runs += 1
+            job = self.jobs[name]
+            heapq.heappush(self._queue, (due + job.interval + self._jitter(job), name))
+
+
+# 報表工作：以共用令牌執行 runReport；使用金鑰池時由金鑰池挑選剩餘配額較多的金鑰
+def report_job(name, property_id, request_body, interval, depends_on=('metadata',)):
+    def action(token_provider):
+        if isinstance(token_provider, KeyPool):
+            return token_provider.run_report(property_id, request_body, report_type=name)
+        return make_ga_report_call(token_provider.token(), property_id, request_body)
+    return Job(name, interval, action, depends_on=depends_on, snapshot=True)
+
+
+def metadata_job(property_id, interval=24 * 3600):
+    def action(token_provider):
+        return fetch_metadata(token_provider.token(), property_id)
+    return Job('metadata', interval, action)
+
+
+def _breakdown(dimension):
+    return {
+        "dateRanges": [{"startDate": "7daysAgo", "endDate": "today"}],
+        "dimensions": [{"name": dimension}],
+        "metrics": [{"name": "activeUsers"}]
+    }
+
+
+def default_jobs(property_id):
+    return [
+        metadata_job(property_id),
+        report_job('device_category', property_id, _breakdown('deviceCategory'), 3600),
+        report_job('browser', property_id, _breakdown('browser'), 3600),
+        report_job('os', property_id, _breakdown('operatingSystem'), 3600),
+        report_job('screen_resolution', property_id, _breakdown('screenResolution'), 6 * 3600),
+        report_job('geolocation', property_id, {
+            **_breakdown('country'),
+            "dimensions": [{"name": "country"}, {"name": "city"}]
+        }, 3600),
+        report_job('new_users', property_id, {
+            **_breakdown('date'),
+            "metrics": [{"name": "newUsers"}, {"name": "activeUsers"}]
+        }, 3600),
+    ]
+
+
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 排程更新服務 =====")
+    property_id = os.environ.get('GA4_PROPERTY_ID')
+    if not property_id:
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。")
+        print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
+    else:
+        token_provider = KeyPool() if os.environ.get(KEY_FILES_ENV) else None
+        Scheduler(default_jobs(property_id), token_provider).run_forever()
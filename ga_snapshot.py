@@ -0,0 +1,194 @@
+import mmap
+import os
+import struct
+from array import array
+
+from ga_columns import ReportColumns
+
+# 報表快照的記憶體映射二進位格式：讀取端以 mmap 開啟，不需 json.load 整個檔案，
+# 多個程序讀取同一快照時經由 OS page cache 共用記憶體頁面。
+#
+# 檔案配置 (little-endian，各區段 8 位元組對齊):
+#   標頭        magic, 列數, 維度數, 指標數, 字串數, 各區段位移
+#   字典範圍    uint32[維度數 + 1]，每個維度的代碼表在字串表中的起始索引
+#   字串位移    uint64[字串數 + 1]，字串表前段依序為維度名稱、指標名稱，其後為各維度代碼表
+#   字串內容    UTF-8
+#   代碼欄位    uint32[維度數][列數]
+#   指標欄位    float64[指標數][列數]
+#
+# 報表腳本 (地理位置、裝置、作業系統、瀏覽器、螢幕解析度) 在 GA_SNAPSHOTS=1 時把最新結果
+# 存為 GA_CACHE_DIR/snapshots/<屬性>/<報表>.snap，儀表板等讀取端以 open_report_snapshot 開啟。
+
+MAGIC = b'GASNAP01'
+_HEADER = struct.Struct('<8sQIIIIQQQQ')
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+SNAPSHOTS_ENABLED = os.environ.get('GA_SNAPSHOTS') == '1'
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot(path, columns):
+    n_rows = columns.row_count
+    n_dims = len(columns.dimensions)
+    n_metrics = len(columns.metrics)
+
+    strings = list(columns.dimensions) + list(columns.metrics)
+    dict_starts = array('I')
+    for dimension in columns.dimensions:
+        dict_starts.append(len(strings))
+        strings.extend(columns.dictionaries[dimension])
+    dict_starts.append(len(strings))
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = array('Q', [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+    blob = b''.join(encoded)
+
+    ranges_offset = _HEADER.size
+    string_offsets_offset = _align(ranges_offset + dict_starts.itemsize * len(dict_starts))
+    blob_offset = string_offsets_offset + string_offsets.itemsize * len(string_offsets)
+    codes_offset = _align(blob_offset + len(blob))
+    metrics_offset = _align(codes_offset + 4 * n_dims * n_rows)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, n_rows, n_dims, n_metrics, len(strings), 0,
+                             string_offsets_offset, blob_offset, codes_offset, metrics_offset))
+        f.write(dict_starts.tobytes())
+        f.write(b'\0' * (string_offsets_offset - f.tell()))
+        f.write(string_offsets.tobytes())
+        f.write(blob)
+        f.write(b'\0' * (codes_offset - f.tell()))
+        for dimension in columns.dimensions:
+            array('I', columns.codes[dimension]).tofile(f)
+        f.write(b'\0' * (metrics_offset - f.tell()))
+        for metric in columns.metrics:
+            array('d', columns.values[metric]).tofile(f)
+    # 以原子替換發布新快照，已開啟舊檔的讀取端不受影響
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"報表快照檔案不完整: {path} ({size} 位元組)")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        (magic, self.row_count, n_dims, n_metrics, n_strings, _,
+         string_offsets_offset, blob_offset, codes_offset, metrics_offset) = _HEADER.unpack_from(buf)
+        # 檢查各區段都在檔案範圍內，截斷或毀損的檔案以 ValueError 回報，不留下開啟的映射
+        problem = None
+        if magic != MAGIC:
+            problem = "不是有效的報表快照檔案"
+        elif not (_HEADER.size + 4 * (n_dims + 1) <= string_offsets_offset
+                  and string_offsets_offset + 8 * (n_strings + 1) <= blob_offset <= codes_offset
+                  and codes_offset + 4 * n_dims * self.row_count <= metrics_offset
+                  and metrics_offset + 8 * n_metrics * self.row_count <= size):
+            problem = "報表快照檔案不完整或已毀損"
+        else:
+            blob_end = struct.unpack_from('<Q', buf, string_offsets_offset + 8 * n_strings)[0]
+            if blob_offset + blob_end > codes_offset:
+                problem = "報表快照檔案不完整或已毀損"
+        if problem:
+            buf.release()
+            self._mmap.close()
+            raise ValueError(f"{problem}: {path}")
+
+        self._buf = buf
+        self._dict_starts = buf[_HEADER.size:_HEADER.size + 4 * (n_dims + 1)].cast('I')
+        self._string_offsets = buf[string_offsets_offset:blob_offset].cast('Q')
+        self._blob_offset = blob_offset
+        self._strings = {}
+        self.dimensions = [self._string(i) for i in range(n_dims)]
+        self.metrics = [self._string(n_dims + i) for i in range(n_metrics)]
+        self._codes = {}
+        self._values = {}
+        for i, dimension in enumerate(self.dimensions):
+            start = codes_offset + 4 * i * self.row_count
+            self._codes[dimension] = buf[start:start + 4 * self.row_count].cast('I')
+        for i, metric in enumerate(self.metrics):
+            start = metrics_offset + 8 * i * self.row_count
+            self._values[metric] = buf[start:start + 8 * self.row_count].cast('d')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # 釋放快照本身持有的檢視並解除映射。呼叫端仍持有 codes()/metric() 的檢視 (或其切片) 時，
+    # 這些檢視保持有效，映射在最後一個檢視被釋放或回收時才解除，不會引發 BufferError
+    def close(self):
+        if self._mmap is None:
+            return
+        views = [self._dict_starts, self._string_offsets, *self._codes.values(), *self._values.values()]
+        for view in views:
+            view.release()
+        self._buf.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._mmap = None
+
+    # 字串只在被存取時才解碼
+    def _string(self, index):
+        value = self._strings.get(index)
+        if value is None:
+            start = self._blob_offset + self._string_offsets[index]
+            end = self._blob_offset + self._string_offsets[index + 1]
+            value = self._strings[index] = str(self._buf[start:end], 'utf-8')
+        return value
+
+    def dictionary(self, dimension):
+        i = self.dimensions.index(dimension)
+        return [self._string(s) for s in range(self._dict_starts[i], self._dict_starts[i + 1])]
+
+    # 零複製的欄位檢視 (memoryview)；呼叫端自行保留的檢視在 close() 之後仍可使用，用完請 release()
+    def codes(self, dimension):
+        return self._codes[dimension][:]
+
+    def metric(self, metric):
+        return self._values[metric][:]
+
+    def value(self, dimension, row):
+        i = self.dimensions.index(dimension)
+        return self._string(self._dict_starts[i] + self._codes[dimension][row])
+
+    def rows(self):
+        for row in range(self.row_count):
+            record = {d: self.value(d, row) for d in self.dimensions}
+            for m in self.metrics:
+                record[m] = self._values[m][row]
+            yield record
+
+    # 複製為 ReportColumns，以便使用 ga_columns 的彙總函數
+    def to_columns(self):
+        dictionaries = {d: self.dictionary(d) for d in self.dimensions}
+        codes = {d: array('l', self._codes[d]) for d in self.dimensions}
+        values = {m: array('d', self._values[m]) for m in self.metrics}
+        return ReportColumns(self.dimensions, self.metrics, dictionaries, codes, values)
+
+
+def report_snapshot_path(report_name, property_id='default', cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, 'snapshots', str(property_id), f'{report_name}.snap')
+
+
+# 依 GA_SNAPSHOTS 保存報表的最新結果 (ReportColumns)；回傳快照路徑，未啟用時回傳 None
+def save_report_snapshot(report_name, columns, property_id='default', cache_dir=CACHE_DIR):
+    if not SNAPSHOTS_ENABLED:
+        return None
+    path = report_snapshot_path(report_name, property_id, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_snapshot(path, columns)
+    return path
+
+
+# 開啟報表最近一次的快照 (呼叫端負責 close)
+def open_report_snapshot(report_name, property_id='default', cache_dir=CACHE_DIR):
+    return Snapshot(report_snapshot_path(report_name, property_id, cache_dir))
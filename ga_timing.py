@@ -0,0 +1,162 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# 各階段計時工具：以單調時鐘 (perf_counter_ns) 量測每個步驟，
+# 並以結構化 JSON (每行一筆) 輸出到 stderr 或指定檔案，不影響 stdout 上的報表輸出。
+#
+# 環境變數:
+#   GA_TIMING_LOG   未設定則不輸出日誌；設為 "stderr" 或檔案路徑以啟用
+#   GA_TIMING_OTEL  設為 1 時，若已安裝 opentelemetry-api，則額外匯出 span
+#
+# 共用報表路徑 (ga_report 的請求與解碼、ga_output 的輸出) 未指定計時器時記錄到 run_timer()
+# 回傳的程序層級計時器，各 get_*.py 腳本不需各自建立；程序結束時輸出彙總並關閉日誌檔。
+
+# 每個計時器保留的最近階段記錄數；彙總另外累計，長時間執行的程序 (排程、即時輪詢) 不會無限增長
+MAX_STAGE_RECORDS = 1000
+
+
+def _open_log_stream():
+    target = os.environ.get('GA_TIMING_LOG')
+    if not target:
+        return None
+    if target == 'stderr':
+        return sys.stderr, False
+    return open(target, 'a', encoding='utf-8'), True
+
+
+def _load_otel_tracer():
+    if os.environ.get('GA_TIMING_OTEL') != '1':
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer('ga-api-tool')
+
+
+class RunTimer:
+    def __init__(self, run_name, log_stream=None, tracer=None):
+        self.run_name = run_name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages = deque(maxlen=MAX_STAGE_RECORDS)
+        self._totals = {}
+        self._lock = threading.Lock()
+        # 只關閉自行開啟的日誌檔；呼叫端傳入的串流與 stderr 由呼叫端管理
+        if log_stream is not None:
+            self._log, self._owns_log = log_stream, False
+        else:
+            self._log, self._owns_log = _open_log_stream() or (None, False)
+        self._tracer = tracer if tracer is not None else _load_otel_tracer()
+        # 單調時鐘與牆上時鐘的差值，供 OpenTelemetry 需要的 epoch 時間戳使用
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._run_start_ns = time.perf_counter_ns()
+
+    # 以 with 包住一個步驟；回傳的 dict 可由呼叫端補上額外欄位 (例如位元組數)
+    @contextmanager
+    def stage(self, name, **attrs):
+        record = {'stage': name}
+        record.update(attrs)
+        start_ns = time.perf_counter_ns()
+        status = 'ok'
+        try:
+            yield record
+        except BaseException as e:
+            status = 'error'
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            end_ns = time.perf_counter_ns()
+            record['status'] = status
+            record['duration_ms'] = round((end_ns - start_ns) / 1e6, 3)
+            self._add(record)
+            self._emit({'event': 'stage', **record})
+            self._export_span(name, start_ns, end_ns, record)
+
+    # 記錄 HTTP 請求/響應的位元組數與網路耗時 (requests 的 elapsed 為送出到收到標頭的時間，
+    # 包含 DNS/TLS 與 GA 伺服器處理時間)
+    def record_http(self, record, response):
+        request_body = response.request.body if response.request is not None else None
+        if isinstance(request_body, str):
+            request_body = request_body.encode('utf-8')
+        record['request_bytes'] = len(request_body or b'')
+        record['response_bytes'] = len(response.content)
+        # 壓縮傳輸時線上位元組 (urllib3 實際讀取量) 小於解碼後的 response_bytes
+        raw = getattr(response, 'raw', None)
+        if raw is not None and hasattr(raw, 'tell'):
+            record['wire_bytes'] = raw.tell() or record['response_bytes']
+        record['http_status'] = response.status_code
+        record['time_to_headers_ms'] = round(response.elapsed.total_seconds() * 1000, 3)
+
+    def _add(self, record):
+        with self._lock:
+            self.stages.append(record)
+            entry = self._totals.setdefault(record['stage'], {'count': 0, 'duration_ms': 0.0})
+            entry['count'] += 1
+            entry['duration_ms'] = round(entry['duration_ms'] + record['duration_ms'], 3)
+            for key in ('request_bytes', 'response_bytes', 'wire_bytes'):
+                if key in record:
+                    entry[key] = entry.get(key, 0) + record[key]
+
+    def summary(self):
+        with self._lock:
+            totals = {name: dict(entry) for name, entry in self._totals.items()}
+        return {
+            'run': self.run_name,
+            'run_id': self.run_id,
+            'total_ms': round((time.perf_counter_ns() - self._run_start_ns) / 1e6, 3),
+            'stages': totals,
+        }
+
+    # 輸出彙總並關閉日誌檔；彙總為一次執行的最後一筆記錄，之後的階段不再輸出
+    def emit_summary(self):
+        summary = self.summary()
+        self._emit({'event': 'summary', **summary})
+        self.close()
+        return summary
+
+    def close(self):
+        with self._lock:
+            log, self._log = self._log, None
+        if log is not None and self._owns_log:
+            log.close()
+
+    def _emit(self, payload):
+        payload = {'run': self.run_name, 'run_id': self.run_id, **payload}
+        with self._lock:
+            if self._log is None:
+                return
+            self._log.write(json.dumps(payload, ensure_ascii=False) + '\n')
+            self._log.flush()
+
+    def _export_span(self, name, start_ns, end_ns, record):
+        if self._tracer is None:
+            return
+        span = self._tracer.start_span(name, start_time=start_ns + self._epoch_offset_ns)
+        span.set_attribute('ga.run', self.run_name)
+        span.set_attribute('ga.run_id', self.run_id)
+        for key, value in record.items():
+            if isinstance(value, (str, bool, int, float)):
+                span.set_attribute(f'ga.{key}', value)
+        span.end(end_time=end_ns + self._epoch_offset_ns)
+
+
+_process_timer = None
+_process_timer_lock = threading.Lock()
+
+
+# 程序層級的計時器，名稱取自執行的腳本；第一次取得時註冊程序結束時輸出彙總
+def run_timer():
+    global _process_timer
+    with _process_timer_lock:
+        if _process_timer is None:
+            name = os.path.splitext(os.path.basename(sys.argv[0] or ''))[0] or 'python'
+            _process_timer = RunTimer(name)
+            atexit.register(_process_timer.emit_summary)
+        return _process_timer
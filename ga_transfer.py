@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import threading
+
+# 壓縮傳輸與響應瘦身:
+# - Google API 只有在 Accept-Encoding 含 gzip 且 User-Agent 含 "gzip" 字串時才會壓縮響應；
+#   報表 JSON 每列重複欄位名稱，壓縮後通常只剩數分之一
+# - 已安裝 brotli (或 brotlicffi) 時額外宣告 br，requests/urllib3 才能自動解碼
+# - 以 fields 部分響應參數只取回需要的頂層欄位 (略過 kind、未要求的 propertyQuota 等)
+# - 依報表類型累計線上 (壓縮後) 與解碼後的位元組數，GA_TRANSFER_LOG=1 時於結束前輸出
+# - 設定 GA_RECORD_FILE 時同時錄製請求 (見 ga_loadtest)
+
+USER_AGENT = 'ga-api-tool (gzip)'
+# runReport 需要的頂層欄位；totals/maximums/minimums 只在請求 metricAggregations 時才有內容
+REPORT_FIELDS = 'dimensionHeaders,metricHeaders,rows,totals,maximums,minimums,rowCount,metadata'
+_FIELDS_BY_METHOD = {
+    'runReport': REPORT_FIELDS,
+    'runRealtimeReport': 'dimensionHeaders,metricHeaders,rows,totals,maximums,minimums,rowCount',
+}
+
+
+def _accept_encoding():
+    encodings = ['gzip', 'deflate']
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append('br')
+        break
+    return ', '.join(encodings)
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+
+# 含認證與壓縮協商的請求標頭
+def compressed_headers(token, content_type='application/json'):
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'User-Agent': USER_AGENT,
+    }
+    if content_type:
+        headers['Content-Type'] = content_type
+    return headers
+
+
+# 部分響應的查詢參數；method 沒有對應的欄位清單時回傳空字典 (取回完整響應)
+def fields_params(method='runReport', request_body=None):
+    fields = _FIELDS_BY_METHOD.get(method)
+    if not fields:
+        return {}
+    if (request_body or {}).get('returnPropertyQuota'):
+        fields += ',propertyQuota'
+    return {'fields': fields}
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+# 線上位元組：urllib3 的 tell() 為實際從連線讀取的 (壓縮後) 位元組數，無法取得時改用 Content-Length
+def _wire_bytes(response):
+    raw = getattr(response, 'raw', None)
+    try:
+        wire = raw.tell() if raw is not None else 0
+    except (AttributeError, OSError, ValueError):
+        wire = 0
+    if not wire:
+        wire = int(response.headers.get('Content-Length') or 0) or len(response.content)
+    return wire
+
+
+# 記錄一次響應的傳輸量；report_type 為報表類型名稱 (例如 geolocation、screen_resolution)
+def record_transfer(report_type, response):
+    decoded = len(response.content)
+    wire = _wire_bytes(response)
+    encoding = response.headers.get('Content-Encoding', 'identity')
+    with _stats_lock:
+        entry = _stats.setdefault(report_type, {'requests': 0, 'wire_bytes': 0, 'decoded_bytes': 0, 'encodings': {}})
+        entry['requests'] += 1
+        entry['wire_bytes'] += wire
+        entry['decoded_bytes'] += decoded
+        entry['encodings'][encoding] = entry['encodings'].get(encoding, 0) + 1
+    if os.environ.get('GA_RECORD_FILE'):
+        from ga_loadtest import recorder_from_env
+        recorder_from_env().record(report_type, response)  # 錄製請求供負載測試重播
+    return {'wire_bytes': wire, 'decoded_bytes': decoded, 'content_encoding': encoding}
+
+
+def transfer_summary():
+    with _stats_lock:
+        summary = {}
+        for report_type, entry in _stats.items():
+            ratio = entry['decoded_bytes'] / entry['wire_bytes'] if entry['wire_bytes'] else None
+            summary[report_type] = {**entry, 'encodings': dict(entry['encodings']),
+                                    'compression_ratio': round(ratio, 2) if ratio else None}
+        return summary
+
+
+def print_transfer_summary(stream=None):
+    if os.environ.get('GA_TRANSFER_LOG') != '1':
+        return
+    stream = stream or sys.stderr
+    for report_type, entry in sorted(transfer_summary().items()):
+        stream.write(json.dumps({'event': 'transfer', 'report_type': report_type, **entry},
+                                ensure_ascii=False) + '\n')
@@ -0,0 +1,202 @@
+import base64
+import hashlib
+import json
+import math
+import os
+from datetime import date, timedelta
+
+from ga_dates import FINAL_AFTER_DAYS, property_today
+from ga_report import fetch_full_report, make_ga_report_call
+
+# 任意區間的不重複使用者估計：activeUsers 不可跨日期加總，每個新區間原本都需要一次 API 查詢。
+# 此模組依序嘗試:
+#   1. 快取的精確結果 (以屬性 + 絕對日期區間 + 區段為鍵)
+#   2. 每日 HyperLogLog sketch 的聯集估計 —— 需要報表能提供使用者層級 ID 維度
+#      (例如自訂使用者維度 customUser:user_id)，GA 不會回傳原始使用者 ID 時無法使用
+#   3. 由每日 activeUsers 推得的上下界 (最大單日值 ~ 每日加總)
+# 除第 1 種外，結果皆標示為估計值。
+# 只有已定案的日期 (早於屬性當地今天 FINAL_AFTER_DAYS 天) 才會寫入快取；
+# 包含最近日期的區間每次都查詢 API，結果標示為暫定 (exact=False)。
+
+CACHE_DIR = os.environ.get('GA_CACHE_DIR', 'ga_cache')
+HLL_PRECISION = 14  # 2^14 個暫存器，標準誤差約 0.81%
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add(self, item):
+        h = int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog 精度不同，無法合併")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # 小基數時改用線性計數
+        return estimate
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def to_json(self):
+        return {"precision": self.precision, "registers": base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["precision"], bytearray(base64.b64decode(data["registers"])))
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+class UniqueUserEstimator:
+    def __init__(self, property_id, segment='all', cache_dir=CACHE_DIR, time_zone='UTC'):
+        self.property_id = str(property_id)
+        self.segment = segment
+        self.time_zone = time_zone
+        self.root = os.path.join(cache_dir, 'uniques', self.property_id, segment)
+
+    # 該日 GA 資料已不再變動
+    def is_final(self, day):
+        return day < property_today(self.time_zone) - timedelta(days=FINAL_AFTER_DAYS)
+
+    def _path(self, kind, name):
+        return os.path.join(self.root, kind, f'{name}.json')
+
+    def _load(self, kind, name):
+        try:
+            with open(self._path(kind, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _store(self, kind, name, data):
+        path = self._path(kind, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    # 以下 store_* 只保存已定案的日期或區間，回傳是否已寫入
+    def store_exact(self, start, end, value):
+        if not self.is_final(end):
+            return False
+        self._store('exact', f'{start.isoformat()}_{end.isoformat()}', {"value": value})
+        return True
+
+    def store_daily_count(self, day, value):
+        if not self.is_final(day):
+            return False
+        self._store('daily', day.isoformat(), {"value": value})
+        return True
+
+    def store_daily_sketch(self, day, user_ids):
+        if not self.is_final(day):
+            return False
+        sketch = HyperLogLog()
+        for user_id in user_ids:
+            sketch.add(user_id)
+        self._store('sketch', day.isoformat(), sketch.to_json())
+        return True
+
+    # 以 date 維度報表記錄每日 activeUsers (供上下界估計)；id_dimension 有值時同時建立每日 sketch。
+    # 依使用者 ID 細分時列數可能很多，以分頁取得完整結果；只保存已定案的日期
+    def ingest_daily(self, token, start, end, id_dimension=None):
+        dimensions = [{"name": "date"}] + ([{"name": id_dimension}] if id_dimension else [])
+        body = {
+            "dateRanges": [{"startDate": start.isoformat(), "endDate": end.isoformat()}],
+            "dimensions": dimensions,
+            "metrics": [{"name": "activeUsers"}],
+            "orderBys": [{"dimension": {"dimensionName": d["name"]}} for d in dimensions]
+        }
+        try:
+            result = fetch_full_report(token, self.property_id, body, report_type='unique_users')
+        except RuntimeError as e:
+            print(f"每日不重複使用者查詢失敗: {e}")
+            return False
+        counts = {}
+        ids = {}
+        for row in result.get("rows", []):
+            values = [v.get("value") for v in row.get("dimensionValues", [])]
+            raw = values[0]
+            day = date(int(raw[:4]), int(raw[4:6]), int(raw[6:8]))
+            counts[day] = counts.get(day, 0) + int(row["metricValues"][0].get("value", "0"))
+            if id_dimension:
+                ids.setdefault(day, []).append(values[1])
+        for day, value in counts.items():
+            if not id_dimension:
+                self.store_daily_count(day, value)
+        for day, user_ids in ids.items():
+            # 依使用者 ID 細分時每列約為一位使用者，每日不重複數即 ID 數
+            self.store_daily_count(day, len(set(user_ids)))
+            self.store_daily_sketch(day, user_ids)
+        return True
+
+    # 回傳 {"value", "exact", "method", 以及估計時的 "lower"/"upper" 或 "standard_error"}
+    def estimate(self, start, end):
+        if start > end:
+            raise ValueError(f"開始日期 {start} 晚於結束日期 {end}")
+        exact = self._load('exact', f'{start.isoformat()}_{end.isoformat()}')
+        if exact is not None:
+            return {"value": exact["value"], "exact": True, "method": "cached_exact"}
+
+        days = list(_days(start, end))
+        sketches = [self._load('sketch', d.isoformat()) for d in days]
+        if all(sketches):
+            union = HyperLogLog.from_json(sketches[0])
+            for data in sketches[1:]:
+                union.merge(HyperLogLog.from_json(data))
+            return {"value": round(union.count()), "exact": False, "method": "hll_union",
+                    "standard_error": union.standard_error}
+
+        counts = [self._load('daily', d.isoformat()) for d in days]
+        if all(counts):
+            values = [c["value"] for c in counts]
+            return {"value": None, "exact": False, "method": "daily_bounds",
+                    "lower": max(values), "upper": sum(values)}
+        return None
+
+    # 先嘗試本地估計；require_exact=True 或無法估計時才查詢 API。
+    # 區間已定案時快取精確結果；包含尚未定案的日期時不快取，並標示為暫定值
+    def unique_users(self, token, start, end, require_exact=False):
+        result = self.estimate(start, end)
+        if result is not None and (result["exact"] or not require_exact):
+            return result
+        body = {
+            "dateRanges": [{"startDate": start.isoformat(), "endDate": end.isoformat()}],
+            "metrics": [{"name": "activeUsers"}]
+        }
+        response = make_ga_report_call(token, self.property_id, body)
+        if response is None:
+            return result
+        rows = response.get("rows") or [{"metricValues": [{"value": "0"}]}]
+        value = int(rows[0]["metricValues"][0].get("value", "0"))
+        if self.store_exact(start, end, value):
+            return {"value": value, "exact": True, "method": "api"}
+        return {"value": value, "exact": False, "method": "api_provisional"}
+
+    # 滾動 7/28/90 天的不重複使用者 (以 end 為最後一天)
+    def rolling(self, token, end, windows=(7, 28, 90), require_exact=False):
+        return {window: self.unique_users(token, end - timedelta(days=window - 1), end, require_exact)
+                for window in windows}
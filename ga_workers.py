@@ -0,0 +1,108 @@
+import json
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from ga_columns import ReportColumns, group_by_sum
+
+# 程序池後處理：大型匯出 (數百萬列的地理位置、螢幕解析度報表) 的 JSON 解碼、型別轉換與彙總
+# 受 GIL 限制，改將原始頁面內容交給程序池，各程序完成解碼與部分彙總後，
+# 把指標數值寫入共享記憶體，由主程序合併，處理速度可隨 CPU 核心數擴展。
+# keys 與查詢的維度相同時每組只有一列，合併只是把各頁串接起來，
+# activeUsers 等不可加總的指標不會被重複計算；keys 較少時加總結果為上限估計。
+
+
+# 在子程序中執行：解碼一頁並依 keys 部分彙總，指標欄位寫入共享記憶體
+def _aggregate_page(page, keys, metrics):
+    columns = ReportColumns.from_response(json.loads(page))
+    grouped = group_by_sum(columns, keys, metrics)
+    n = grouped.row_count
+    # 每個維度只展開一次欄位，再逐列組合成鍵
+    group_keys = list(zip(*(grouped.column(key) for key in keys))) if keys else [()] * n
+
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * n * len(metrics), 8), track=False)
+    try:
+        view = shm.buf.cast('d')
+        for j, metric in enumerate(metrics):
+            view[j * n:(j + 1) * n] = grouped.values[metric]
+        view.release()
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, n, group_keys
+
+
+# 讀取一頁的部分彙總並累加到 totals，完成後釋放共享記憶體
+def _merge_segment(segment, totals, metrics):
+    name, n, group_keys = segment
+    shm = shared_memory.SharedMemory(name=name, track=False)
+    try:
+        view = shm.buf.cast('d')
+        for i, key in enumerate(group_keys):
+            sums = totals.setdefault(key, [0.0] * len(metrics))
+            for j in range(len(metrics)):
+                sums[j] += view[j * n + i]
+        view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _discard(futures):
+    # track=False 的共享記憶體不會被自動清理；出錯時取消尚未開始的頁面，並釋放已完成頁面的區段
+    for future in futures:
+        future.cancel()
+    for future in futures:
+        if future.cancelled():
+            continue
+        try:
+            name = future.result()[0]
+        except Exception:
+            continue
+        try:
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
+
+
+# 將各頁的部分彙總合併；回傳依 keys 分組加總後的 ReportColumns。
+# 同時處理中的頁面最多 max_pending 頁 (預設為程序數的 2 倍)，原始頁面內容不會全部同時留在記憶體中
+def aggregate_pages(pages, keys, metrics, processes=None, max_pending=None):
+    processes = processes or os.cpu_count()
+    max_pending = max_pending or processes * 2
+    totals = {}
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        try:
+            for page in pages:
+                pending.append(pool.submit(_aggregate_page, page, keys, metrics))
+                if len(pending) >= max_pending:
+                    _merge_segment(pending.popleft().result(), totals, metrics)
+            while pending:
+                _merge_segment(pending.popleft().result(), totals, metrics)
+        finally:
+            _discard(pending)
+    return _to_columns(totals, keys, metrics)
+
+
+def _to_columns(totals, keys, metrics):
+    dictionaries = {key: [] for key in keys}
+    lookups = {key: {} for key in keys}
+    codes = {key: array('l') for key in keys}
+    values = {metric: array('d') for metric in metrics}
+    for group_key, sums in totals.items():
+        for key, value in zip(keys, group_key):
+            code = lookups[key].get(value)
+            if code is None:
+                code = lookups[key][value] = len(dictionaries[key])
+                dictionaries[key].append(value)
+            codes[key].append(code)
+        for metric, total in zip(metrics, sums):
+            values[metric].append(total)
+    return ReportColumns(keys, metrics, dictionaries, codes, values)
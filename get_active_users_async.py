@@ -0,0 +1,46 @@
+import asyncio
+import json
+import os
+
+from ga_async import AsyncGAClient
+from ga_report import SERVICE_ACCOUNT_FILE
+
+# 1. 從環境變數讀取多個 GA4 屬性 ID (以逗號分隔)
+GA4_PROPERTY_IDS = [p.strip() for p in os.environ.get('GA4_PROPERTY_IDS', '').split(',') if p.strip()]
+REQUEST_DEADLINE = 30  # 每個請求的期限 (秒)
+
+# 2. 在單一事件迴圈中並行查詢所有屬性的活躍使用者
+async def fetch_active_users_for_properties():
+    request_body = {
+        "dateRanges": [{"startDate": "7daysAgo", "endDate": "today"}],
+        "metrics": [{"name": "activeUsers"}]
+    }
+    async with AsyncGAClient() as client:
+        results = await client.run_reports(
+            [(property_id, request_body) for property_id in GA4_PROPERTY_IDS],
+            deadline=REQUEST_DEADLINE)
+
+    summary = {}
+    for property_id, result in zip(GA4_PROPERTY_IDS, results):
+        if isinstance(result, BaseException):
+            print(f"- 屬性 ID: {property_id} 查詢失敗: {result}")
+            continue
+        rows = result.get("rows") or [{}]
+        summary[property_id] = rows[0].get("metricValues", [{}])[0].get("value", "0")
+        print(f"- 屬性 ID: {property_id}, 活躍使用者: {summary[property_id]}")
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return len(summary) == len(GA4_PROPERTY_IDS)
+
+# 3. 主函數
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 多屬性非同步查詢工具 =====")
+    if not GA4_PROPERTY_IDS:
+        print("錯誤：GA4_PROPERTY_IDS 環境變數未設定。")
+        print('請先設定 GA4_PROPERTY_IDS 環境變數 (以逗號分隔多個屬性 ID) 再執行此腳本。')
+    else:
+        try:
+            success = asyncio.run(fetch_active_users_for_properties())
+        except FileNotFoundError:
+            print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
+
+    print("\n===== 測試完成 =====")
@@ -2,9 +2,11 @@ import json
 import os
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_output import emit_report
+from ga_report import make_ga_report_call
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
@@ -35,12 +37,6 @@ def fetch_avg_session_duration():
         
         # 4. 設定 API 請求
         print("\n步驟 4: 發送 API 請求以獲取平均會話時長...")
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             "dateRanges": [
                 {
@@ -56,27 +52,12 @@ def fetch_avg_session_duration():
         }
         
         # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("\n成功! 平均會話時長 API 響應內容:")
-            result = response.json()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            # 可以加入更友好的格式化輸出
-            if result.get("rows"):
-                duration_seconds = float(result["rows"][0].get("metricValues", [{}])[0].get("value", "0"))
-                print(f"\n格式化輸出:")
-                print(f"- 平均會話時長: {duration_seconds:.2f} 秒")
-            return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
+        result = make_ga_report_call(token, GA4_PROPERTY_ID, data, report_type='avg_session_duration')
+        if result is None:
             return False
+        print("\n成功! 平均會話時長:")
+        emit_report(result, labels={"averageSessionDuration": "平均會話時長 (秒)"})
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
@@ -2,9 +2,11 @@ import json
 import os
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_output import emit_report
+from ga_report import make_ga_report_call
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
@@ -35,12 +37,6 @@ def fetch_browser_data():
         
         # 4. 設定 API 請求
         print("\n步驟 4: 發送 API 請求以獲取各瀏覽器的使用者數據...")
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             "dateRanges": [
                 {
@@ -61,29 +57,13 @@ def fetch_browser_data():
         }
         
         # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("\n成功! 各瀏覽器的使用者數據 API 響應內容:")
-            result = response.json()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            # 可以加入更友好的格式化輸出
-            if result.get("rows"):
-                print("\n格式化輸出:")
-                for row in result["rows"]:
-                    browser_name = row.get("dimensionValues", [{}])[0].get("value", "未知瀏覽器")
-                    users = row.get("metricValues", [{}])[0].get("value", "0")
-                    print(f"- 瀏覽器: {browser_name}, 活躍使用者: {users}")
-            return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
+        result = make_ga_report_call(token, GA4_PROPERTY_ID, data, report_type='browser')
+        if result is None:
             return False
+        print("\n成功! 各瀏覽器的使用者數據:")
+        emit_report(result, labels={"browser": "瀏覽器", "activeUsers": "活躍使用者"},
+                    report_name="browser", property_id=GA4_PROPERTY_ID)
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
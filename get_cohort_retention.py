@@ -0,0 +1,63 @@
+import os
+from datetime import timedelta
+
+from ga_cohorts import CohortRunner
+from ga_dates import lookup_time_zone, property_today
+from ga_output import open_writer
+from ga_report import SERVICE_ACCOUNT_FILE, get_access_token
+
+# 1. 從環境變數讀取 GA4 屬性 ID 與同類群組設定
+GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')
+COHORT_GRANULARITY = os.environ.get('COHORT_GRANULARITY', 'DAILY')  # DAILY 或 WEEKLY
+COHORT_HORIZON = int(os.environ.get('COHORT_HORIZON', '30'))        # 每個群組追蹤的位移數 (天或週)
+COHORT_LOOKBACK_DAYS = int(os.environ.get('COHORT_LOOKBACK_DAYS', '90'))  # 最早的群組距今天數
+
+# 2. 增量更新留存格 (已定案的格子取自本地快取，每天只需一個請求) 並輸出留存矩陣
+def fetch_cohort_retention():
+    if not GA4_PROPERTY_ID:
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。請設定該變數再執行。")
+        return False
+
+    try:
+        print("步驟 1: 獲取訪問令牌...")
+        token = get_access_token()
+
+        print("\n步驟 2: 查詢屬性時區...")
+        # 群組以屬性當地日期劃分，無法取得時區時不更新，以免錯位的格子被標示為定案
+        time_zone = lookup_time_zone(GA4_PROPERTY_ID)
+        today = property_today(time_zone)
+        print(f"屬性時區: {time_zone}, 當地日期: {today.isoformat()}")
+
+        print(f"\n步驟 3: 增量更新同類群組留存 ({COHORT_GRANULARITY}, 追蹤 {COHORT_HORIZON} 個位移)...")
+        runner = CohortRunner(GA4_PROPERTY_ID, COHORT_GRANULARITY, COHORT_HORIZON, time_zone)
+        requests_sent = runner.refresh(token, today - timedelta(days=COHORT_LOOKBACK_DAYS), today)
+        print(f"共發送 {requests_sent} 個請求")
+
+        print("\n留存矩陣 (cohortActiveUsers / cohortTotalUsers):")
+        with open_writer() as writer:
+            for cohort, rates in runner.retention_matrix().items():
+                row = {"cohort": cohort}
+                row.update((f"n{offset}", None if rate is None else round(rate, 4))
+                           for offset, rate in enumerate(rates))
+                writer.write_row(row)
+        return True
+
+    except FileNotFoundError:
+        print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
+        return False
+    except Exception as e:
+        print(f"\n發生錯誤: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+# 3. 主函數
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 同類群組留存報表工具 =====")
+    if not os.environ.get('GA4_PROPERTY_ID'):
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。")
+        print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
+    else:
+        success = fetch_cohort_retention()
+
+    print("\n===== 測試完成 =====")
@@ -0,0 +1,63 @@
+import os
+
+from ga_output import debug_dump, open_writer
+from ga_pivot import PivotCube, build_pivot_request
+from ga_report import SERVICE_ACCOUNT_FILE, get_access_token, make_ga_pivot_report_call
+
+# 1. 從環境變數讀取 GA4 屬性 ID
+GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')
+
+# 2. 一次 runPivotReport 取得 國家 × 裝置類別 交叉表，其餘視圖於本地計算
+def fetch_device_by_country():
+    if not GA4_PROPERTY_ID:
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。請設定該變數再執行。")
+        return False
+
+    try:
+        print("步驟 1: 獲取訪問令牌...")
+        token = get_access_token()
+
+        print("\n步驟 2: 發送 runPivotReport 請求 (國家 × 裝置類別)...")
+        request_body = build_pivot_request('country', 'deviceCategory', ['activeUsers', 'sessions'])
+        result = make_ga_pivot_report_call(token, GA4_PROPERTY_ID, request_body)
+        if result is None:
+            return False
+
+        print("\n步驟 3: 建立本地樞紐結構...")
+        debug_dump(result, "\n完整 API 響應內容:")
+        cube = PivotCube.from_response(result)
+        print(f"維度: {cube.dimensions}, 大小: {cube.shape}")
+
+        print("\n各裝置類別 (所有國家加總):")
+        for row in cube.rollup(['deviceCategory']).rows():
+            print(f"- 裝置類別: {row['deviceCategory']}, 工作階段: {int(row['sessions'])}")
+
+        print("\n工作階段前 10 名國家:")
+        for country, sessions in cube.top_n('country', 'sessions', 10):
+            print(f"- 國家: {country}, 工作階段: {int(sessions)}")
+
+        print("\n完整交叉表:")
+        with open_writer() as writer:
+            for row in cube.rows():
+                writer.write_row(row)
+        return True
+
+    except FileNotFoundError:
+        print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
+        return False
+    except Exception as e:
+        print(f"\n發生錯誤: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+# 3. 主函數
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 國家 × 裝置類別樞紐報表工具 =====")
+    if not os.environ.get('GA4_PROPERTY_ID'):
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。")
+        print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
+    else:
+        success = fetch_device_by_country()
+
+    print("\n===== 測試完成 =====")
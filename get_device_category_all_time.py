@@ -2,9 +2,13 @@ import json
 import os
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_accuracy import inspect_result, run_report_exact
+from ga_dates import lookup_time_zone
+from ga_output import emit_report
+from ga_report import make_ga_report_call
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
@@ -35,12 +39,6 @@ def fetch_device_category_all_time_data():
         
         # 4. 設定 API 請求
         print("\n步驟 4: 發送 API 請求以獲取各裝置類別的總計使用者數據...")
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         # 設定一個非常早的開始日期以獲取近似「所有時間」的數據
         # 您可以根據您 GA4 資源的實際開始日期調整此處的 startDate
         # 例如，如果您的資源從 2021-01-15 開始，可以使用 "2021-01-15"
@@ -68,33 +66,29 @@ def fetch_device_category_all_time_data():
         }
         
         # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("\n成功! 各裝置類別的總計使用者數據 API 響應內容:")
-            result = response.json()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            # 可以加入更友好的格式化輸出
-            if result.get("rows"):
-                print("\n格式化輸出:")
-                for row in result["rows"]:
-                    device = row.get("dimensionValues", [{}])[0].get("value", "未知裝置")
-                    users = row.get("metricValues", [{}])[0].get("value", "0")
-                    print(f"- 裝置類別: {device}, 活躍使用者 (總計): {users}")
-            elif result.get("rowCount", 0) == 0:
-                print("\n在指定的廣泛日期範圍內，未找到任何裝置類別的數據。")
-            else:
-                print("\n回應中未找到預期的 'rows' 數據結構。")
-            return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
+        result = make_ga_report_call(token, GA4_PROPERTY_ID, data, report_type='device_category_all_time')
+        if result is None:
             return False
+        # 長日期區間可能被抽樣；偵測到時自動拆分並行重跑後合併
+        accuracy = inspect_result(result)
+        if accuracy["sampled"] or accuracy["data_loss_from_other_row"]:
+            print("\n注意：結果受抽樣影響，正在拆分查詢後重新執行...")
+            # activeUsers 不可跨日期加總，改依 deviceCategory 逐值拆分；日期依屬性時區解析，
+            # 無法取得時區時不以日期拆分
+            try:
+                time_zone = lookup_time_zone(GA4_PROPERTY_ID)
+            except ValueError as e:
+                print(f"警告：{e}，不以日期拆分")
+                time_zone = None
+            result, accuracy = run_report_exact(token, GA4_PROPERTY_ID, data, coarse_dimension='deviceCategory',
+                                                time_zone=time_zone, initial_result=result)
+        print(f"結果精確度: {json.dumps(accuracy, ensure_ascii=False)}")
+        print("\n成功! 各裝置類別的總計使用者數據:")
+        emit_report(result, labels={"deviceCategory": "裝置類別", "activeUsers": "活躍使用者 (總計)"},
+                    report_name="device_category_all_time", property_id=GA4_PROPERTY_ID)
+        if not result.get("rows"):
+            print("\n在指定的廣泛日期範圍內，未找到任何裝置類別的數據。")
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
@@ -2,9 +2,18 @@ import json
 import os
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_changes import change_tracker
+from ga_columns import ReportColumns, top_k
+from ga_output import debug_dump, open_writer
+from ga_paging import PageSizeTuner
+from ga_report import fetch_full_report, iter_report_pages
+from ga_snapshot import save_report_snapshot
+from ga_timing import run_timer
+from ga_transfer import print_transfer_summary
+from ga_workers import aggregate_pages
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
@@ -12,99 +21,89 @@ GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4
 # 2. 定義所需的 API 範圍
 SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
 
+# 輸出視圖:
+#   cities                  活躍使用者前 50 名城市 (預設)
+#   countries               各國家的活躍使用者 (另以只含 country 維度的查詢取得；
+#                           activeUsers 不可加總，由城市列加總會重複計算跨城市的使用者)
+#   top_cities_per_country  每個國家前 5 名城市
+# cities 與 top_cities_per_country 由同一次 country + city 完整查詢於本地計算
+GEO_VIEW = os.environ.get('GEO_VIEW', 'cities')
+TOP_CITIES = 50
+TOP_CITIES_PER_COUNTRY = 5
+# 可改由程序池逐頁解碼 (見 ga_workers)；設定為大於 1 的程序數時啟用
+WORKER_PROCESSES = int(os.environ.get('GA_WORKER_PROCESSES', '0'))
+
 # 3. 嘗試獲取令牌並進行 API 調用
 def fetch_geolocation_data():
     if not GA4_PROPERTY_ID:
         print("錯誤：GA4_PROPERTY_ID 環境變數未設定。請設定該變數再執行。")
         return False
         
+    timer = run_timer()
     try:
         print("步驟 1: 嘗試載入服務帳戶金鑰...")
-        with open(SERVICE_ACCOUNT_FILE, 'r') as f:
-            key_data = json.load(f)
-            print(f"金鑰資訊: 專案 ID: {key_data.get('project_id')}, 客戶端 Email: {key_data.get('client_email')}")
+        with timer.stage('load_key'):
+            with open(SERVICE_ACCOUNT_FILE, 'r') as f:
+                key_data = json.load(f)
+        print(f"金鑰資訊: 專案 ID: {key_data.get('project_id')}, 客戶端 Email: {key_data.get('client_email')}")
         
         print("\n步驟 2: 建立憑證...")
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        with timer.stage('build_credentials'):
+            credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
         
         print("\n步驟 3: 獲取訪問令牌...")
-        credentials.refresh(Request())
+        with timer.stage('token_refresh'):
+            credentials.refresh(Request())
         token = credentials.token
         print(f"令牌獲取成功: {token[:20]}...")
         
         # 4. 設定 API 請求
         print("\n步驟 4: 發送 API 請求以獲取各地理位置的使用者數據...")
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
+        data = build_geo_request(GEO_VIEW)
         
-        data = {
-            "dateRanges": [
-                {
-                    "startDate": "7daysAgo",
-                    "endDate": "today"
-                }
-            ],
-            "dimensions": [
-                {
-                    "name": "country"
-                },
-                {
-                    "name": "city"
-                }
-            ],
-            "metrics": [
-                {
-                    "name": "activeUsers"
-                }
-            ],
-            "orderBys": [
-                {
-                    "metric": {"metricName": "activeUsers"},
-                    "desc": True
-                }
-            ],
-            "limit": 50 # 限制結果數量，避免過多數據
-        }
+        # 5. 分頁取得完整結果 (單次請求預設只回傳 10,000 列) 並輸出；
+        #    每頁的 limit 由 PageSizeTuner 依前一頁的延遲與響應大小調整
+        tuner = PageSizeTuner()
+        if WORKER_PROCESSES > 1:
+            # 各頁一取得即交給程序池解碼，主程序只合併各頁的欄位；
+            # 分組鍵與查詢維度相同，每組只有一列，activeUsers 不會被加總
+            with timer.stage('fetch_and_aggregate') as record:
+                pages = iter_report_pages(token, GA4_PROPERTY_ID, data, tuner, report_type='geolocation',
+                                          timer=timer)
+                columns = aggregate_pages(pages, geo_dimensions(GEO_VIEW), ['activeUsers'], WORKER_PROCESSES)
+                record['pages'] = len(tuner.history)
+                record['page_sizes'] = [limit for limit, _, _, _ in tuner.history]
+            print(f"共取得 {sum(rows for _, rows, _, _ in tuner.history)} 列 ({len(tuner.history)} 頁，{WORKER_PROCESSES} 個程序解碼)")
+        else:
+            with timer.stage('fetch_report') as record:
+                result = fetch_full_report(token, GA4_PROPERTY_ID, data, tuner, report_type='geolocation',
+                                           timer=timer)
+                record['pages'] = result["pages"]
+                record['page_sizes'] = [limit for limit, _, _, _ in tuner.history]
+                record['rows'] = len(result["rows"])
+            print(f"共取得 {len(result['rows'])} 列 ({result['pages']} 頁)")
+            debug_dump(result, "\n完整 API 響應內容:")
+            columns = ReportColumns.from_response(result)
         
-        # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
+        # GA_SNAPSHOTS=1 時另存完整查詢結果的記憶體映射快照供其他程序讀取 (見 ga_snapshot)
+        save_report_snapshot(f'geolocation_{GEO_VIEW}', columns, GA4_PROPERTY_ID)
+
+        with timer.stage('transform_rows') as record:
+            grafana_data = build_geo_view(columns, GEO_VIEW)
+            record['rows'] = columns.row_count
         
-        if response.status_code == 200:
-            result = response.json()
-            
-            grafana_data = []
-            if result.get("rows"):
-                for row in result["rows"]:
-                    country = row.get("dimensionValues", [{}, {}])[0].get("value", "未知國家")
-                    city = row.get("dimensionValues", [{}, {}])[1].get("value", "未知城市")
-                    users_str = row.get("metricValues", [{}])[0].get("value", "0")
-                    try:
-                        users = int(users_str)
-                    except ValueError:
-                        users = 0 # 如果轉換失敗，預設為 0
-                    
-                    grafana_data.append({
-                        "country": country,
-                        "city": city,
-                        "activeUsers": users
-                    })
-            
-            # 直接印出供給 Grafana 使用的 JSON 數據
-            print(json.dumps(grafana_data, indent=2, ensure_ascii=False))
-            return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
-            return False
+        # 直接印出供給 Grafana 使用的 JSON 數據
+        with timer.stage('format_output'):
+            # GA_CHANGES=1 時只輸出與上次執行相比的變更列；各視圖分別保存快照
+            # 鍵欄位取自視圖定義的維度而非查詢結果，空結果時也能比較出刪除列
+            tracker = change_tracker(f'geolocation_{GEO_VIEW}', geo_dimensions(GEO_VIEW), GA4_PROPERTY_ID)
+            with open_writer(os.environ.get('GA_OUTPUT', 'json')) as writer:
+                for row in (grafana_data if tracker is None else tracker.diff(grafana_data)):
+                    writer.write_row(row)
+            if tracker is not None:
+                tracker.commit()
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
@@ -114,6 +113,45 @@ def fetch_geolocation_data():
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        timer.emit_summary()
+
+# 各視圖的查詢維度；countries 視圖只查詢 country，由 GA 計算不重複的國家活躍使用者
+def geo_dimensions(view):
+    return ['country'] if view == 'countries' else ['country', 'city']
+
+
+def build_geo_request(view):
+    dimensions = geo_dimensions(view)
+    return {
+        "dateRanges": [
+            {
+                "startDate": "7daysAgo",
+                "endDate": "today"
+            }
+        ],
+        "dimensions": [{"name": name} for name in dimensions],
+        "metrics": [
+            {
+                "name": "activeUsers"
+            }
+        ],
+        # 不再讓伺服器以 orderBys/limit 截斷，排序與 Top-N 改於本地計算；
+        # 依維度排序只是為了讓 offset 分頁的順序穩定，不會在頁與頁之間重複或漏列
+        "orderBys": [{"dimension": {"dimensionName": name}} for name in dimensions]
+    }
+
+
+# 依視圖名稱從欄式結果產生 Grafana 使用的列
+def build_geo_view(columns, view):
+    if view == 'countries':
+        rows = sorted(columns.rows(), key=lambda row: row['activeUsers'], reverse=True)
+    elif view == 'top_cities_per_country':
+        rows = [row for group in top_k(columns, 'activeUsers', TOP_CITIES_PER_COUNTRY, group='country').values()
+                for row in group]
+    else:
+        rows = top_k(columns, 'activeUsers', TOP_CITIES)
+    return [{**row, "activeUsers": int(row["activeUsers"])} for row in rows]
 
 # ... (run_diagnostics 函數可以省略或複製之前的版本)
 
@@ -125,5 +163,6 @@ if __name__ == "__main__":
         print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
     else:
         success = fetch_geolocation_data()
+        print_transfer_summary()
         
     print("\n===== 測試完成 ======") 
\ No newline at end of file
@@ -0,0 +1,63 @@
+import os
+
+from ga_output import debug_dump, open_writer
+from ga_periods import PeriodComparison, build_comparison_request, week_over_week_ranges
+from ga_report import SERVICE_ACCOUNT_FILE, get_access_token, make_ga_report_call
+
+# 1. 從環境變數讀取 GA4 屬性 ID
+GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')
+
+# 2. 一次請求取得本週與上週的活躍/新使用者，取代分別執行 get_unique_users.py 與 get_new_users.py 兩次
+def fetch_week_over_week():
+    if not GA4_PROPERTY_ID:
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。請設定該變數再執行。")
+        return False
+
+    try:
+        print("步驟 1: 獲取訪問令牌...")
+        token = get_access_token()
+
+        print("\n步驟 2: 發送包含兩個日期區間的 API 請求...")
+        request_body = build_comparison_request({
+            "metrics": [
+                {"name": "activeUsers"},
+                {"name": "newUsers"}
+            ]
+        }, week_over_week_ranges())
+        result = make_ga_report_call(token, GA4_PROPERTY_ID, request_body)
+        if result is None:
+            return False
+
+        debug_dump(result, "\n完整 API 響應內容:")
+        comparison = PeriodComparison.from_response(result, request_body)
+        summary = {
+            metric: comparison.compare(metric, "this_week", "last_week")
+            for metric in comparison.metrics
+        }
+
+        labels = {"metric": "指標", "this_week": "本週", "last_week": "上週", "delta": "差值", "ratio": "比率"}
+        with open_writer(labels=labels) as writer:
+            for metric, rows in summary.items():
+                for row in rows:
+                    writer.write_row({"metric": metric, **row})
+        return True
+
+    except FileNotFoundError:
+        print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
+        return False
+    except Exception as e:
+        print(f"\n發生錯誤: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+# 3. 主函數
+if __name__ == "__main__":
+    print("===== Google Analytics Data API - 週對週比較工具 =====")
+    if not os.environ.get('GA4_PROPERTY_ID'):
+        print("錯誤：GA4_PROPERTY_ID 環境變數未設定。")
+        print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
+    else:
+        success = fetch_week_over_week()
+
+    print("\n===== 測試完成 =====")
@@ -1,10 +1,14 @@
 import json
 import os
+import time
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_output import emit_report
+from ga_realtime import RealtimeWindow, build_realtime_request, build_realtime_totals_requests
+from ga_report import TokenProvider, make_ga_report_call
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
@@ -12,6 +16,11 @@ GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4
 # 2. 定義所需的 API 範圍
 SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
 
+# 設定 REALTIME_POLL_SECONDS 後改為持續輪詢模式，維護 5/15/30 分鐘滾動彙總
+REALTIME_POLL_SECONDS = int(os.environ.get('REALTIME_POLL_SECONDS', '0'))
+# REALTIME_EXACT_TOTALS=1 時每次輪詢另發 2 個 minuteRanges 請求取得各時間窗的精確總數 (配額用量為 3 倍)
+REALTIME_EXACT_TOTALS = os.environ.get('REALTIME_EXACT_TOTALS') == '1'
+
 # 3. 嘗試獲取令牌並進行 API 調用
 def fetch_realtime_active_users():
     if not GA4_PROPERTY_ID:
@@ -35,13 +44,6 @@ def fetch_realtime_active_users():
         
         # 4. 設定 API 請求 (使用 Realtime Reporting API)
         print("\n步驟 4: 發送 API 請求以獲取即時活躍使用者數量...")
-        # 注意：Realtime API 的端點與 Beta Reporting API 不同
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runRealtimeReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             "metrics": [
                 {
@@ -49,36 +51,19 @@ def fetch_realtime_active_users():
                 }
             ]
             # Realtime API 通常不需要 dateRanges
-            # 可以根據需要加入 dimensions，例如： "dimensions": [{"name": "minutesAgo"}]
+            # 需要 minutesAgo 等細分與滾動彙總時請使用 watch_realtime()
         }
         
-        # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("\n成功! 即時活躍使用者數量 API 響應內容:")
-            result = response.json()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            # 可以加入更友好的格式化輸出
-            if result.get("rows"):
-                realtime_users = result["rows"][0].get("metricValues", [{}])[0].get("value", "0")
-                print(f"\n格式化輸出:")
-                print(f"- 目前在線使用者 (活躍使用者): {realtime_users}")
-            elif result.get("rowCount", 0) == 0:
-                 print(f"\n目前沒有即時活躍使用者數據。")
-            else:
-                print(f"\n回應中未找到預期的 'rows' 數據結構。")
-
-            return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
+        # 5. 發送請求並輸出結果 (Realtime API 的端點為 runRealtimeReport)；
+        #    完整響應只在 GA_DEBUG_DUMP=1 時印出 (見 ga_output)
+        result = make_ga_report_call(token, GA4_PROPERTY_ID, data, method='runRealtimeReport',
+                                     report_type='realtime')
+        if result is None:
             return False
+        print("\n成功! 即時活躍使用者數量:")
+        if not emit_report(result, labels={"activeUsers": "目前在線使用者 (活躍使用者)"}):
+            print("\n目前沒有即時活躍使用者數據。")
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
@@ -89,6 +74,28 @@ def fetch_realtime_active_users():
         traceback.print_exc()
         return False
 
+# 輪詢模式：每次輪詢只發一個包含 minutesAgo 與 country/deviceCategory/unifiedScreenName 的請求，
+# 各時間窗的總計與維度細分由本地滾動彙總產生 (上限估計)；exact_totals 為 True 時才另以 minuteRanges 請求取得精確總數
+def watch_realtime(poll_seconds, max_polls=None, exact_totals=REALTIME_EXACT_TOTALS):
+    token_provider = TokenProvider(SERVICE_ACCOUNT_FILE, SCOPES)
+    window = RealtimeWindow()
+    request_body = build_realtime_request()
+    totals_requests = build_realtime_totals_requests() if exact_totals else []
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        result = make_ga_report_call(token_provider.token(), GA4_PROPERTY_ID, request_body,
+                                     method='runRealtimeReport')
+        if result is not None:
+            window.update(result)
+            for totals_body in totals_requests:
+                totals = make_ga_report_call(token_provider.token(), GA4_PROPERTY_ID, totals_body,
+                                             method='runRealtimeReport')
+                if totals is not None:
+                    window.update_totals(totals, totals_body)
+            print(json.dumps(window.panels(), ensure_ascii=False))
+        polls += 1
+        time.sleep(poll_seconds)
+
 # ... (run_diagnostics 函數可以省略或複製之前的版本)
 
 # 7. 主函數
@@ -97,6 +104,11 @@ if __name__ == "__main__":
     if not os.environ.get('GA4_PROPERTY_ID'):
         print("錯誤：GA4_PROPERTY_ID 環境變數未設定。")
         print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
+    elif REALTIME_POLL_SECONDS > 0:
+        try:
+            watch_realtime(REALTIME_POLL_SECONDS)
+        except KeyboardInterrupt:
+            print("\n已停止輪詢。")
     else:
         success = fetch_realtime_active_users()
         
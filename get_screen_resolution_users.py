@@ -2,15 +2,25 @@ import json
 import os
 
 from google.oauth2 import service_account
-import requests
 from google.auth.transport.requests import Request
 
+from ga_output import debug_dump, open_writer
+from ga_paging import PageSizeTuner
+from ga_report import iter_report_pages
+from ga_rows import CompactReport
+from ga_snapshot import SNAPSHOTS_ENABLED, save_report_snapshot
+from ga_transfer import print_transfer_summary
+from ga_workers import aggregate_pages
+
 # 1. 載入您的服務帳戶金鑰文件
 SERVICE_ACCOUNT_FILE = 'ga-service-account.json'  # 替換為您的金鑰文件路徑
 GA4_PROPERTY_ID = os.environ.get('GA4_PROPERTY_ID')  # 從環境變數讀取 GA4 屬性 ID
 
 # 2. 定義所需的 API 範圍
 SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+# 可改由程序池逐頁解碼 (見 ga_workers)；設定為大於 1 的程序數時啟用
+WORKER_PROCESSES = int(os.environ.get('GA_WORKER_PROCESSES', '0'))
+LABELS = {"screenResolution": "螢幕解析度", "activeUsers": "活躍使用者"}
 
 # 3. 嘗試獲取令牌並進行 API 調用
 def fetch_screen_resolution_data():
@@ -35,12 +45,6 @@ def fetch_screen_resolution_data():
         
         # 4. 設定 API 請求
         print("\n步驟 4: 發送 API 請求以獲取各螢幕解析度的使用者數據...")
-        url = f'https://analyticsdata.googleapis.com/v1beta/properties/{GA4_PROPERTY_ID}:runReport'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             "dateRanges": [
                 {
@@ -57,33 +61,35 @@ def fetch_screen_resolution_data():
                 {
                     "name": "activeUsers"
                 }
-            ]
+            ],
+            "orderBys": [{"dimension": {"dimensionName": "screenResolution"}}]  # 讓分頁順序穩定
         }
         
-        # 5. 發送請求並輸出結果
-        response = requests.post(url, headers=headers, json=data)
-        print(f"API 響應狀態碼: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("\n成功! 各螢幕解析度的使用者數據 API 響應內容:")
-            result = response.json()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            # 可以加入更友好的格式化輸出
-            if result.get("rows"):
-                print("\n格式化輸出:")
-                for row in result["rows"]:
-                    resolution = row.get("dimensionValues", [{}])[0].get("value", "未知解析度")
-                    users = row.get("metricValues", [{}])[0].get("value", "0")
-                    print(f"- 螢幕解析度: {resolution}, 活躍使用者: {users}")
+        # 5. 分頁取得完整結果並輸出；每頁的 limit 由 PageSizeTuner 依延遲與響應大小調整
+        tuner = PageSizeTuner()
+        if WORKER_PROCESSES > 1:
+            # 各頁一取得即交給程序池解碼；分組鍵與查詢維度相同，每個解析度只有一列，activeUsers 不會被加總
+            pages = iter_report_pages(token, GA4_PROPERTY_ID, data, tuner, report_type='screen_resolution')
+            columns = aggregate_pages(pages, ['screenResolution'], ['activeUsers'], WORKER_PROCESSES)
+            print(f"共取得 {columns.row_count} 列 ({len(tuner.history)} 頁，{WORKER_PROCESSES} 個程序解碼)")
+            save_report_snapshot('screen_resolution', columns, GA4_PROPERTY_ID)
+            print("\n成功! 各螢幕解析度的使用者數據:")
+            with open_writer(labels=LABELS) as writer:
+                for row in columns.rows():
+                    writer.write_row({**row, "activeUsers": int(row["activeUsers"])})
             return True
-        else:
-            print("\n請求失敗! 錯誤詳情:")
-            try:
-                error_details = response.json()
-                print(json.dumps(error_details, indent=2, ensure_ascii=False))
-            except json.JSONDecodeError as e:
-                print(f"無法解析錯誤詳情: {response.text}: {e}")
-            return False
+        # 逐頁解碼並加入精簡的欄式結果，每頁的巢狀 dict 加入後即釋放，不會保留整份響應
+        pages = iter_report_pages(token, GA4_PROPERTY_ID, data, tuner, report_type='screen_resolution')
+        report = CompactReport.from_responses(_decoded_pages(pages))
+        print(f"共取得 {len(report)} 列 ({len(tuner.history)} 頁, 每頁 limit: {[limit for limit, _, _, _ in tuner.history]})")
+        if SNAPSHOTS_ENABLED:
+            # GA_SNAPSHOTS=1 時另存記憶體映射快照供其他程序讀取 (見 ga_snapshot)
+            save_report_snapshot('screen_resolution', report.to_columns(), GA4_PROPERTY_ID)
+        print("\n成功! 各螢幕解析度的使用者數據:")
+        with open_writer(labels=LABELS) as writer:
+            for row in report:
+                writer.write_row(row.as_dict())
+        return True
             
     except FileNotFoundError:
         print(f"\n錯誤: 服務帳戶金鑰文件 '{SERVICE_ACCOUNT_FILE}' 未找到。請確認文件路徑是否正確。")
@@ -94,6 +100,12 @@ def fetch_screen_resolution_data():
         traceback.print_exc()
         return False
 
+def _decoded_pages(pages):
+    for page in pages:
+        result = json.loads(page)
+        debug_dump(result, "\n完整 API 響應內容 (單頁):")
+        yield result
+
 # ... (run_diagnostics 函數可以省略或複製之前的版本)
 
 # 7. 主函數
@@ -104,5 +116,6 @@ if __name__ == "__main__":
         print('請先設定 GA4_PROPERTY_ID 環境變數再執行此腳本。')
     else:
         success = fetch_screen_resolution_data()
+        print_transfer_summary()
         
     print("\n===== 測試完成 ======") 
\ No newline at end of file
@@ -0,0 +1,24 @@
+import datetime
+import json
+
+import pytest
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=None, headers=None, request_body=b''):
+        self.status_code = status_code
+        self.content = content if content is not None else json.dumps(payload or {}).encode('utf-8')
+        self.headers = headers or {}
+        self.text = self.content.decode('utf-8')
+        self.elapsed = datetime.timedelta(milliseconds=5)
+        self.request = type('Request', (), {'body': request_body})()
+        self.raw = None
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# 建立假的 requests 響應：fake_response(status_code, payload=..., content=...)
+@pytest.fixture
+def fake_response():
+    return FakeResponse
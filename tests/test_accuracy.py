@@ -0,0 +1,121 @@
+import ga_accuracy
+from ga_accuracy import _format_number, _merge, run_report_exact
+
+
+def _result(rows):
+    return {
+        "dimensionHeaders": [{"name": "country"}],
+        "metricHeaders": [{"name": "sessions"}, {"name": "averageSessionDuration"}],
+        "rows": [
+            {"dimensionValues": [{"value": country}], "metricValues": [{"value": v} for v in values]}
+            for country, values in rows
+        ],
+    }
+
+
+def test_format_number_keeps_all_digits():
+    assert _format_number(2469134.0) == '2469134'
+    assert _format_number(12345678901.0) == '12345678901'
+    assert _format_number(0.0) == '0'
+    assert _format_number(1.25) == '1.25'
+
+
+def test_additive_merge_sums_by_dimension():
+    merged = _merge([
+        _result([("Taiwan", ["1234567", "1.5"]), ("Japan", ["3", "0"])]),
+        None,
+        _result([("Taiwan", ["1234567", "2.25"])]),
+    ], additive_merge=True)
+    assert merged["rowCount"] == 2
+    values = {row["dimensionValues"][0]["value"]: [v["value"] for v in row["metricValues"]]
+              for row in merged["rows"]}
+    assert values == {"Taiwan": ["2469134", "3.75"], "Japan": ["3", "0"]}
+
+
+def test_non_additive_merge_concatenates_rows():
+    first = _result([("Taiwan", ["1", "0"])])
+    second = _result([("Japan", ["2", "0"])])
+    merged = _merge([first, second], additive_merge=False)
+    assert merged["rows"] == first["rows"] + second["rows"]
+    assert merged["metricHeaders"] == first["metricHeaders"]
+
+
+SAMPLED = {"samplingMetadatas": [{"samplesReadCount": "1000", "samplingSpaceSize": "5000"}]}
+
+
+class StubCaller:
+    # 依請求內容回傳固定響應，並記錄送出的請求
+    def __init__(self, respond):
+        self.respond = respond
+        self.bodies = []
+
+    def __call__(self, token, property_id, body):
+        self.bodies.append(body)
+        return self.respond(body)
+
+
+def _response(dimensions, rows, metadata=None):
+    return {
+        "dimensionHeaders": [{"name": d} for d in dimensions],
+        "metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+        "rows": [{"dimensionValues": [{"value": v} for v in values], "metricValues": [{"value": str(users)}]}
+                 for values, users in rows],
+        "metadata": metadata or {},
+    }
+
+
+def test_date_split_concatenates_daily_halves(monkeypatch):
+    def respond(body):
+        start = body["dateRanges"][0]["startDate"]
+        return _response(["date"], [([start.replace('-', '')], 1)])
+    caller = StubCaller(respond)
+    monkeypatch.setattr(ga_accuracy, 'make_ga_report_call', caller)
+    body = {"dateRanges": [{"startDate": "2024-03-01", "endDate": "2024-03-04"}],
+            "dimensions": [{"name": "date"}], "metrics": [{"name": "activeUsers"}]}
+
+    result, accuracy = run_report_exact('token', '123', body, initial_result=_response(["date"], [], SAMPLED))
+    assert sorted(b["dateRanges"][0]["startDate"] for b in caller.bodies) == ['2024-03-01', '2024-03-03']
+    assert accuracy["strategy"] == "date_split"
+    assert accuracy["exact"] and accuracy["partitions"] == 2
+    assert sorted(row["dimensionValues"][0]["value"] for row in result["rows"]) == ['20240301', '20240303']
+
+
+def test_dimension_split_reuses_initial_rows_for_single_dimension(monkeypatch):
+    def respond(body):
+        value = body["dimensionFilter"]["filter"]["stringFilter"]["value"]
+        return _response(["deviceCategory"], [([value], 10)])
+    caller = StubCaller(respond)
+    monkeypatch.setattr(ga_accuracy, 'make_ga_report_call', caller)
+    body = {"dateRanges": [{"startDate": "2020-01-01", "endDate": "today"}],
+            "dimensions": [{"name": "deviceCategory"}], "metrics": [{"name": "activeUsers"}]}
+    initial = _response(["deviceCategory"], [(["desktop"], 7), (["mobile"], 5)], SAMPLED)
+
+    result, accuracy = run_report_exact('token', '123', body, coarse_dimension='deviceCategory',
+                                        initial_result=initial)
+    # 沒有另發取得 deviceCategory 值的查詢，只有逐值過濾的兩個請求
+    assert len(caller.bodies) == 2
+    assert all("dimensionFilter" in b for b in caller.bodies)
+    assert accuracy["strategy"] == "dimension_split"
+    assert [row["metricValues"][0]["value"] for row in result["rows"]] == ['10', '10']
+    # 值的清單來自抽樣的查詢，結果不標示為精確
+    assert not accuracy["exact"]
+    assert any("deviceCategory" in note for note in accuracy["notes"])
+
+
+def test_dimension_split_queries_coarse_values_for_other_row_loss(monkeypatch):
+    def respond(body):
+        if "dimensionFilter" not in body:
+            return _response(["country"], [(["Taiwan"], 3), (["Japan"], 2)])
+        value = body["dimensionFilter"]["filter"]["stringFilter"]["value"]
+        return _response(["country", "city"], [([value, f"{value}-city"], 1)])
+    caller = StubCaller(respond)
+    monkeypatch.setattr(ga_accuracy, 'make_ga_report_call', caller)
+    body = {"dateRanges": [{"startDate": "2024-03-01", "endDate": "2024-03-04"}],
+            "dimensions": [{"name": "country"}, {"name": "city"}], "metrics": [{"name": "activeUsers"}]}
+    initial = _response(["country", "city"], [(["(other)", "(other)"], 9)], {"dataLossFromOtherRow": True})
+
+    result, accuracy = run_report_exact('token', '123', body, coarse_dimension='country', initial_result=initial)
+    assert caller.bodies[0]["dimensions"] == [{"name": "country"}]
+    assert accuracy["strategy"] == "dimension_split"
+    assert accuracy["exact"]
+    assert [row["dimensionValues"][0]["value"] for row in result["rows"]] == ['Taiwan', 'Japan']
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from ga_async import AsyncGAClient, GAAPIError
+
+
+@pytest.fixture
+def key_file(tmp_path):
+    rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+    serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode('ascii')
+    path = tmp_path / 'key.json'
+    path.write_text(json.dumps({"client_email": "test@example.com", "private_key": pem,
+                                "private_key_id": "1", "token_uri": "https://oauth2.example/token"}))
+    return str(path)
+
+
+class FakeHTTP:
+    def __init__(self, delay=0.0, status_code=200):
+        self.delay = delay
+        self.status_code = status_code
+        self.calls = []
+
+    async def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url, headers))
+        await asyncio.sleep(self.delay)
+        return FakeAsyncResponse(self.status_code, {"rows": [], "url": url})
+
+
+class FakeAsyncResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+def _client(key_file, http, **kwargs):
+    client = AsyncGAClient(key_file, **kwargs)
+    client._http = http
+    # 略過令牌端點
+    client._token = 'token'
+    client._token_expiry = time.time() + 3600
+    return client
+
+
+def test_run_report_posts_with_token(key_file):
+    http = FakeHTTP()
+    client = _client(key_file, http)
+    result = asyncio.run(client.run_report('123', {"metrics": []}))
+    assert result["url"].endswith('/properties/123:runReport')
+    assert http.calls[0][2] == {'Authorization': 'Bearer token'}
+
+
+def test_deadline_includes_semaphore_wait(key_file):
+    # 只有一個並行名額：第二個請求在排隊時就超過期限
+    client = _client(key_file, FakeHTTP(delay=0.5), max_concurrency=1)
+
+    async def main():
+        first = asyncio.create_task(client.run_report('1', {}))
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await client.run_report('2', {}, deadline=0.05)
+        waited = time.monotonic() - started
+        await first
+        return waited
+
+    assert asyncio.run(main()) < 0.4
+
+
+def test_run_reports_returns_errors_in_place(key_file):
+    client = _client(key_file, FakeHTTP(status_code=403))
+    results = asyncio.run(client.run_reports([('1', {}), ('2', {})]))
+    assert all(isinstance(r, GAAPIError) and r.status_code == 403 for r in results)
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import ga_auth_broker
+from ga_auth_broker import SharedTokenCache
+
+
+class FakeCredentials:
+    refreshed = 0
+
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request):
+        FakeCredentials.refreshed += 1
+        self.token = f'token-{FakeCredentials.refreshed}'
+        # google-auth 的 expiry 為不含時區的 UTC 時間
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=self.lifetime)
+
+
+@pytest.fixture
+def key_file(tmp_path, monkeypatch):
+    FakeCredentials.refreshed = 0
+    lifetime = {'seconds': 3600}
+    monkeypatch.setattr(ga_auth_broker.service_account.Credentials, 'from_service_account_file',
+                        lambda *args, **kwargs: FakeCredentials(lifetime['seconds']))
+    path = tmp_path / 'key.json'
+    path.write_text(json.dumps({'client_email': 'robot@example.iam.gserviceaccount.com'}))
+    return str(path), lifetime
+
+
+def test_second_process_reuses_cached_token(tmp_path, key_file):
+    path, _ = key_file
+    first = SharedTokenCache(path, ['scope'], cache_dir=str(tmp_path / 'cache'))
+    second = SharedTokenCache(path, ['scope'], cache_dir=str(tmp_path / 'cache'))
+    assert first.token() == 'token-1'
+    assert second.token() == 'token-1'
+    assert (first.refresh_count, second.refresh_count) == (1, 0)
+    assert oct(os.stat(first.token_path).st_mode & 0o777) == oct(0o600)
+
+
+def test_token_near_expiry_is_refreshed(tmp_path, key_file):
+    path, lifetime = key_file
+    lifetime['seconds'] = ga_auth_broker.REFRESH_MARGIN - 10
+    cache = SharedTokenCache(path, ['scope'], cache_dir=str(tmp_path / 'cache'))
+    assert cache.token() == 'token-1'
+    assert cache.token() == 'token-2'
+    with open(cache.token_path) as f:
+        assert json.load(f)['expiry'] == pytest.approx(time.time() + lifetime['seconds'], abs=5)
+
+
+def test_scopes_use_separate_cache_entries(tmp_path, key_file):
+    path, _ = key_file
+    read = SharedTokenCache(path, ['read'], cache_dir=str(tmp_path / 'cache'))
+    edit = SharedTokenCache(path, ['edit'], cache_dir=str(tmp_path / 'cache'))
+    assert read.token_path != edit.token_path
+    assert read.token() != edit.token()
+
+
+def test_corrupt_cache_file_triggers_refresh(tmp_path, key_file):
+    path, _ = key_file
+    cache = SharedTokenCache(path, ['scope'], cache_dir=str(tmp_path / 'cache'))
+    with open(cache.token_path, 'w') as f:
+        f.write('{not json')
+    assert cache.token() == 'token-1'
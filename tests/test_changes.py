@@ -0,0 +1,105 @@
+from ga_changes import ChangeTracker
+from ga_snapshot import Snapshot
+
+
+def _tracker(tmp_path, **kwargs):
+    return ChangeTracker('geolocation', ['country', 'city'], 'p1', cache_dir=str(tmp_path), **kwargs)
+
+
+def test_first_run_is_snapshot(tmp_path):
+    tracker = _tracker(tmp_path)
+    rows = [{"country": "Taiwan", "city": "臺北", "activeUsers": 3}]
+    assert tracker.diff(rows) == [{"op": "snapshot", **rows[0]}]
+
+
+def test_diff_after_commit(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([
+        {"country": "Taiwan", "city": "臺北", "activeUsers": 3},
+        {"country": "Taiwan", "city": "高雄", "activeUsers": 2},
+        {"country": "Japan", "city": "Tokyo", "activeUsers": 1},
+    ])
+    tracker.commit()
+
+    # 重新載入，確認快照已寫入磁碟
+    tracker = _tracker(tmp_path)
+    changes = tracker.diff([
+        {"country": "Taiwan", "city": "臺北", "activeUsers": 3},
+        {"country": "Taiwan", "city": "高雄", "activeUsers": 5},
+        {"country": "Japan", "city": "Osaka", "activeUsers": 4},
+    ])
+    assert changes == [
+        {"op": "update", "country": "Taiwan", "city": "高雄", "activeUsers": 5},
+        {"op": "insert", "country": "Japan", "city": "Osaka", "activeUsers": 4},
+        {"op": "delete", "country": "Japan", "city": "Tokyo", "activeUsers": 1},
+    ]
+
+
+def test_uncommitted_diff_is_not_saved(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])
+    tracker.commit()
+    tracker.diff([])  # 輸出失敗，未 commit
+
+    changes = _tracker(tmp_path).diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])
+    assert changes == []
+
+
+def test_empty_result_deletes_previous_rows(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])
+    tracker.commit()
+    assert _tracker(tmp_path).diff([]) == [{"op": "delete", "country": "Taiwan", "city": "臺北", "activeUsers": 3}]
+
+
+def test_checkpoint_every(tmp_path):
+    tracker = _tracker(tmp_path, checkpoint_every=2)
+    rows = [{"country": "Taiwan", "city": "臺北", "activeUsers": 3}]
+    ops = []
+    for _ in range(4):
+        ops.append([change["op"] for change in tracker.diff(rows)])
+        tracker.commit()
+    assert ops == [["snapshot"], ["snapshot"], [], ["snapshot"]]
+
+
+def test_changed_key_fields_start_over(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])
+    tracker.commit()
+
+    tracker = ChangeTracker('geolocation', ['country'], 'p1', cache_dir=str(tmp_path))
+    assert tracker.diff([{"country": "Taiwan", "activeUsers": 3}]) == [
+        {"op": "snapshot", "country": "Taiwan", "activeUsers": 3}]
+
+
+def test_previous_result_is_stored_as_snapshot(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3, "share": 0.5}])
+    tracker.commit()
+    with Snapshot(tracker.path) as snapshot:
+        assert snapshot.dimensions == ['country', 'city']
+        assert snapshot.metrics == ['activeUsers', 'share']
+    # 還原的值與輸出列型別相同，未變動時沒有變更列
+    tracker = _tracker(tmp_path)
+    assert tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3, "share": 0.5}]) == []
+    changes = tracker.diff([])
+    assert changes == [{"op": "delete", "country": "Taiwan", "city": "臺北", "activeUsers": 3, "share": 0.5}]
+    assert type(changes[0]["activeUsers"]) is int
+
+
+def test_report_without_dimensions(tmp_path):
+    tracker = ChangeTracker('avg_session_duration', [], 'p1', cache_dir=str(tmp_path))
+    tracker.diff([{"averageSessionDuration": 12.5}])
+    tracker.commit()
+    tracker = ChangeTracker('avg_session_duration', [], 'p1', cache_dir=str(tmp_path))
+    assert tracker.diff([{"averageSessionDuration": 13.0}]) == [{"op": "update", "averageSessionDuration": 13.0}]
+
+
+def test_corrupt_snapshot_starts_over(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])
+    tracker.commit()
+    with open(tracker.path, 'r+b') as f:
+        f.truncate(16)
+    assert [c["op"] for c in _tracker(tmp_path).diff([{"country": "Taiwan", "city": "臺北", "activeUsers": 3}])] == [
+        "snapshot"]
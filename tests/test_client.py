@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+import ga_client
+from ga_async import GAAPIError
+from ga_client import GAClient, ReportCache
+
+SPEC = {"dateRanges": [{"startDate": "7daysAgo", "endDate": "today"}],
+        "dimensions": [{"name": "country"}], "metrics": [{"name": "activeUsers"}]}
+PAYLOAD = {"dimensionHeaders": [{"name": "country"}],
+           "metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+           "rows": [{"dimensionValues": [{"value": "Taiwan"}], "metricValues": [{"value": "3"}]}]}
+
+
+class StaticToken:
+    def token(self):
+        return 'token'
+
+
+@pytest.fixture
+def api(monkeypatch, fake_response):
+    calls = []
+
+    def post(url, headers=None, json=None, params=None, timeout=None):
+        calls.append(json)
+        return fake_response(200, PAYLOAD)
+    monkeypatch.setattr(ga_client.requests, 'post', post)
+    return calls
+
+
+def test_results_are_resolved_and_cached(api):
+    client = GAClient('123', StaticToken(), time_zone='Asia/Taipei')
+    first = client.run_report(SPEC)
+    assert client.run_report(SPEC) is first
+    assert len(api) == 1
+    assert api[0]["dateRanges"][0]["startDate"][:2] == '20'
+    assert list(first) == [{"country": "Taiwan", "activeUsers": 3}]
+
+
+def test_failed_time_zone_lookup_is_not_cached(api, monkeypatch):
+    lookups = []
+
+    def lookup(property_id, token_provider=None):
+        lookups.append(property_id)
+        raise ValueError("無法取得屬性 123 的時區")
+    monkeypatch.setattr(ga_client, 'lookup_time_zone', lookup)
+    client = GAClient('123', StaticToken())
+    client.run_report(SPEC)
+    client.run_report(SPEC)
+    # 未解析的請求原樣送出，結果不快取；每次都重新查詢時區
+    assert api[0]["dateRanges"] == SPEC["dateRanges"]
+    assert len(api) == 2 and len(lookups) == 2
+
+    monkeypatch.setattr(ga_client, 'lookup_time_zone', lambda property_id, token_provider=None: 'UTC')
+    client.run_report(SPEC)
+    client.run_report(SPEC)
+    assert len(api) == 3
+    assert client.property_time_zone('123') == 'UTC'
+
+
+def test_api_error_raises(monkeypatch, fake_response):
+    monkeypatch.setattr(ga_client.requests, 'post',
+                        lambda *args, **kwargs: fake_response(403, {"error": {"message": "denied"}}))
+    client = GAClient('123', StaticToken(), time_zone='UTC')
+    with pytest.raises(GAAPIError) as error:
+        client.run_report(SPEC)
+    assert error.value.status_code == 403
+    assert client.cache.stats()["entries"] == 0
+
+
+def test_concurrent_identical_requests_share_one_call(monkeypatch, fake_response):
+    release = threading.Event()
+    calls = []
+
+    def post(url, headers=None, json=None, params=None, timeout=None):
+        calls.append(json)
+        release.wait(5)
+        return fake_response(200, PAYLOAD)
+    monkeypatch.setattr(ga_client.requests, 'post', post)
+    client = GAClient('123', StaticToken(), time_zone='UTC')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.run_report(SPEC))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_cache_expires_and_evicts():
+    now = [0.0]
+    cache = ReportCache(ttl=10, max_entries=2, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('c', 3)
+    assert cache.get('a') is None and cache.get('c') == 3
+    now[0] = 11
+    assert cache.get('b') is None
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+import pytest
+
+import ga_cohorts
+from ga_cohorts import CohortRunner
+
+TODAY = date(2024, 6, 30)
+
+
+class FakeCohortApi:
+    # 每個群組 100 位使用者，位移 n 的活躍使用者為 100 - n；skip 中的格子模擬 GA 省略的零值列
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.bodies = []
+
+    def __call__(self, token, property_id, body, report_type=None):
+        self.bodies.append(body)
+        spec = body["cohortSpec"]
+        rows = []
+        for cohort in spec["cohorts"]:
+            for offset in range(spec["cohortsRange"]["startOffset"], spec["cohortsRange"]["endOffset"] + 1):
+                if (cohort["name"], offset) in self.skip:
+                    continue
+                rows.append({"dimensionValues": [{"value": cohort["name"]}, {"value": str(offset)}],
+                             "metricValues": [{"value": str(100 - offset)}, {"value": "100"}]})
+        return {"rows": rows}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeCohortApi()
+    monkeypatch.setattr(ga_cohorts, 'make_ga_report_call', fake)
+    return fake
+
+
+def test_daily_refresh_is_one_incremental_request(tmp_path, api):
+    runner = CohortRunner('123', horizon=30, cache_dir=str(tmp_path))
+    # 首次回補 90 天的群組時分批
+    assert runner.refresh('token', TODAY - timedelta(days=90), TODAY) > 1
+    api.bodies.clear()
+    # 之後每天只有最近的群組含未定案格子，一個請求即可
+    reloaded = CohortRunner('123', horizon=30, cache_dir=str(tmp_path))
+    assert reloaded.refresh('token', TODAY - timedelta(days=90), TODAY + timedelta(days=1)) == 1
+    cohorts = [c["name"] for c in api.bodies[0]["cohortSpec"]["cohorts"]]
+    assert min(cohorts) >= (TODAY - timedelta(days=32)).isoformat()
+
+
+def test_cells_become_final_after_delay(tmp_path, api):
+    runner = CohortRunner('123', horizon=5, cache_dir=str(tmp_path))
+    runner.refresh('token', TODAY - timedelta(days=10), TODAY)
+    cohort = runner.cells[(TODAY - timedelta(days=10)).isoformat()]
+    assert all(cell["final"] for cell in cohort.values())
+    recent = runner.cells[TODAY.isoformat()]
+    assert list(recent) == ['0'] and not recent['0']["final"]
+    assert runner.retention_matrix()[(TODAY - timedelta(days=10)).isoformat()] == [1.0, 0.99, 0.98, 0.97, 0.96]
+
+
+def test_omitted_cells_are_zero_with_known_total(tmp_path, monkeypatch):
+    cohort = (TODAY - timedelta(days=10)).isoformat()
+    fake = FakeCohortApi(skip={(cohort, 2)})
+    monkeypatch.setattr(ga_cohorts, 'make_ga_report_call', fake)
+    runner = CohortRunner('123', horizon=5, cache_dir=str(tmp_path))
+    runner.refresh('token', TODAY - timedelta(days=10), TODAY)
+    assert runner.cells[cohort]['2'] == {"active": 0, "total": 100, "final": True}
+
+
+def test_weekly_cohorts_start_on_sunday(tmp_path, api):
+    runner = CohortRunner('123', granularity='WEEKLY', horizon=4, cache_dir=str(tmp_path))
+    runner.refresh('token', date(2024, 6, 5), TODAY)  # 週三
+    cohorts = api.bodies[0]["cohortSpec"]["cohorts"]
+    assert cohorts[0]["dateRange"] == {"startDate": "2024-06-02", "endDate": "2024-06-08"}
+    assert api.bodies[0]["dimensions"][1] == {"name": "cohortNthWeek"}
+    assert all(date.fromisoformat(c).weekday() == 6 for c in runner.cells)
+
+
+def test_unknown_granularity_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CohortRunner('123', granularity='MONTHLY', cache_dir=str(tmp_path))
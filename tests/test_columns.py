@@ -0,0 +1,71 @@
+from ga_columns import ReportColumns, group_by_sum, top_k, weighted_mean
+
+
+def _columns(rows, dimensions=('country', 'city'), metrics=('activeUsers',)):
+    return ReportColumns.from_response({
+        "dimensionHeaders": [{"name": name} for name in dimensions],
+        "metricHeaders": [{"name": name} for name in metrics],
+        "rows": [
+            {"dimensionValues": [{"value": v} for v in row[:len(dimensions)]],
+             "metricValues": [{"value": str(v)} for v in row[len(dimensions):]]}
+            for row in rows
+        ],
+    })
+
+
+CITIES = [
+    ("Taiwan", "臺北", 50),
+    ("Taiwan", "高雄", 20),
+    ("Taiwan", "臺中", 30),
+    ("Japan", "Tokyo", 40),
+    ("Japan", "Osaka", 10),
+]
+
+
+def test_from_response_dictionary_encodes():
+    columns = _columns(CITIES)
+    assert columns.row_count == 5
+    assert columns.dictionaries['country'] == ['Taiwan', 'Japan']
+    assert list(columns.codes['country']) == [0, 0, 0, 1, 1]
+    assert columns.column('city') == ['臺北', '高雄', '臺中', 'Tokyo', 'Osaka']
+    assert next(columns.rows()) == {"country": "Taiwan", "city": "臺北", "activeUsers": 50.0}
+
+
+def test_unparsable_metric_defaults_to_zero():
+    columns = _columns([("Taiwan", "臺北", "n/a")])
+    assert list(columns.values['activeUsers']) == [0.0]
+
+
+def test_group_by_sum():
+    grouped = group_by_sum(_columns(CITIES), ['country'])
+    assert sorted((row['country'], row['activeUsers']) for row in grouped.rows()) == [
+        ("Japan", 50.0), ("Taiwan", 100.0)]
+
+
+def test_group_by_sum_multiple_keys_skips_empty_groups():
+    grouped = group_by_sum(_columns(CITIES + [("Japan", "Tokyo", 5)]), ['country', 'city'])
+    rows = {(row['country'], row['city']): row['activeUsers'] for row in grouped.rows()}
+    assert len(rows) == 5
+    assert rows[("Japan", "Tokyo")] == 45.0
+
+
+def test_weighted_mean():
+    columns = _columns([
+        ("desktop", 100, 1),
+        ("desktop", 40, 3),
+        ("mobile", 10, 0),
+    ], dimensions=('deviceCategory',), metrics=('averageSessionDuration', 'sessions'))
+    rows = {row['deviceCategory']: row for row in
+            weighted_mean(columns, ['deviceCategory'], 'averageSessionDuration', 'sessions').rows()}
+    assert rows['desktop']['averageSessionDuration'] == 55.0
+    assert rows['desktop']['sessions'] == 4.0
+    # 權重為 0 的組平均為 0，不會除以零
+    assert rows['mobile']['averageSessionDuration'] == 0.0
+
+
+def test_top_k_overall_and_per_group():
+    columns = _columns(CITIES)
+    assert [row['city'] for row in top_k(columns, 'activeUsers', 2)] == ['臺北', 'Tokyo']
+    per_country = top_k(columns, 'activeUsers', 2, group='country')
+    assert [row['city'] for row in per_country['Taiwan']] == ['臺北', '臺中']
+    assert [row['city'] for row in per_country['Japan']] == ['Tokyo', 'Osaka']
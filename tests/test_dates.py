@@ -0,0 +1,93 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import ga_dates
+from ga_dates import DailyPartitionStore, fetch_daily, lookup_time_zone, resolve_request
+
+# 2024-03-10 20:00 UTC 在臺北已是 3 月 11 日
+NOW = datetime(2024, 3, 10, 20, 0, tzinfo=ZoneInfo('UTC'))
+BODY = {
+    "dateRanges": [{"startDate": "6daysAgo", "endDate": "today"}],
+    "dimensions": [{"name": "date"}],
+    "metrics": [{"name": "newUsers"}],
+}
+
+
+def test_relative_dates_resolve_in_property_time_zone():
+    body = resolve_request({"dateRanges": [{"startDate": "7daysAgo", "endDate": "yesterday"}]}, 'Asia/Taipei', NOW)
+    assert body["dateRanges"] == [{"startDate": "2024-03-04", "endDate": "2024-03-10"}]
+    body = resolve_request({"dateRanges": [{"startDate": "today", "endDate": "today"}]}, 'UTC', NOW)
+    assert body["dateRanges"] == [{"startDate": "2024-03-10", "endDate": "2024-03-10"}]
+
+
+def test_lookup_time_zone_raises_instead_of_guessing(monkeypatch):
+    import ga_properties
+
+    class FailingIndex:
+        def __init__(self, token_provider):
+            raise RuntimeError("Admin API 請求失敗 (狀態碼 403)")
+    monkeypatch.setattr(ga_properties, 'PropertyIndex', FailingIndex)
+    with pytest.raises(ValueError, match="403"):
+        lookup_time_zone('123')
+
+
+class FakeReportApi:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, token, property_id, body, report_type=None):
+        self.requests.append(body)
+        start = date.fromisoformat(body["dateRanges"][0]["startDate"])
+        end = date.fromisoformat(body["dateRanges"][0]["endDate"])
+        rows = [{"dimensionValues": [{"value": date.fromordinal(d).strftime('%Y%m%d')}],
+                 "metricValues": [{"value": str(len(self.requests))}]}
+                for d in range(start.toordinal(), end.toordinal() + 1)]
+        return {"dimensionHeaders": [{"name": "date"}],
+                "metricHeaders": [{"name": "newUsers", "type": "TYPE_INTEGER"}],
+                "rows": rows, "rowCount": len(rows)}
+
+
+def test_fetch_daily_only_refetches_unfinalized_days(tmp_path, monkeypatch):
+    api = FakeReportApi()
+    monkeypatch.setattr(ga_dates, 'fetch_full_report', api)
+    store = DailyPartitionStore(str(tmp_path))
+
+    first = fetch_daily('token', '123', BODY, 'Asia/Taipei', store, NOW)
+    assert api.requests[0]["dateRanges"] == [{"startDate": "2024-03-05", "endDate": "2024-03-11"}]
+    assert [row["dimensionValues"][0]["value"] for row in first["rows"]][0] == '20240305'
+    assert first["rowCount"] == 7
+
+    second = fetch_daily('token', '123', BODY, 'Asia/Taipei', store, NOW)
+    # 早於當地今天 FINAL_AFTER_DAYS 天的日期才定案，只重抓 3/9 ~ 3/11
+    assert api.requests[1]["dateRanges"] == [{"startDate": "2024-03-09", "endDate": "2024-03-11"}]
+    assert [row["metricValues"][0]["value"] for row in second["rows"]] == ['1'] * 4 + ['2'] * 3
+    assert second["metricHeaders"] == first["metricHeaders"]
+
+
+def test_fetch_daily_serves_fully_cached_range_with_headers(tmp_path, monkeypatch):
+    api = FakeReportApi()
+    monkeypatch.setattr(ga_dates, 'fetch_full_report', api)
+    store = DailyPartitionStore(str(tmp_path))
+    body = {**BODY, "dateRanges": [{"startDate": "2024-03-01", "endDate": "2024-03-03"}]}
+    fetch_daily('token', '123', body, 'UTC', store, NOW)
+    result = fetch_daily('token', '123', body, 'UTC', store, NOW)
+    assert len(api.requests) == 1
+    assert result["dimensionHeaders"] == [{"name": "date"}]
+    assert result["rowCount"] == 3
+
+
+def test_truncated_fetch_is_never_finalized(tmp_path, monkeypatch):
+    api = FakeReportApi()
+
+    def truncated(*args, **kwargs):
+        result = api(*args, **kwargs)
+        result["rowCount"] = len(result["rows"]) + 1
+        return result
+    monkeypatch.setattr(ga_dates, 'fetch_full_report', truncated)
+    store = DailyPartitionStore(str(tmp_path))
+    body = {**BODY, "dateRanges": [{"startDate": "2024-03-01", "endDate": "2024-03-02"}]}
+    fetch_daily('token', '123', body, 'UTC', store, NOW)
+    fetch_daily('token', '123', body, 'UTC', store, NOW)
+    assert len(api.requests) == 2
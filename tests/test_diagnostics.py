@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+import ga_diagnostics
+from ga_diagnostics import run_checks
+
+
+@pytest.fixture
+def checks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ga_diagnostics, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(ga_diagnostics, 'TokenProvider', lambda *args: None)
+    calls = []
+
+    def passing(name):
+        def check(service_account_file, token_provider, property_id):
+            calls.append(name)
+            return {"name": name}
+        return check
+
+    stubs = {name: passing(name) for name in ('key_file', 'token')}
+    monkeypatch.setattr(ga_diagnostics, 'CHECKS', stubs)
+    return stubs, calls
+
+
+def test_healthy_result_is_cached(checks):
+    _, calls = checks
+    first = run_checks('123', ttl=600)
+    assert first['healthy'] and not first['cached']
+    second = run_checks('123', ttl=600)
+    assert second['cached']
+    assert second['checks'] == first['checks']
+    assert sorted(calls) == ['key_file', 'token']
+
+
+def test_failed_result_is_not_cached(checks):
+    stubs, calls = checks
+
+    def failing(service_account_file, token_provider, property_id):
+        calls.append('quota')
+        raise RuntimeError("狀態碼 403")
+    stubs['quota'] = failing
+    report = run_checks('123')
+    assert not report['healthy']
+    assert report['checks']['quota'] == {"ok": False, "detail": "狀態碼 403"}
+    run_checks('123')
+    assert calls.count('quota') == 2
+
+
+def test_slow_check_times_out(checks):
+    stubs, _ = checks
+    release = threading.Event()
+    stubs['property_access'] = lambda *args: release.wait(5)
+    try:
+        report = run_checks('123', timeout=0.1, use_cache=False)
+    finally:
+        release.set()
+    assert report['checks']['property_access']['ok'] is False
+    assert report['checks']['key_file']['ok'] is True
@@ -0,0 +1,31 @@
+from ga_events import build_event_breakdown_request, events_from_env, split_event_metrics
+
+
+def test_breakdown_request_filters_all_events_in_one_query():
+    body = build_event_breakdown_request(['first_visit', 'first_open'])
+    assert body["dimensions"] == [{"name": "eventName"}]
+    assert body["dimensionFilter"]["filter"]["inListFilter"]["values"] == ['first_visit', 'first_open']
+    assert body["limit"] == 2
+
+
+def test_split_event_metrics_fills_missing_events():
+    result = {
+        "metricHeaders": [{"name": "activeUsers"}, {"name": "eventCount"}],
+        "rows": [
+            {"dimensionValues": [{"value": "first_visit"}], "metricValues": [{"value": "12"}, {"value": "15"}]},
+            {"dimensionValues": [{"value": "other"}], "metricValues": [{"value": "1"}, {"value": "1"}]},
+        ],
+    }
+    assert split_event_metrics(result, ['first_visit', 'first_open']) == {
+        "first_visit": {"activeUsers": 12, "eventCount": 15},
+        "first_open": {"activeUsers": 0, "eventCount": 0},
+    }
+
+
+def test_split_event_metrics_failed_request():
+    assert split_event_metrics(None, ['first_visit']) == {"first_visit": {}}
+
+
+def test_events_from_env():
+    assert events_from_env(None, ('a',)) == ['a']
+    assert events_from_env(' a, ,b ', ('x',)) == ['a', 'b']
@@ -0,0 +1,41 @@
+from ga_columns import ReportColumns
+from get_geolocation_users import build_geo_request, build_geo_view, geo_dimensions
+
+
+def _response(dimensions, rows):
+    return {
+        "dimensionHeaders": [{"name": name} for name in dimensions],
+        "metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+        "rows": [{"dimensionValues": [{"value": v} for v in row[:-1]],
+                  "metricValues": [{"value": str(row[-1])}]} for row in rows],
+    }
+
+
+def test_countries_view_queries_country_only():
+    # activeUsers 不可加總，國家總數必須由 GA 以只含 country 的查詢計算
+    body = build_geo_request('countries')
+    assert [d["name"] for d in body["dimensions"]] == ['country']
+    assert [o["dimension"]["dimensionName"] for o in body["orderBys"]] == ['country']
+    assert [d["name"] for d in build_geo_request('cities')["dimensions"]] == ['country', 'city']
+
+
+def test_countries_view_keeps_api_totals():
+    columns = ReportColumns.from_response(_response(['country'], [("Japan", 40), ("Taiwan", 90)]))
+    assert build_geo_view(columns, 'countries') == [
+        {"country": "Taiwan", "activeUsers": 90},
+        {"country": "Japan", "activeUsers": 40},
+    ]
+
+
+def test_city_views():
+    columns = ReportColumns.from_response(_response(['country', 'city'], [
+        ("Taiwan", "臺北", 50), ("Taiwan", "高雄", 20), ("Japan", "Tokyo", 40)]))
+    assert [row["city"] for row in build_geo_view(columns, 'cities')] == ['臺北', 'Tokyo', '高雄']
+    per_country = build_geo_view(columns, 'top_cities_per_country')
+    assert {(row["country"], row["city"]) for row in per_country} == {
+        ("Taiwan", "臺北"), ("Taiwan", "高雄"), ("Japan", "Tokyo")}
+
+
+def test_change_keys_follow_view_definition():
+    assert geo_dimensions('countries') == ['country']
+    assert geo_dimensions('top_cities_per_country') == ['country', 'city']
@@ -0,0 +1,107 @@
+import json
+import random
+import threading
+
+import pytest
+
+import ga_keypool
+from ga_keypool import MAX_CONCURRENT, KeyPool, NoAvailableKeyError
+
+
+class StaticToken:
+    def __init__(self, token):
+        self._token = token
+
+    def token(self):
+        return self._token
+
+
+class Clock:
+    def __init__(self, now=3600 * 100 + 10):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _quota(remaining):
+    return {"tokensPerHour": {"consumed": 1, "remaining": remaining},
+            "tokensPerDay": {"consumed": 1, "remaining": remaining * 10}}
+
+
+@pytest.fixture
+def pool(tmp_path):
+    files = []
+    for name in ('a', 'b'):
+        path = tmp_path / f'{name}.json'
+        path.write_text(json.dumps({"client_email": f"{name}@example.iam.gserviceaccount.com"}))
+        files.append(str(path))
+    pool = KeyPool(files, clock=Clock(), rng=random.Random(7))
+    for key in pool.keys:
+        key.token_provider = StaticToken(key.name)
+    return pool
+
+
+def test_selection_is_weighted_by_remaining_quota(pool):
+    a, b = pool.keys
+    a.quota.update('123', _quota(9000))
+    b.quota.update('123', _quota(1000))
+    picks = [pool.choose('123') for _ in range(2000)]
+    share = picks.count(a) / len(picks)
+    assert 0.85 < share < 0.95
+
+
+def test_exhausted_and_excluded_keys_are_skipped(pool):
+    a, b = pool.keys
+    a.quota.update('123', _quota(0))
+    assert {pool.choose('123') for _ in range(50)} == {b}
+    with pytest.raises(NoAvailableKeyError):
+        pool.choose('123', exclude=[b])
+
+
+def test_hourly_quota_observation_expires_at_the_hour(pool):
+    a, _ = pool.keys
+    a.quota.update('123', _quota(0))
+    assert a.quota.remaining('123') == 0
+    pool._clock.now += 3600
+    assert a.quota.remaining('123') == ga_keypool.DEFAULT_REMAINING
+
+
+def test_choose_and_acquire_respect_concurrency_limit(pool):
+    barrier = threading.Barrier(MAX_CONCURRENT)
+    chosen = []
+
+    def worker():
+        barrier.wait()
+        for _ in range(2):
+            chosen.append(pool.choose('123', acquire=True))
+
+    threads = [threading.Thread(target=worker) for _ in range(MAX_CONCURRENT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 兩把金鑰各最多 MAX_CONCURRENT 個進行中的請求；額滿後即無可用金鑰
+    assert [chosen.count(key) for key in pool.keys] == [MAX_CONCURRENT, MAX_CONCURRENT]
+    with pytest.raises(NoAvailableKeyError):
+        pool.choose('123', acquire=True)
+
+
+def test_run_report_fails_over_on_429(pool, monkeypatch, fake_response):
+    seen = []
+
+    def post(url, headers=None, json=None, params=None):
+        seen.append(headers['Authorization'])
+        if len(seen) == 1:
+            return fake_response(429, {"error": {"code": 429}})
+        return fake_response(200, {"rows": [], "propertyQuota": _quota(500)})
+    monkeypatch.setattr(ga_keypool.requests, 'post', post)
+
+    result = pool.run_report('123', {"metrics": [{"name": "activeUsers"}]})
+    assert result["rows"] == []
+    first, second = (next(key for key in pool.keys if f'Bearer {key.name}' == auth) for auth in seen)
+    assert first is not second
+    assert first.quota.remaining('123') == 0
+    assert second.quota.remaining('123') == 500
+    # 進行中的請求數在請求結束後歸零
+    assert all(key.quota._in_flight.get('123', 0) == 0 for key in pool.keys)
@@ -0,0 +1,92 @@
+import json
+
+import requests
+
+import ga_loadtest
+import ga_report
+from ga_loadtest import MockGAServer, Replayer, RequestRecorder, load_recording
+
+ENTRIES = [
+    {"ts": 100.0, "report_type": "geolocation", "http_method": "POST",
+     "path": "/v1beta/properties/123:runReport", "body": {"limit": 10},
+     "status": 200, "latency_ms": 1.0, "response_bytes": 500},
+    {"ts": 100.5, "report_type": "metadata", "http_method": "GET",
+     "path": "/v1beta/properties/123/metadata", "body": None,
+     "status": 200, "latency_ms": 1.0, "response_bytes": 300},
+]
+
+
+def test_recorder_appends_one_line_per_response(tmp_path, fake_response):
+    path = tmp_path / 'record.jsonl'
+    recorder = RequestRecorder(str(path))
+    response = fake_response(200, {"rows": []}, request_body=b'{"limit": 5}')
+    response.request.url = 'https://analyticsdata.googleapis.com/v1beta/properties/1:runReport?fields=rows'
+    response.request.method = 'POST'
+    recorder.record('users', response)
+    recorder.record('users', response)
+    entries = load_recording(str(path))
+    assert len(entries) == 2
+    assert entries[0]["report_type"] == 'users'
+    assert entries[0]["path"] == '/v1beta/properties/1:runReport'
+    assert entries[0]["body"] == {"limit": 5}
+    assert entries[0]["latency_ms"] == 5.0
+    assert entries[0]["response_bytes"] == len(response.content)
+
+
+def test_load_recording_sorts_by_timestamp(tmp_path):
+    path = tmp_path / 'record.jsonl'
+    path.write_text('\n'.join(json.dumps(entry) for entry in reversed(ENTRIES)) + '\n\n', encoding='utf-8')
+    assert [entry["ts"] for entry in load_recording(str(path))] == [100.0, 100.5]
+
+
+def test_mock_server_injects_429_and_503():
+    with MockGAServer(ENTRIES, latency_scale=0, error_rate=1.0, seed=7) as server:
+        url = f'{server.base_url}/properties/123:runReport'
+        statuses = set()
+        for _ in range(20):
+            response = requests.post(url, json={"limit": 10}, timeout=10)
+            assert response.json()["error"]["code"] == response.status_code
+            statuses.add(response.status_code)
+    assert statuses == {429, 503}
+
+
+def test_mock_server_without_errors_returns_sized_gzip_payload():
+    with MockGAServer(ENTRIES, latency_scale=0) as server:
+        response = requests.post(f'{server.base_url}/properties/123:runReport', json={"limit": 10},
+                                 headers={'Accept-Encoding': 'gzip'}, timeout=10)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert abs(len(response.content) - 500) < 100
+    assert response.json()["rows"]
+
+
+def test_record_then_replay_round_trip(tmp_path, monkeypatch):
+    path = tmp_path / 'record.jsonl'
+    monkeypatch.setenv('GA_RECORD_FILE', str(path))
+    monkeypatch.setattr(ga_loadtest, '_recorder', None)
+    # 先對模擬端點執行實際的報表呼叫並錄製
+    with MockGAServer(ENTRIES, latency_scale=0) as server:
+        monkeypatch.setattr(ga_report, 'DATA_API_BASE', server.base_url)
+        assert ga_report.make_ga_report_call('secret-token', '123', {"limit": 10}, report_type='geolocation')
+        assert ga_report.fetch_metadata('secret-token', '123')
+    assert 'secret-token' not in path.read_text(encoding='utf-8')
+    entries = load_recording(str(path))
+    assert [entry["report_type"] for entry in entries] == ['geolocation', 'metadata']
+    assert [entry["http_method"] for entry in entries] == ['POST', 'GET']
+
+    # 再以錄製內容重播，複製到兩個屬性並播放兩次
+    with MockGAServer(entries, latency_scale=0) as server:
+        replayer = Replayer(entries, server.base_url, rate=1000, workers=2, properties=2, repeat=2)
+        report = replayer.run()
+    assert report["requests"] == 8
+    assert report["errors"] == 0
+    assert report["by_report"] == {"geolocation": {"requests": 4, "errors": 0},
+                                   "metadata": {"requests": 4, "errors": 0}}
+
+
+def test_replay_counts_injected_errors():
+    with MockGAServer(ENTRIES, latency_scale=0, error_rate=1.0, seed=1) as server:
+        report = Replayer(ENTRIES, server.base_url, rate=1000, workers=2).run()
+    assert report["requests"] == 2
+    assert report["errors"] == 2
+    assert report["error_rate"] == 1.0
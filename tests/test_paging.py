@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+import ga_report
+from ga_paging import MAX_PAGE_SIZE, MIN_PAGE_SIZE, PageSizeTuner
+from ga_timing import RunTimer
+
+
+def test_slow_pages_shrink_the_limit():
+    tuner = PageSizeTuner(initial=100000, target_seconds=5, memory_ceiling=1 << 40)
+    # 10 萬列花 20 秒：每列 0.2 毫秒，5 秒約 2.5 萬列
+    assert tuner.observe(100000, 10_000_000, 20.0) == 25000
+
+
+def test_growth_is_capped_per_page():
+    tuner = PageSizeTuner(initial=10000, target_seconds=5, memory_ceiling=1 << 40)
+    assert tuner.observe(10000, 1_000_000, 0.01) == 20000
+    assert tuner.observe(20000, 2_000_000, 0.02) == 40000
+
+
+def test_memory_ceiling_bounds_the_limit():
+    tuner = PageSizeTuner(initial=MAX_PAGE_SIZE, target_seconds=60, memory_ceiling=8 * 1024 * 1024)
+    # 每列 100 位元組，解碼後約 800 位元組；8 MiB 上限約 1 萬列
+    assert tuner.observe(1000, 100_000, 0.01) == 10485
+
+
+def test_limit_stays_within_api_bounds():
+    tuner = PageSizeTuner(initial=10 ** 9)
+    assert tuner.page_size == MAX_PAGE_SIZE
+    assert tuner.observe(10, 10_000_000, 100.0) == MIN_PAGE_SIZE
+    # 空頁不更新成本估計
+    assert tuner.observe(0, 0, 1.0) == MIN_PAGE_SIZE
+    assert len(tuner.history) == 2
+
+
+def test_iter_report_pages_follows_row_count(monkeypatch, fake_response):
+    total = 2500
+    bodies = []
+
+    def post(url, headers=None, json=None, params=None):
+        bodies.append(json)
+        rows = [{"dimensionValues": [{"value": str(i)}]}
+                for i in range(json["offset"], min(json["offset"] + json["limit"], total))]
+        return fake_response(200, content=_dumps({"rows": rows, "rowCount": total}))
+    monkeypatch.setattr(ga_report.requests, 'post', post)
+    tuner = PageSizeTuner(initial=MIN_PAGE_SIZE, target_seconds=1e-9)
+    timer = RunTimer('report', log_stream=io.StringIO())
+
+    result = ga_report.fetch_full_report('token', '123', {"dimensions": [{"name": "x"}]}, tuner, timer=timer)
+    assert [b["offset"] for b in bodies] == [0, 1000, 2000]
+    assert len(result["rows"]) == total and result["pages"] == 3
+    assert [rows for _, rows, _, _ in tuner.history] == [1000, 1000, 500]
+
+
+def test_iter_report_pages_raises_on_error(monkeypatch, fake_response):
+    monkeypatch.setattr(ga_report.requests, 'post', lambda *args, **kwargs: fake_response(429, {"error": {}}))
+    with pytest.raises(RuntimeError, match="429"):
+        list(ga_report.iter_report_pages('token', '123', {}, timer=RunTimer('report', log_stream=io.StringIO())))
+
+
+def _dumps(payload):
+    return json.dumps(payload).encode('utf-8')
@@ -0,0 +1,52 @@
+import pytest
+
+from ga_periods import MAX_DATE_RANGES, PeriodComparison, build_comparison_request, week_over_week_ranges
+
+
+def test_build_comparison_request_names_ranges():
+    body = build_comparison_request({"metrics": [{"name": "activeUsers"}]},
+                                    [{"startDate": "7daysAgo", "endDate": "today"}] + week_over_week_ranges())
+    assert [r["name"] for r in body["dateRanges"]] == ["date_range_0", "this_week", "last_week"]
+    assert body["metrics"] == [{"name": "activeUsers"}]
+
+
+def test_build_comparison_request_limits_range_count():
+    with pytest.raises(ValueError):
+        build_comparison_request({}, [])
+    with pytest.raises(ValueError):
+        build_comparison_request({}, [{"startDate": "today", "endDate": "today"}] * (MAX_DATE_RANGES + 1))
+
+
+def _row(values, metrics):
+    return {"dimensionValues": [{"value": v} for v in values],
+            "metricValues": [{"value": str(m)} for m in metrics]}
+
+
+def test_from_response_aligns_periods_and_compares():
+    request_body = build_comparison_request({}, week_over_week_ranges())
+    result = {
+        "dimensionHeaders": [{"name": "country"}, {"name": "dateRange"}],
+        "metricHeaders": [{"name": "activeUsers"}],
+        "rows": [
+            _row(["Taiwan", "this_week"], [120]),
+            _row(["Taiwan", "last_week"], [100]),
+            _row(["Japan", "last_week"], [8]),
+            _row(["Korea", "this_week"], [5]),
+        ],
+    }
+    comparison = PeriodComparison.from_response(result, request_body)
+    assert comparison.dimensions == ["country"]
+    assert comparison.keys == [("Taiwan",), ("Japan",), ("Korea",)]
+    # 某區間缺少的列記為 0
+    assert list(comparison.column("this_week", "activeUsers")) == [120.0, 0.0, 5.0]
+    rows = comparison.compare("activeUsers", "this_week", "last_week")
+    assert rows[0] == {"country": "Taiwan", "this_week": 120.0, "last_week": 100.0, "delta": 20.0, "ratio": 1.2}
+    assert rows[1]["delta"] == -8.0
+    assert rows[2]["ratio"] is None
+
+
+def test_single_range_without_date_range_dimension():
+    request_body = build_comparison_request({}, [{"startDate": "7daysAgo", "endDate": "today", "name": "week"}])
+    result = {"metricHeaders": [{"name": "newUsers"}], "rows": [_row([], [42])]}
+    comparison = PeriodComparison.from_response(result, request_body)
+    assert list(comparison.column("week", "newUsers")) == [42.0]
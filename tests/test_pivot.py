@@ -0,0 +1,61 @@
+from ga_pivot import PivotCube
+
+
+def _cube():
+    rows = [
+        ("Taiwan", "mobile", 10, 1),
+        ("Taiwan", "desktop", 5, 2),
+        ("Japan", "mobile", 3, 4),
+        ("Japan", "tablet", 1, 8),
+    ]
+    return PivotCube.from_response({
+        "dimensionHeaders": [{"name": "country"}, {"name": "deviceCategory"}],
+        "metricHeaders": [{"name": "activeUsers"}, {"name": "sessions"}],
+        "rows": [
+            {"dimensionValues": [{"value": country}, {"value": device}],
+             "metricValues": [{"value": str(users)}, {"value": str(sessions)}]}
+            for country, device, users, sessions in rows
+        ],
+    })
+
+
+def test_value():
+    cube = _cube()
+    assert cube.value('activeUsers', country='Taiwan', deviceCategory='desktop') == 5
+    assert cube.value('sessions', country='Japan', deviceCategory='tablet') == 8
+    # 回應中沒有的組合為 0
+    assert cube.value('activeUsers', country='Taiwan', deviceCategory='tablet') == 0
+
+
+def test_rollup():
+    cube = _cube()
+    by_country = cube.rollup(['country'])
+    assert by_country.dimensions == ['country']
+    assert by_country.value('activeUsers', country='Taiwan') == 15
+    assert by_country.value('sessions', country='Japan') == 12
+
+    by_device = cube.rollup(['deviceCategory'])
+    assert by_device.value('activeUsers', deviceCategory='mobile') == 13
+    assert by_device.value('sessions', deviceCategory='desktop') == 2
+
+
+def test_slice():
+    cube = _cube()
+    taiwan = cube.slice('country', 'Taiwan')
+    assert taiwan.dimensions == ['deviceCategory']
+    assert taiwan.value('activeUsers', deviceCategory='mobile') == 10
+    assert taiwan.value('activeUsers', deviceCategory='tablet') == 0
+
+    mobile = cube.slice('deviceCategory', 'mobile')
+    assert mobile.dimensions == ['country']
+    assert list(mobile.rows()) == [
+        {"country": "Taiwan", "activeUsers": 10, "sessions": 1},
+        {"country": "Japan", "activeUsers": 3, "sessions": 4},
+    ]
+
+    # 不存在的值回傳全為 0 的子結構
+    assert list(cube.slice('country', 'Korea').rows()) == []
+
+
+def test_top_n():
+    assert _cube().top_n('deviceCategory', 'activeUsers', n=2) == [("mobile", 13), ("desktop", 5)]
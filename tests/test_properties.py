@@ -0,0 +1,83 @@
+import pytest
+
+import ga_properties
+from ga_properties import PropertyIndex
+
+
+class StaticToken:
+    def token(self):
+        return 'token'
+
+
+class FakeAdminApi:
+    def __init__(self, fake_response):
+        self.fake_response = fake_response
+        self.accounts = {}  # 帳戶 ID -> [屬性 ID]
+        self.listed = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if url.endswith('/accountSummaries'):
+            # 每頁只回傳一個帳戶，以驗證分頁
+            ids = sorted(self.accounts)
+            index = int(params.get('pageToken', 0))
+            payload = {'accountSummaries': [{
+                'account': f'accounts/{ids[index]}',
+                'displayName': f'帳戶 {ids[index]}',
+                'propertySummaries': [{} for _ in self.accounts[ids[index]]],
+            }]} if ids else {}
+            if index + 1 < len(ids):
+                payload['nextPageToken'] = str(index + 1)
+            return self.fake_response(200, payload)
+        account_id = params['filter'].split('/')[-1]
+        self.listed.append(account_id)
+        return self.fake_response(200, {'properties': [
+            {'name': f'properties/{pid}', 'displayName': f'屬性 {pid}', 'timeZone': 'Asia/Taipei',
+             'currencyCode': 'TWD'} for pid in self.accounts[account_id]]})
+
+
+@pytest.fixture
+def admin(monkeypatch, fake_response):
+    api = FakeAdminApi(fake_response)
+    monkeypatch.setattr(ga_properties.requests, 'get', api.get)
+    return api
+
+
+def test_refresh_builds_index_across_pages(tmp_path, admin):
+    admin.accounts = {'1': ['11', '12'], '2': ['21']}
+    index = PropertyIndex(StaticToken(), path=str(tmp_path / 'index.json'))
+    assert sorted(index.refresh()) == ['1', '2']
+    assert sorted(index.properties) == ['11', '12', '21']
+    assert index.get(21) == {'display_name': '屬性 21', 'account': '2', 'time_zone': 'Asia/Taipei',
+                             'currency': 'TWD', 'property_type': None}
+
+    reloaded = PropertyIndex(StaticToken(), path=str(tmp_path / 'index.json'))
+    assert '12' in reloaded
+
+
+def test_refresh_relists_only_changed_accounts(tmp_path, admin):
+    admin.accounts = {'1': ['11'], '2': ['21']}
+    index = PropertyIndex(StaticToken(), path=str(tmp_path / 'index.json'))
+    index.refresh()
+    admin.listed.clear()
+    admin.accounts['2'].append('22')
+    assert index.refresh() == ['2']
+    assert admin.listed == ['2']
+    assert '22' in index
+
+
+def test_refresh_drops_accounts_without_access(tmp_path, admin):
+    admin.accounts = {'1': ['11'], '2': ['21']}
+    index = PropertyIndex(StaticToken(), path=str(tmp_path / 'index.json'))
+    index.refresh()
+    del admin.accounts['2']
+    index.refresh()
+    assert '21' not in index
+    assert list(index.accounts) == ['1']
+
+
+def test_validate_refreshes_once_for_unknown_property(tmp_path, admin):
+    admin.accounts = {'1': ['11']}
+    index = PropertyIndex(StaticToken(), path=str(tmp_path / 'index.json'))
+    assert not index.validate('99')
+    admin.accounts['1'].append('99')
+    assert index.validate('99')
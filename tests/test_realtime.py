@@ -0,0 +1,116 @@
+import get_realtime_active_users
+from ga_realtime import RealtimeWindow, build_realtime_request, build_realtime_totals_requests
+
+NOW = 1_000_000 * 60
+
+
+def _result(rows):
+    return {
+        "dimensionHeaders": [{"name": "minutesAgo"}, {"name": "country"}],
+        "metricHeaders": [{"name": "activeUsers"}],
+        "rows": [{"dimensionValues": [{"value": f"{minutes:02d}"}, {"value": country}],
+                  "metricValues": [{"value": str(users)}]} for minutes, country, users in rows],
+    }
+
+
+def test_rolling_windows_are_labelled_upper_bounds():
+    window = RealtimeWindow()
+    window.update(_result([(0, "TW", 3), (4, "JP", 2), (10, "TW", 5), (29, "TW", 1)]), now=NOW)
+    panels = window.panels()
+    assert panels["5m"] == {"total": None, "upper_bound": {"total": 5.0, "country": {"TW": 3.0, "JP": 2.0}}}
+    assert panels["15m"]["upper_bound"]["total"] == 10.0
+    assert panels["30m"]["upper_bound"]["country"] == {"TW": 9.0, "JP": 2.0}
+
+
+def test_newer_poll_replaces_covered_minutes_and_evicts_old_ones():
+    window = RealtimeWindow()
+    window.update(_result([(0, "TW", 3), (1, "TW", 4)]), now=NOW)
+    # 一分鐘後：原本的 0 分鐘前變成 1 分鐘前，以新值覆蓋
+    window.update(_result([(1, "TW", 7)]), now=NOW + 60)
+    assert window.aggregate(5) == {(): 7.0}
+    window.update(_result([]), now=NOW + 60 * 40)
+    assert window.aggregate(30) == {}
+
+
+def test_exact_totals_from_minute_ranges():
+    window = RealtimeWindow()
+    window.update(_result([(0, "TW", 3), (1, "TW", 3)]), now=NOW)
+    first, second = build_realtime_totals_requests()
+    window.update_totals({
+        "dimensionHeaders": [{"name": "minuteRange"}],
+        "metricHeaders": [{"name": "activeUsers"}],
+        "rows": [{"dimensionValues": [{"value": "last_5_minutes"}], "metricValues": [{"value": "4"}]},
+                 {"dimensionValues": [{"value": "last_15_minutes"}], "metricValues": [{"value": "9"}]}],
+    }, first)
+    # 只有一個 minuteRange 時響應沒有 minuteRange 欄位
+    window.update_totals({"metricHeaders": [{"name": "activeUsers"}],
+                          "rows": [{"metricValues": [{"value": "20"}]}]}, second)
+    panels = window.panels()
+    assert [panels[w]["total"] for w in ("5m", "15m", "30m")] == [4.0, 9.0, 20.0]
+    assert panels["5m"]["upper_bound"]["total"] == 6.0
+
+
+def test_requests():
+    body = build_realtime_request(dimensions=('country',))
+    assert [d["name"] for d in body["dimensions"]] == ["minutesAgo", "country"]
+    totals = build_realtime_totals_requests()
+    assert [len(b["minuteRanges"]) for b in totals] == [2, 1]
+    assert all("dimensions" not in b for b in totals)
+    assert totals[1]["minuteRanges"][0] == {"name": "last_30_minutes", "startMinutesAgo": 29, "endMinutesAgo": 0}
+
+
+def _watch(monkeypatch, **kwargs):
+    calls = []
+
+    def fake_call(token, property_id, body, method='runReport', **rest):
+        calls.append(body)
+        return _result([(0, "TW", 1)]) if "dimensions" in body else {"rows": []}
+
+    class FakeTokenProvider:
+        def __init__(self, *args):
+            pass
+
+        def token(self):
+            return 'token'
+
+    monkeypatch.setattr(get_realtime_active_users, 'make_ga_report_call', fake_call)
+    monkeypatch.setattr(get_realtime_active_users, 'TokenProvider', FakeTokenProvider)
+    monkeypatch.setattr(get_realtime_active_users.time, 'sleep', lambda seconds: None)
+    get_realtime_active_users.watch_realtime(1, max_polls=3, **kwargs)
+    return calls
+
+
+def test_watch_sends_one_request_per_poll(monkeypatch, capsys):
+    assert len(_watch(monkeypatch)) == 3
+
+
+def test_watch_exact_totals_are_opt_in(monkeypatch, capsys):
+    assert len(_watch(monkeypatch, exact_totals=True)) == 9
+
+
+def test_single_shot_prints_rows_without_full_dump(tmp_path, monkeypatch, capsys):
+    class FakeCredentials:
+        token = 'token-for-realtime-test'
+
+        def refresh(self, request):
+            pass
+
+    key_file = tmp_path / 'key.json'
+    key_file.write_text('{"project_id": "demo"}')
+    monkeypatch.setattr(get_realtime_active_users, 'SERVICE_ACCOUNT_FILE', str(key_file))
+    monkeypatch.setattr(get_realtime_active_users, 'GA4_PROPERTY_ID', '123')
+    monkeypatch.setattr(get_realtime_active_users.service_account.Credentials, 'from_service_account_file',
+                        lambda *args, **kwargs: FakeCredentials())
+    calls = []
+
+    def fake_call(token, property_id, body, method='runReport', report_type=None):
+        calls.append(method)
+        return {"metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+                "rows": [{"metricValues": [{"value": "42"}]}], "rowCount": 1}
+    monkeypatch.setattr(get_realtime_active_users, 'make_ga_report_call', fake_call)
+
+    assert get_realtime_active_users.fetch_realtime_active_users()
+    out = capsys.readouterr().out
+    assert calls == ['runRealtimeReport']
+    assert '目前在線使用者 (活躍使用者): 42' in out
+    assert '"metricHeaders"' not in out
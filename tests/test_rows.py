@@ -0,0 +1,53 @@
+import pytest
+
+from ga_rows import CompactReport
+
+HEADERS = {
+    "dimensionHeaders": [{"name": "screenResolution"}],
+    "metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"},
+                      {"name": "engagementRate", "type": "TYPE_FLOAT"}],
+}
+
+
+def _page(rows):
+    return {**HEADERS, "rows": [
+        {"dimensionValues": [{"value": resolution}],
+         "metricValues": [{"value": users}, {"value": rate}]} for resolution, users, rate in rows]}
+
+
+def test_from_response_types_columns():
+    report = CompactReport.from_response(_page([("1920x1080", "12", "0.5"), ("390x844", "bad", "0.25")]))
+    assert len(report) == 2
+    assert report.columns[0].typecode == 'q'
+    assert report.columns[1].typecode == 'd'
+    assert report[0].as_dict() == {"screenResolution": "1920x1080", "activeUsers": 12, "engagementRate": 0.5}
+    # 無法轉換的值記為 0
+    assert report[-1]['activeUsers'] == 0
+
+
+def test_from_responses_matches_single_response():
+    pages = [
+        _page([("1920x1080", "12", "0.5"), ("390x844", "7", "0.25")]),
+        _page([("1920x1080", "1", "1.0")]),
+        _page([]),
+    ]
+    incremental = CompactReport.from_responses(iter(pages))
+    combined = CompactReport.from_response({**HEADERS, "rows": [row for page in pages for row in page["rows"]]})
+    assert [row.as_dict() for row in incremental] == [row.as_dict() for row in combined]
+    # 跨頁重複的維度值共用同一個代碼
+    assert incremental.dictionaries[0] == ["1920x1080", "390x844"]
+    assert list(incremental.codes[0]) == [0, 1, 0]
+
+
+def test_row_view_access():
+    report = CompactReport.from_response(_page([("1920x1080", "12", "0.5")]))
+    row = report[0]
+    assert row['screenResolution'] == "1920x1080"
+    assert row.dimension_values == ("1920x1080",)
+    assert row.metric_values == (12, 0.5)
+    assert row.get('country') is None
+    # 不再模擬 API 的巢狀結構
+    with pytest.raises(KeyError):
+        row['dimensionValues']
+    with pytest.raises(IndexError):
+        report[1]
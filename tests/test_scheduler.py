@@ -0,0 +1,93 @@
+import pytest
+
+from ga_scheduler import Job, Scheduler
+
+
+class FakeTokenProvider:
+    def token(self):
+        return 'token'
+
+
+def _scheduler(tmp_path, dependencies, calls):
+    def action(name):
+        def run(token_provider):
+            calls.append(name)
+            return {"job": name}
+        return run
+
+    jobs = [Job(name, 3600, action(name), depends_on=depends_on) for name, depends_on in dependencies.items()]
+    return Scheduler(jobs, FakeTokenProvider(), cache_dir=str(tmp_path))
+
+
+def test_dependencies_run_first(tmp_path):
+    calls = []
+    scheduler = _scheduler(tmp_path, {"metadata": (), "report": ("metadata",)}, calls)
+    assert scheduler.run_job("report")
+    assert calls == ["metadata", "report"]
+    assert (tmp_path / "metadata.json").exists()
+
+    # 快取仍有效時不再執行
+    assert not scheduler.run_job("report")
+    assert calls == ["metadata", "report"]
+
+
+def test_diamond_dependency_runs_shared_job_once(tmp_path):
+    calls = []
+    scheduler = _scheduler(tmp_path, {
+        "metadata": (),
+        "countries": ("metadata",),
+        "devices": ("metadata",),
+        "summary": ("countries", "devices"),
+    }, calls)
+    assert scheduler.run_job("summary")
+    assert calls == ["metadata", "countries", "devices", "summary"]
+
+
+def test_cycle_rejected(tmp_path):
+    with pytest.raises(ValueError, match="循環"):
+        _scheduler(tmp_path, {"a": ("c",), "b": ("a",), "c": ("b",)}, [])
+
+
+def test_unknown_dependency_rejected(tmp_path):
+    with pytest.raises(ValueError, match="不存在"):
+        _scheduler(tmp_path, {"report": ("metadata",)}, [])
+
+
+def test_failed_job_is_not_cached(tmp_path):
+    scheduler = Scheduler([Job("report", 3600, lambda token_provider: None)], FakeTokenProvider(),
+                          cache_dir=str(tmp_path))
+    assert not scheduler.run_job("report")
+    assert not (tmp_path / "report.json").exists()
+
+
+def test_failed_dependency_defers_dependents(tmp_path):
+    calls = []
+
+    def failing(token_provider):
+        calls.append("metadata")
+        return None
+
+    def report(name):
+        def run(token_provider):
+            calls.append(name)
+            return {"job": name}
+        return run
+
+    scheduler = Scheduler([
+        Job("metadata", 3600, failing),
+        Job("countries", 3600, report("countries"), depends_on=("metadata",)),
+        Job("devices", 3600, report("devices"), depends_on=("metadata",)),
+        Job("summary", 3600, report("summary"), depends_on=("countries", "devices")),
+    ], FakeTokenProvider(), cache_dir=str(tmp_path))
+    assert not scheduler.run_job("summary")
+    # 失敗的相依工作在同一次執行中只嘗試一次，其後的工作都不執行
+    assert calls == ["metadata"]
+    assert not (tmp_path / "countries.json").exists()
+
+
+def test_fresh_dependency_allows_dependent(tmp_path):
+    calls = []
+    scheduler = _scheduler(tmp_path, {"metadata": (), "report": ("metadata",)}, calls)
+    scheduler.run_job("metadata")
+    assert scheduler.run_job("report")
+    assert calls == ["metadata", "report"]
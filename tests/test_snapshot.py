@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+import ga_snapshot
+from ga_columns import ReportColumns
+from ga_snapshot import Snapshot, open_report_snapshot, save_report_snapshot, write_snapshot
+
+
+def _response():
+    return {
+        "dimensionHeaders": [{"name": "country"}, {"name": "city"}],
+        "metricHeaders": [{"name": "activeUsers"}],
+        "rows": [
+            {"dimensionValues": [{"value": "Taiwan"}, {"value": "臺北"}], "metricValues": [{"value": "120"}]},
+            {"dimensionValues": [{"value": "Taiwan"}, {"value": "高雄"}], "metricValues": [{"value": "45"}]},
+            {"dimensionValues": [{"value": "Japan"}, {"value": "Tokyo"}], "metricValues": [{"value": "7.5"}]},
+        ],
+    }
+
+
+def test_snapshot_round_trip(tmp_path):
+    columns = ReportColumns.from_response(_response())
+    path = tmp_path / 'report.snap'
+    write_snapshot(str(path), columns)
+
+    with Snapshot(str(path)) as snapshot:
+        assert snapshot.row_count == 3
+        assert snapshot.dimensions == ['country', 'city']
+        assert snapshot.metrics == ['activeUsers']
+        assert snapshot.dictionary('country') == ['Taiwan', 'Japan']
+        assert list(snapshot.rows()) == list(columns.rows())
+        restored = snapshot.to_columns()
+    assert list(restored.rows()) == list(columns.rows())
+
+
+def test_snapshot_empty_report(tmp_path):
+    columns = ReportColumns.from_response({
+        "dimensionHeaders": [{"name": "country"}],
+        "metricHeaders": [{"name": "activeUsers"}],
+    })
+    path = tmp_path / 'empty.snap'
+    write_snapshot(str(path), columns)
+
+    with Snapshot(str(path)) as snapshot:
+        assert snapshot.row_count == 0
+        assert list(snapshot.rows()) == []
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'report.json'
+    path.write_bytes(b'{"rows": []}' + bytes(200))
+    try:
+        Snapshot(str(path))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("應拒絕非快照檔案")
+
+
+def test_dimension_only_report_keeps_row_count(tmp_path):
+    columns = ReportColumns.from_response({
+        "dimensionHeaders": [{"name": "browser"}],
+        "rows": [{"dimensionValues": [{"value": "Chrome"}]}, {"dimensionValues": [{"value": "Safari"}]}],
+    })
+    assert columns.row_count == 2
+    path = tmp_path / 'dims.snap'
+    write_snapshot(str(path), columns)
+    with Snapshot(str(path)) as snapshot:
+        assert list(snapshot.rows()) == [{"browser": "Chrome"}, {"browser": "Safari"}]
+
+
+def test_truncated_snapshot_raises_value_error(tmp_path):
+    path = tmp_path / 'report.snap'
+    write_snapshot(str(path), ReportColumns.from_response(_response()))
+    data = path.read_bytes()
+    for size in (10, len(data) - 8):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            Snapshot(str(path))
+
+
+def test_views_held_by_caller_survive_close(tmp_path):
+    path = tmp_path / 'report.snap'
+    write_snapshot(str(path), ReportColumns.from_response(_response()))
+    snapshot = Snapshot(str(path))
+    values = snapshot.metric('activeUsers')
+    snapshot.close()
+    snapshot.close()
+    assert list(values) == [120.0, 45.0, 7.5]
+    values.release()
+
+
+def test_report_snapshot_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ga_snapshot, 'SNAPSHOTS_ENABLED', False)
+    columns = ReportColumns.from_response(_response())
+    assert save_report_snapshot('geolocation', columns, '123', str(tmp_path)) is None
+
+    monkeypatch.setattr(ga_snapshot, 'SNAPSHOTS_ENABLED', True)
+    path = save_report_snapshot('geolocation', columns, '123', str(tmp_path))
+    assert path == str(tmp_path / 'snapshots' / '123' / 'geolocation.snap')
+    with open_report_snapshot('geolocation', '123', str(tmp_path)) as snapshot:
+        assert list(snapshot.rows()) == list(columns.rows())
+
+
+def test_emit_report_writes_snapshot(tmp_path, monkeypatch):
+    from ga_output import emit_report
+    monkeypatch.setattr(ga_snapshot, 'SNAPSHOTS_ENABLED', True)
+    monkeypatch.chdir(tmp_path)
+    emit_report(_response(), fmt='ndjson', stream=io.StringIO(), report_name='os', property_id='9')
+    with open_report_snapshot('os', '9') as snapshot:
+        assert snapshot.row_count == 3
@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+
+import ga_timing
+from ga_timing import RunTimer
+
+
+def _events(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_stage_records_duration_and_attrs():
+    log = io.StringIO()
+    timer = RunTimer('report', log_stream=log)
+    with timer.stage('http_request', report_type='geolocation') as record:
+        record['rows'] = 3
+    events = _events(log)
+    assert events[0]['event'] == 'stage'
+    assert events[0]['stage'] == 'http_request'
+    assert events[0]['report_type'] == 'geolocation'
+    assert events[0]['rows'] == 3
+    assert events[0]['status'] == 'ok'
+    assert events[0]['duration_ms'] >= 0
+
+
+def test_failed_stage_is_recorded_and_reraised():
+    log = io.StringIO()
+    timer = RunTimer('report', log_stream=log)
+    with pytest.raises(KeyError):
+        with timer.stage('json_decode'):
+            raise KeyError('rows')
+    assert _events(log)[0]['status'] == 'error'
+    assert _events(log)[0]['error'] == 'KeyError'
+
+
+def test_summary_totals_survive_trimmed_records(monkeypatch):
+    monkeypatch.setattr(ga_timing, 'MAX_STAGE_RECORDS', 2)
+    timer = RunTimer('report', log_stream=io.StringIO())
+    for _ in range(5):
+        with timer.stage('http_request') as record:
+            record['response_bytes'] = 10
+    assert len(timer.stages) == 2
+    totals = timer.summary()['stages']['http_request']
+    assert totals['count'] == 5
+    assert totals['response_bytes'] == 50
+
+
+def test_emit_summary_closes_owned_log_file(tmp_path, monkeypatch):
+    path = tmp_path / 'timing.log'
+    monkeypatch.setenv('GA_TIMING_LOG', str(path))
+    timer = RunTimer('report')
+    with timer.stage('load_key'):
+        pass
+    log = timer._log
+    timer.emit_summary()
+    assert log.closed
+    # 之後的階段與重複的彙總不再寫入
+    with timer.stage('late'):
+        pass
+    timer.emit_summary()
+    events = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [e['event'] for e in events] == ['stage', 'summary']
+
+
+def test_caller_stream_is_not_closed():
+    log = io.StringIO()
+    timer = RunTimer('report', log_stream=log)
+    timer.emit_summary()
+    assert not log.closed
+
+
+def test_report_call_records_shared_stages(monkeypatch, fake_response):
+    import ga_report
+    timer = RunTimer('report', log_stream=io.StringIO())
+    payload = {"rows": [{"metricValues": [{"value": "3"}]}]}
+    monkeypatch.setattr(ga_report.requests, 'post',
+                        lambda *args, **kwargs: fake_response(200, payload, request_body=b'{}'))
+    assert ga_report.make_ga_report_call('token', '1', {}, report_type='users', timer=timer) == payload
+    stages = timer.summary()['stages']
+    assert stages['http_request']['count'] == 1
+    assert stages['http_request']['request_bytes'] == 2
+    assert stages['json_decode']['count'] == 1
+
+
+def test_emit_report_records_format_output():
+    from ga_output import emit_report
+    timer = RunTimer('report', log_stream=io.StringIO())
+    result = {"metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+              "rows": [{"metricValues": [{"value": "3"}]}]}
+    assert emit_report(result, fmt='ndjson', stream=io.StringIO(), timer=timer) == 1
+    assert timer.summary()['stages']['format_output']['count'] == 1
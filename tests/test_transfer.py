@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+import ga_transfer
+from ga_transfer import compressed_headers, fields_params, print_transfer_summary, record_transfer, transfer_summary
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(ga_transfer, '_stats', {})
+    monkeypatch.delenv('GA_RECORD_FILE', raising=False)
+
+
+def test_headers_ask_for_gzip():
+    headers = compressed_headers('token')
+    assert headers['Authorization'] == 'Bearer token'
+    assert 'gzip' in headers['Accept-Encoding']
+    # Google API 只在 User-Agent 含 gzip 時壓縮響應
+    assert 'gzip' in headers['User-Agent']
+    assert 'Content-Type' not in compressed_headers('token', content_type=None)
+
+
+def test_fields_params_by_method():
+    assert 'rowCount' in fields_params('runReport')['fields']
+    assert 'propertyQuota' in fields_params('runReport', {"returnPropertyQuota": True})['fields']
+    assert fields_params('runPivotReport') == {}
+
+
+def test_record_transfer_accumulates_per_report_type(fake_response):
+    body = b'{"rows": []}' * 10
+    compressed = fake_response(200, content=body, headers={'Content-Encoding': 'gzip', 'Content-Length': '30'})
+    plain = fake_response(200, content=body)
+    assert record_transfer('geolocation', compressed) == {
+        'wire_bytes': 30, 'decoded_bytes': len(body), 'content_encoding': 'gzip'}
+    record_transfer('geolocation', plain)
+    summary = transfer_summary()['geolocation']
+    assert summary['requests'] == 2
+    assert summary['wire_bytes'] == 30 + len(body)
+    assert summary['encodings'] == {'gzip': 1, 'identity': 1}
+    assert summary['compression_ratio'] == round(2 * len(body) / (30 + len(body)), 2)
+
+
+def test_summary_is_printed_only_when_enabled(monkeypatch, fake_response):
+    record_transfer('os', fake_response(200, content=b'{}'))
+    stream = io.StringIO()
+    print_transfer_summary(stream)
+    assert stream.getvalue() == ''
+    monkeypatch.setenv('GA_TRANSFER_LOG', '1')
+    print_transfer_summary(stream)
+    event = json.loads(stream.getvalue())
+    assert event['event'] == 'transfer' and event['report_type'] == 'os'
+
+
+def test_report_scripts_send_compressed_requests(tmp_path, monkeypatch, fake_response):
+    import ga_report
+    import get_os_users
+
+    class FakeCredentials:
+        token = 'token-for-transfer-test'
+
+        def refresh(self, request):
+            pass
+
+    key_file = tmp_path / 'key.json'
+    key_file.write_text('{}')
+    monkeypatch.setattr(get_os_users, 'SERVICE_ACCOUNT_FILE', str(key_file))
+    monkeypatch.setattr(get_os_users, 'GA4_PROPERTY_ID', '123')
+    monkeypatch.setattr(get_os_users.service_account.Credentials, 'from_service_account_file',
+                        lambda *args, **kwargs: FakeCredentials())
+    sent = []
+
+    def post(url, headers=None, json=None, params=None):
+        sent.append((url, headers, params))
+        return fake_response(200, {"dimensionHeaders": [{"name": "operatingSystem"}],
+                                    "metricHeaders": [{"name": "activeUsers", "type": "TYPE_INTEGER"}],
+                                    "rows": []})
+    monkeypatch.setattr(ga_report.requests, 'post', post)
+
+    assert get_os_users.fetch_os_data()
+    url, headers, params = sent[0]
+    assert url.endswith('/properties/123:runReport')
+    assert headers['User-Agent'] == ga_transfer.USER_AGENT
+    assert params == fields_params('runReport')
+    assert transfer_summary()['os']['requests'] == 1
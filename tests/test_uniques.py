@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+
+import pytest
+
+import ga_uniques
+from ga_dates import property_today
+from ga_uniques import HyperLogLog, UniqueUserEstimator
+
+START = date(2024, 1, 1)
+END = date(2024, 1, 3)
+
+
+class StubCaller:
+    def __init__(self, value):
+        self.value = value
+        self.bodies = []
+
+    def __call__(self, token, property_id, body):
+        self.bodies.append(body)
+        return {"rows": [{"metricValues": [{"value": str(self.value)}]}]}
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    return UniqueUserEstimator('123', cache_dir=str(tmp_path), time_zone='Asia/Taipei')
+
+
+def test_estimate_without_local_data_is_none(estimator):
+    assert estimator.estimate(START, END) is None
+    with pytest.raises(ValueError):
+        estimator.estimate(END, START)
+
+
+def test_daily_counts_give_bounds(estimator):
+    for offset, value in enumerate([10, 30, 20]):
+        assert estimator.store_daily_count(START + timedelta(days=offset), value)
+    assert estimator.estimate(START, END) == {"value": None, "exact": False, "method": "daily_bounds",
+                                              "lower": 30, "upper": 60}
+
+
+def test_sketch_union_counts_overlapping_users_once(estimator):
+    estimator.store_daily_sketch(START, [f'user-{i}' for i in range(0, 600)])
+    estimator.store_daily_sketch(START + timedelta(days=1), [f'user-{i}' for i in range(300, 900)])
+    estimator.store_daily_sketch(END, [f'user-{i}' for i in range(800, 1000)])
+    result = estimator.estimate(START, END)
+    assert result["method"] == "hll_union"
+    assert abs(result["value"] - 1000) <= 1000 * 3 * result["standard_error"]
+
+
+def test_hll_rejects_mixed_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_finalized_range_is_cached_as_exact(estimator, monkeypatch):
+    caller = StubCaller(42)
+    monkeypatch.setattr(ga_uniques, 'make_ga_report_call', caller)
+    assert estimator.unique_users('token', START, END) == {"value": 42, "exact": True, "method": "api"}
+    assert estimator.unique_users('token', START, END) == {"value": 42, "exact": True, "method": "cached_exact"}
+    assert len(caller.bodies) == 1
+
+
+def test_recent_range_is_provisional_and_not_cached(estimator, monkeypatch):
+    caller = StubCaller(7)
+    monkeypatch.setattr(ga_uniques, 'make_ga_report_call', caller)
+    today = property_today('Asia/Taipei')
+    for _ in range(2):
+        result = estimator.unique_users('token', today - timedelta(days=6), today)
+        assert result == {"value": 7, "exact": False, "method": "api_provisional"}
+    assert len(caller.bodies) == 2
+    assert not estimator.store_daily_count(today, 7)
+
+
+def test_require_exact_skips_estimates(estimator, monkeypatch):
+    caller = StubCaller(25)
+    monkeypatch.setattr(ga_uniques, 'make_ga_report_call', caller)
+    for offset in range(3):
+        estimator.store_daily_count(START + timedelta(days=offset), 10)
+    assert estimator.unique_users('token', START, END)["method"] == "daily_bounds"
+    assert estimator.unique_users('token', START, END, require_exact=True)["value"] == 25
+    assert caller.bodies[0]["dateRanges"] == [{"startDate": "2024-01-01", "endDate": "2024-01-03"}]
+
+
+def test_rolling_windows_end_on_the_given_day(estimator, monkeypatch):
+    caller = StubCaller(5)
+    monkeypatch.setattr(ga_uniques, 'make_ga_report_call', caller)
+    results = estimator.rolling('token', date(2024, 3, 31))
+    assert sorted(results) == [7, 28, 90]
+    starts = sorted(b["dateRanges"][0]["startDate"] for b in caller.bodies)
+    assert starts == ['2024-01-02', '2024-03-04', '2024-03-25']
+
+
+def test_script_prints_rolling_windows_from_cache(tmp_path, monkeypatch, capsys):
+    import get_unique_users
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_unique_users, 'GA4_PROPERTY_ID', '123')
+    monkeypatch.setattr(get_unique_users, 'lookup_time_zone', lambda property_id: 'UTC')
+    caller = StubCaller(9)
+    monkeypatch.setattr(ga_uniques, 'make_ga_report_call', caller)
+    first = get_unique_users.print_rolling_unique_users('token', estimate=False)
+    second = get_unique_users.print_rolling_unique_users('token', estimate=False)
+    assert len(caller.bodies) == 3
+    assert [r["method"] for r in first.values()] == ["api"] * 3
+    assert [r["method"] for r in second.values()] == ["cached_exact"] * 3
+    assert '天數: 90' in capsys.readouterr().out
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+from ga_workers import _aggregate_page, _merge_segment, aggregate_pages
+
+
+def _page(rows):
+    return json.dumps({
+        "dimensionHeaders": [{"name": "country"}, {"name": "city"}],
+        "metricHeaders": [{"name": "activeUsers"}, {"name": "sessions"}],
+        "rows": [{"dimensionValues": [{"value": c}, {"value": city}],
+                  "metricValues": [{"value": str(u)}, {"value": str(s)}]} for c, city, u, s in rows],
+    }).encode('utf-8')
+
+
+def _shm_segments():
+    try:
+        return set(os.listdir('/dev/shm'))
+    except FileNotFoundError:
+        return set()
+
+
+def test_aggregate_page_round_trip():
+    page = _page([("Taiwan", "臺北", 3, 4), ("Japan", "Tokyo", 1, 2), ("Taiwan", "高雄", 5, 6)])
+    totals = {}
+    _merge_segment(_aggregate_page(page, ['country'], ['activeUsers', 'sessions']), totals, ['activeUsers', 'sessions'])
+    assert totals == {("Taiwan",): [8.0, 10.0], ("Japan",): [1.0, 2.0]}
+
+
+def test_aggregate_page_keys_match_rows_on_large_page():
+    rows = [(f"c{i % 97}", f"city{i}", 1, 0) for i in range(5000)]
+    totals = {}
+    _merge_segment(_aggregate_page(_page(rows), ['country', 'city'], ['activeUsers']), totals, ['activeUsers'])
+    assert len(totals) == 5000
+    assert totals[("c3", "city3")] == [1.0]
+
+
+def test_aggregate_pages_merges_across_processes():
+    before = _shm_segments()
+    pages = [
+        _page([("Taiwan", "臺北", 3, 1), ("Japan", "Tokyo", 1, 1)]),
+        _page([("Taiwan", "高雄", 2, 1)]),
+        _page([]),
+        _page([("Japan", "Osaka", 4, 1)]),
+    ]
+    columns = aggregate_pages(iter(pages), ['country'], ['activeUsers'], processes=2, max_pending=1)
+    assert {row['country']: row['activeUsers'] for row in columns.rows()} == {"Taiwan": 5.0, "Japan": 5.0}
+    assert _shm_segments() == before
+
+
+def test_aggregate_pages_releases_shared_memory_on_error():
+    before = _shm_segments()
+    pages = [_page([("Taiwan", "臺北", 3, 1)]), b'not json', _page([("Japan", "Tokyo", 1, 1)])]
+    with pytest.raises(ValueError):
+        aggregate_pages(iter(pages), ['country'], ['activeUsers'], processes=2)
+    assert _shm_segments() == before